@@ -0,0 +1,284 @@
+# recommendations/als.py
+"""
+Factorisation matricielle par moindres carrés alternés (ALS) des notes RATED
+- explicite: note ≈ moyenne globale + u · v, sur les notes observées
+- implicite (Hu, Koren, Volinsky): préférence 1 avec confiance 1 + alpha * note
+Les facteurs sont sauvegardés en float32 (.npy) et chargés en memory-map ;
+servir un utilisateur = un produit matrice-vecteur sur les facteurs séries.
+Les séries adultes connues à l'entraînement sont écartées avant le top-k.
+
+Dépendances: numpy, scipy (pip install numpy scipy)
+Entraînement: python manage.py train_als
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+from scipy import sparse
+
+from recommendations.sparse_cf import RatingMatrix, adult_mask, load_series_info
+
+
+LIKE_THRESHOLD = 4.0
+
+
+def split_holdout(matrix, fraction=0.1, seed=0):
+    """(train, holdout): une fraction des notes de chaque utilisateur mise de côté"""
+    coo = matrix.tocoo()
+    rng = np.random.default_rng(seed)
+    held = rng.random(coo.nnz) < fraction
+    # Garder au moins une note d'entraînement par utilisateur
+    first = np.unique(coo.row, return_index=True)[1]
+    held[first] = False
+
+    def build(mask):
+        return sparse.csr_matrix(
+            (coo.data[mask], (coo.row[mask], coo.col[mask])), shape=matrix.shape, dtype=np.float32
+        )
+    return build(~held), build(held)
+
+
+def _solve_rows(matrix, fixed, regularization, implicit, alpha, global_mean, out):
+    """Une demi-itération: chaque ligne de `out` résout son système régularisé"""
+    factors = fixed.shape[1]
+    identity = np.eye(factors, dtype=np.float64)
+    gram = fixed.T @ fixed if implicit else None
+
+    for row in range(matrix.shape[0]):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        if start == end:
+            out[row] = 0
+            continue
+        cols = matrix.indices[start:end]
+        values = matrix.data[start:end].astype(np.float64)
+        y = fixed[cols]
+
+        if implicit:
+            confidence = alpha * values
+            # YᵀCY = YᵀY + Yᵀ(C - I)Y, seules les séries notées contribuent au second terme
+            a = gram + (y.T * confidence) @ y + regularization * identity
+            b = (y.T * (1.0 + confidence)).sum(axis=1)
+        else:
+            a = y.T @ y + regularization * len(cols) * identity
+            b = y.T @ (values - global_mean)
+        out[row] = np.linalg.solve(a, b)
+
+
+def train(matrix, factors=64, regularization=0.1, iterations=15, implicit=False, alpha=40.0,
+          user_init=None, item_init=None, seed=0, callback=None):
+    """
+    Entraîner les facteurs (utilisateurs, séries) sur une matrice CSR utilisateurs × séries
+    user_init / item_init: facteurs de départ pour une reprise (voir ALSModel.warm_start)
+    """
+    rng = np.random.default_rng(seed)
+    n_users, n_series = matrix.shape
+    matrix = matrix.tocsr()
+    matrix_t = matrix.T.tocsr()
+    global_mean = 0.0 if implicit else float(matrix.data.mean()) if matrix.nnz else 0.0
+
+    users = user_init if user_init is not None else rng.normal(0, 0.01, (n_users, factors))
+    items = item_init if item_init is not None else rng.normal(0, 0.01, (n_series, factors))
+    users = np.asarray(users, dtype=np.float64)
+    items = np.asarray(items, dtype=np.float64)
+
+    for iteration in range(iterations):
+        _solve_rows(matrix, items, regularization, implicit, alpha, global_mean, users)
+        _solve_rows(matrix_t, users, regularization, implicit, alpha, global_mean, items)
+        if callback:
+            callback(iteration + 1, users, items, global_mean)
+
+    return users.astype(np.float32), items.astype(np.float32), global_mean
+
+
+def rmse(matrix, users, items, global_mean):
+    """Erreur quadratique moyenne sur les notes de `matrix`"""
+    coo = matrix.tocoo()
+    if not coo.nnz:
+        return 0.0
+    predictions = global_mean + np.einsum('ij,ij->i', users[coo.row], items[coo.col])
+    return float(np.sqrt(np.mean((predictions - coo.data) ** 2)))
+
+
+def recall_at_k(train_matrix, holdout, users, items, k=10, max_users=2000, seed=0):
+    """
+    Part des séries aimées du holdout retrouvées dans le top-k (hors séries d'entraînement),
+    sur un échantillon d'au plus max_users utilisateurs
+    """
+    liked = holdout.copy()
+    liked.data = (liked.data >= LIKE_THRESHOLD).astype(np.float32)
+    liked.eliminate_zeros()
+    candidates = np.flatnonzero(np.diff(liked.indptr))
+    if len(candidates) > max_users:
+        candidates = np.random.default_rng(seed).choice(candidates, max_users, replace=False)
+
+    hits = total = 0
+    for u in candidates:
+        scores = items @ users[u]
+        scores[train_matrix.indices[train_matrix.indptr[u]:train_matrix.indptr[u + 1]]] = -np.inf
+        top = np.argpartition(-scores, min(k, len(scores) - 1))[:k]
+        relevant = liked.indices[liked.indptr[u]:liked.indptr[u + 1]]
+        hits += len(np.intersect1d(top, relevant))
+        total += min(len(relevant), k)
+    return hits / total if total else 0.0
+
+
+class ALSModel:
+    """
+    Facteurs entraînés et correspondances d'identifiants
+    Fichiers: user_factors.npy, item_factors.npy, user_ids.npy, series_ids.npy, adult.npy, meta.json
+    """
+
+    def __init__(self, user_factors, item_factors, user_ids, series_ids, meta, adult=None):
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        self.user_ids = user_ids
+        self.series_ids = series_ids
+        self.meta = meta
+        self.adult = np.zeros(len(series_ids), dtype=bool) if adult is None else np.asarray(adult, dtype=bool)
+        self.user_index = {user_id: i for i, user_id in enumerate(np.asarray(user_ids).tolist())}
+        self.series_index = {series_id: j for j, series_id in enumerate(np.asarray(series_ids).tolist())}
+        self._gram = None
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'user_factors.npy'), self.user_factors.astype(np.float32))
+        np.save(os.path.join(path, 'item_factors.npy'), self.item_factors.astype(np.float32))
+        np.save(os.path.join(path, 'user_ids.npy'), np.asarray(self.user_ids))
+        np.save(os.path.join(path, 'series_ids.npy'), np.asarray(self.series_ids))
+        np.save(os.path.join(path, 'adult.npy'), self.adult)
+        with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, indent=2)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        mode = 'r' if mmap else None
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        # Modèle entraîné avant l'ajout du masque: filtrage au seul describe_scored
+        adult_path = os.path.join(path, 'adult.npy')
+        return cls(
+            np.load(os.path.join(path, 'user_factors.npy'), mmap_mode=mode),
+            np.load(os.path.join(path, 'item_factors.npy'), mmap_mode=mode),
+            np.load(os.path.join(path, 'user_ids.npy')),
+            np.load(os.path.join(path, 'series_ids.npy')),
+            meta,
+            adult=np.load(adult_path) if os.path.exists(adult_path) else None,
+        )
+
+    def warm_start(self, ratings, seed=0):
+        """Facteurs initiaux alignés sur les index de `ratings` (nouvelles lignes aléatoires)"""
+        rng = np.random.default_rng(seed)
+        factors = self.item_factors.shape[1]
+
+        def align(ids, index, previous):
+            init = rng.normal(0, 0.01, (len(ids), factors))
+            for row, identifier in enumerate(ids):
+                old = index.get(identifier)
+                if old is not None:
+                    init[row] = previous[old]
+            return init
+
+        return (
+            align(ratings.user_ids, self.user_index, self.user_factors),
+            align(ratings.series_ids, self.series_index, self.item_factors),
+        )
+
+    def fold_in(self, rated):
+        """Vecteur d'un utilisateur absent de l'entraînement, à partir de ses notes {series_id: note}"""
+        known = [(self.series_index[s], r) for s, r in rated.items() if s in self.series_index]
+        if not known:
+            return None
+        cols = np.array([j for j, _ in known])
+        values = np.array([r for _, r in known], dtype=np.float64)
+        y = np.asarray(self.item_factors[cols], dtype=np.float64)
+        regularization = self.meta.get('regularization', 0.1)
+        identity = np.eye(y.shape[1])
+        if self.meta.get('implicit'):
+            alpha = self.meta.get('alpha', 40.0)
+            if self._gram is None:
+                items = np.asarray(self.item_factors, dtype=np.float64)
+                self._gram = items.T @ items
+            a = self._gram + (y.T * (alpha * values)) @ y + regularization * identity
+            b = (y.T * (1.0 + alpha * values)).sum(axis=1)
+        else:
+            a = y.T @ y + regularization * len(cols) * identity
+            b = y.T @ (values - self.meta.get('global_mean', 0.0))
+        return np.linalg.solve(a, b).astype(np.float32)
+
+    def recommend(self, user_id, rated, k=10):
+        """[(series_id, score)] des k séries non notées et non adultes les mieux prédites"""
+        row = self.user_index.get(user_id)
+        vector = self.user_factors[row] if row is not None else self.fold_in(rated)
+        if vector is None:
+            return []
+
+        # Un seul produit matrice-vecteur sur tous les facteurs séries
+        scores = np.asarray(self.item_factors) @ np.asarray(vector)
+        scores += self.meta.get('global_mean', 0.0)
+        seen = [self.series_index[s] for s in rated if s in self.series_index]
+        scores[seen] = -np.inf
+        scores[self.adult] = -np.inf
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(str(self.series_ids[j]), float(scores[j])) for j in top if np.isfinite(scores[j])]
+
+
+def load_ratings(ratings_path=None):
+    """Matrice des notes depuis ratings.csv, ou depuis Neo4j"""
+    return RatingMatrix.from_csv(ratings_path) if ratings_path else RatingMatrix.from_neo4j()
+
+
+def load_adult_mask(series_ids, ratings_path=None, series_path=None):
+    """
+    Masque des séries adultes: series.csv si fourni, Neo4j si les notes en
+    viennent, sinon aucun (filtrage au seul describe_scored)
+    """
+    if series_path:
+        return adult_mask(series_ids, load_series_info(series_path))
+    if not ratings_path:
+        return adult_mask(series_ids, load_series_info())
+    return None
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """Modèle partagé par le processus, chargé depuis settings.ALS_MODEL['PATH']"""
+    global _model
+    from django.conf import settings
+    with _model_lock:
+        if _model is None:
+            config = getattr(settings, 'ALS_MODEL', {})
+            _model = ALSModel.load(config.get('PATH', os.path.join(settings.BASE_DIR, '.als_model')))
+        return _model
+
+
+def reset_model():
+    """Oublier le modèle chargé (après réentraînement)"""
+    global _model
+    with _model_lock:
+        _model = None
+
+
+def recommend_for_user(user_id, k=10):
+    """
+    Recommandations ALS au format (series_id, title, year, genres, score).
+    Une série adulte absente du masque du modèle n'est écartée qu'à la
+    description: on élargit alors le top plutôt que de rendre moins de k séries.
+    """
+    from recommendations.models import Rating, Series
+    rated = Rating.get_user_rating_values(user_id)
+    model = get_model()
+    fetch = k
+    while True:
+        hits = model.recommend(user_id, rated, fetch)
+        described = Series.describe_scored(hits)
+        if len(described) >= k or len(hits) < fetch:
+            return described[:k]
+        fetch *= 2
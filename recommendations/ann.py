@@ -0,0 +1,269 @@
+# recommendations/ann.py
+"""
+Plus proches voisins approchés (ANN) sur des embeddings de séries
+Embedding d'une série = SVD tronquée de la matrice des notes (facteurs séries)
+concaténée à un encodage one-hot des genres, normalisé L2 (produit scalaire = cosinus).
+Les vecteurs sont rangés dans un index IVF (k-means sphérique, listes inversées
+contiguës) persisté en fichiers .npy chargés en memory-map: une requête ne lit
+que les nprobe listes les plus proches du vecteur cherché. Les séries adultes
+connues à la construction sont écartées avant la sélection du top-k.
+
+Dépendances: numpy, scipy (pip install numpy scipy)
+Construction: python manage.py build_ann_index
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+from scipy.sparse.linalg import svds
+
+from recommendations.sparse_cf import RatingMatrix, adult_mask, load_series_info
+
+
+LIKE_THRESHOLD = 4.0
+
+
+def build_embeddings(ratings, series_info, dim=64, genre_weight=0.5):
+    """
+    (series_ids, vecteurs float32 normalisés) pour toutes les séries connues,
+    notées ou non (une série sans note n'a que sa composante genres)
+    """
+    series_ids = list(ratings.series_ids)
+    known = set(series_ids)
+    series_ids.extend(series_id for series_id in series_info if series_id not in known)
+    n_series = len(series_ids)
+
+    # Composante notes: facteurs séries de la SVD tronquée, V * sqrt(S)
+    matrix = ratings.matrix.astype(np.float64)
+    rank = min(dim, min(matrix.shape) - 1)
+    rating_part = np.zeros((n_series, max(rank, 0)), dtype=np.float32)
+    if rank > 0:
+        _, singular, vt = svds(matrix, k=rank)
+        rating_part[:matrix.shape[1]] = (vt.T * np.sqrt(singular)).astype(np.float32)
+    _normalize_rows(rating_part)
+
+    # Composante genres: one-hot, normalisée puis pondérée
+    genres = sorted({genre for meta in series_info.values() for genre in meta.get('genres', [])})
+    genre_index = {genre: i for i, genre in enumerate(genres)}
+    genre_part = np.zeros((n_series, len(genres)), dtype=np.float32)
+    for row, series_id in enumerate(series_ids):
+        for genre in series_info.get(series_id, {}).get('genres', []):
+            genre_part[row, genre_index[genre]] = 1.0
+    _normalize_rows(genre_part)
+    genre_part *= genre_weight
+
+    vectors = np.hstack([rating_part, genre_part])
+    _normalize_rows(vectors)
+    return series_ids, vectors
+
+
+def _normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+
+
+def _top(scores, k):
+    """Indices des k meilleurs scores, triés décroissants"""
+    if len(scores) > k:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+class IVFIndex:
+    """
+    Index IVF: centroïdes k-means + vecteurs triés par liste (offsets[i]:offsets[i+1])
+    Fichiers: centroids.npy, vectors.npy, ids.npy, offsets.npy, adult.npy, meta.json
+    """
+
+    def __init__(self, centroids, vectors, ids, offsets, nprobe=8, adult=None):
+        self.centroids = centroids
+        self.vectors = vectors
+        self.ids = ids
+        self.offsets = offsets
+        self.nprobe = nprobe
+        self.adult = np.zeros(len(ids), dtype=bool) if adult is None else adult
+        self.row_of = {series_id: row for row, series_id in enumerate(ids.tolist())}
+
+    @classmethod
+    def build(cls, ids, vectors, nlist=None, iterations=10, sample_size=100000, seed=0, batch_size=65536,
+              adult=None):
+        """k-means sphérique sur un échantillon, puis affectation de tous les vecteurs"""
+        rng = np.random.default_rng(seed)
+        n = len(vectors)
+        nlist = max(1, min(nlist or int(np.sqrt(n)), n))
+
+        sample = vectors[rng.choice(n, size=min(n, max(sample_size, nlist)), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = np.flatnonzero(np.bincount(assignment, minlength=nlist) == 0)
+            # Liste vide: la réensemencer avec un vecteur tiré au hasard
+            sums[empty] = sample[rng.choice(len(sample), size=len(empty))]
+            _normalize_rows(sums)
+            centroids = sums
+
+        assignment = np.concatenate([
+            np.argmax(vectors[start:start + batch_size] @ centroids.T, axis=1)
+            for start in range(0, n, batch_size)
+        ])
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=nlist), out=offsets[1:])
+
+        return cls(
+            centroids.astype(np.float32),
+            np.ascontiguousarray(vectors[order], dtype=np.float32),
+            np.asarray(ids)[order],
+            offsets,
+            adult=None if adult is None else np.asarray(adult, dtype=bool)[order],
+        )
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'centroids.npy'), self.centroids)
+        np.save(os.path.join(path, 'vectors.npy'), self.vectors)
+        np.save(os.path.join(path, 'ids.npy'), self.ids)
+        np.save(os.path.join(path, 'offsets.npy'), self.offsets)
+        np.save(os.path.join(path, 'adult.npy'), self.adult)
+        with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'count': len(self.ids), 'dim': self.vectors.shape[1], 'nlist': len(self.centroids)}, f)
+
+    @classmethod
+    def load(cls, path, nprobe=8, mmap=True):
+        """Charger un index persisté; vecteurs et ids restent sur disque (memory-map)"""
+        mode = 'r' if mmap else None
+        # Index construit avant l'ajout du masque: filtrage au seul describe_scored
+        adult_path = os.path.join(path, 'adult.npy')
+        return cls(
+            np.load(os.path.join(path, 'centroids.npy')),
+            np.load(os.path.join(path, 'vectors.npy'), mmap_mode=mode),
+            np.load(os.path.join(path, 'ids.npy'), mmap_mode=mode),
+            np.load(os.path.join(path, 'offsets.npy')),
+            nprobe=nprobe,
+            adult=np.load(adult_path) if os.path.exists(adult_path) else None,
+        )
+
+    def vector(self, series_id):
+        row = self.row_of.get(series_id)
+        return None if row is None else np.asarray(self.vectors[row])
+
+    def search(self, query, k=10, nprobe=None, exclude=()):
+        """
+        [(series_id, score)] des k vecteurs les plus proches de `query` (produit
+        scalaire), hors séries adultes et `exclude`
+        """
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        lists = _top(self.centroids @ query, nprobe)
+
+        rows = np.concatenate([
+            np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists
+        ])
+        if not len(rows):
+            return []
+        # Les listes sont contiguës: lecture séquentielle des pages mappées
+        scores = np.concatenate([
+            np.asarray(self.vectors[self.offsets[i]:self.offsets[i + 1]]) @ query for i in lists
+        ])
+        scores[self.adult[rows]] = -np.inf
+        if exclude:
+            excluded = [self.row_of[series_id] for series_id in exclude if series_id in self.row_of]
+            scores[np.isin(rows, excluded)] = -np.inf
+
+        top = _top(scores, k)
+        return [
+            (str(self.ids[rows[i]]), float(scores[i]))
+            for i in top if np.isfinite(scores[i])
+        ]
+
+
+def build_index(ratings_path=None, series_path=None, series_genres_path=None,
+                dim=64, genre_weight=0.5, nlist=None, seed=0):
+    """Construire l'index depuis les CSV d'import, ou depuis Neo4j si aucun fichier n'est donné"""
+    if ratings_path:
+        ratings = RatingMatrix.from_csv(ratings_path)
+        series_info = load_series_info(series_path, series_genres_path) if series_path else {}
+    else:
+        ratings = RatingMatrix.from_neo4j()
+        series_info = load_series_info()
+    series_ids, vectors = build_embeddings(ratings, series_info, dim=dim, genre_weight=genre_weight)
+    return IVFIndex.build(
+        series_ids, vectors, nlist=nlist, seed=seed, adult=adult_mask(series_ids, series_info)
+    )
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Index partagé par le processus, chargé depuis settings.ANN_INDEX['PATH']"""
+    global _index
+    from django.conf import settings
+    with _index_lock:
+        if _index is None:
+            config = getattr(settings, 'ANN_INDEX', {})
+            _index = IVFIndex.load(
+                config.get('PATH', os.path.join(settings.BASE_DIR, '.ann_index')),
+                nprobe=config.get('NPROBE', 8),
+            )
+        return _index
+
+
+def reset_index():
+    """Oublier l'index chargé (après reconstruction)"""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def _describe_top(index, query, k, exclude):
+    """
+    Top-k décrit par Series.describe_scored. Une série adulte absente du masque
+    de l'index (métadonnées incomplètes à la construction) n'est écartée qu'à la
+    description: on élargit alors la recherche plutôt que de rendre moins de k séries.
+    """
+    from recommendations.models import Series
+    fetch = k
+    while True:
+        hits = index.search(query, fetch, exclude=exclude)
+        described = Series.describe_scored(hits)
+        if len(described) >= k or len(hits) < fetch:
+            return described[:k]
+        fetch *= 2
+
+
+def similar_series(series_id, k=10):
+    """Les k séries dont l'embedding est le plus proche de celui de `series_id`"""
+    index = get_index()
+    vector = index.vector(series_id)
+    if vector is None:
+        return []
+    return _describe_top(index, vector, k, {series_id})
+
+
+def recommend_for_user(user_id, k=10):
+    """
+    Recommandations: vecteur utilisateur = moyenne des séries aimées pondérée
+    par (note - 3), recherche ANN hors séries déjà notées
+    """
+    from recommendations.models import Rating
+    rated = Rating.get_user_rating_values(user_id)
+
+    index = get_index()
+    query_vector = None
+    for series_id, rating in rated.items():
+        vector = index.vector(series_id)
+        if vector is not None and rating >= LIKE_THRESHOLD:
+            weighted = vector * (rating - 3)
+            query_vector = weighted if query_vector is None else query_vector + weighted
+    if query_vector is None:
+        return []
+
+    query_vector = query_vector / np.linalg.norm(query_vector)
+    return _describe_top(index, query_vector, k, set(rated))
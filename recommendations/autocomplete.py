@@ -0,0 +1,345 @@
+# recommendations/autocomplete.py
+"""
+Autocomplétion des titres de séries et des noms d'acteurs, servie sans base
+de données depuis un index de préfixes en mémoire:
+- un tableau trié de clés (chaque début de mot du libellé, accents et casse
+  repliés), parcouru par recherche dichotomique;
+- le top-k par popularité (nombre de notes) d'un préfixe très fréquent
+  (« t », « the »...) est mémorisé, pour ne pas reclasser des milliers
+  d'entrées à chaque frappe.
+
+L'index est construit depuis Neo4j en tâche de fond au démarrage du serveur
+(wsgi.py / asgi.py, AUTOCOMPLETE['PRELOAD']) : tant qu'il n'est pas prêt, les
+suggestions sont vides plutôt que de faire attendre la requête. Il est ensuite
+tenu à jour par Series.create / update / delete et, pour la popularité, par
+Rating.create / delete ; après un import (Series.bulk_create) il est reconstruit
+en tâche de fond, l'ancien index restant servi jusque-là.
+Comme le cache 'memory', il est propre à chaque processus.
+
+Configuration: settings.AUTOCOMPLETE
+"""
+
+import heapq
+import threading
+from bisect import bisect_left, insort
+
+from django.conf import settings
+
+
+DEFAULTS = {
+    'LIMIT': 8,
+    'MAX_LIMIT': 20,
+    'PRELOAD': True,        # construire l'index au démarrage du serveur (thread de fond)
+    'HOT_PREFIX_SIZE': 256, # au-delà de N clés, le top-k d'un préfixe est mémorisé
+}
+
+END = '\uffff'
+
+# Champs d'une entrée propres à l'index, absents des suggestions
+INTERNAL_FIELDS = ('keys', 'actors')
+
+
+def get_config():
+    return dict(DEFAULTS, **getattr(settings, 'AUTOCOMPLETE', {}))
+
+
+def prefix_keys(*labels):
+    """Clés indexées d'un libellé: le libellé replié à partir de chaque mot"""
+    from recommendations.models import fold
+
+    keys = set()
+    for label in labels:
+        words = fold(label or '').split()
+        keys.update(' '.join(words[i:]) for i in range(len(words)))
+    return keys
+
+
+class PrefixIndex:
+    """Tableau trié de (clé, référence); référence = (type, identifiant)"""
+
+    def __init__(self, max_limit=20, hot_prefix_size=256):
+        self.max_limit = max_limit
+        self.hot_prefix_size = hot_prefix_size
+        self.keys = []      # [(clé, ref)] triées
+        self.entries = {}   # ref -> {type, id, label, year, popularity, keys, actors (séries)}
+        self.hot = {}       # (préfixe, types) -> top max_limit des refs
+        self.lock = threading.Lock()
+
+    @classmethod
+    def build(cls, entries, **kwargs):
+        """Index construit en une fois (un seul tri) depuis des dicts d'entrées"""
+        index = cls(**kwargs)
+        for entry in entries:
+            index.entries[(entry['type'], entry['id'])] = entry
+        index.keys = sorted(
+            (key, ref) for ref, entry in index.entries.items() for key in entry['keys']
+        )
+        return index
+
+    def _rank(self, ref):
+        entry = self.entries.get(ref)
+        return (-entry['popularity'], entry['label']) if entry else (0, '')
+
+    def _top(self, lo, hi, limit, types=None):
+        refs = {
+            ref for _, ref in self.keys[lo:hi]
+            if ref in self.entries and (not types or ref[0] in types)
+        }
+        return heapq.nsmallest(limit, refs, key=self._rank)
+
+    def search(self, text, limit=8, types=None):
+        """Entrées dont un mot du libellé commence par `text`, par popularité décroissante"""
+        from recommendations.models import fold
+
+        prefix = ' '.join(fold(text or '').split())
+        if not prefix:
+            return []
+        limit = min(limit, self.max_limit)
+        types = frozenset(types) if types else None
+        keys = self.keys
+        lo = bisect_left(keys, (prefix,))
+        hi = bisect_left(keys, (prefix + END,), lo)
+
+        if hi - lo > self.hot_prefix_size:
+            top = self.hot.get((prefix, types))
+            if top is None:
+                top = self.hot[(prefix, types)] = self._top(lo, hi, self.max_limit, types)
+        else:
+            top = self._top(lo, hi, limit, types)
+
+        results = []
+        for ref in top[:limit]:
+            entry = self.entries.get(ref)
+            if entry is not None:
+                results.append({k: v for k, v in entry.items() if k not in INTERNAL_FIELDS})
+        return results
+
+    def _forget_prefixes(self, key):
+        if not self.hot:
+            return
+        prefixes = {key[:i] for i in range(1, len(key) + 1)}
+        for cached in list(self.hot):
+            if cached[0] in prefixes:
+                self.hot.pop(cached, None)
+
+    def put(self, entry_type, identifier, label, year=None, popularity=None, aliases=()):
+        """Ajouter ou mettre à jour une entrée (popularité conservée si non fournie)"""
+        ref = (entry_type, identifier)
+        keys = prefix_keys(label, *aliases)
+        with self.lock:
+            previous = self.entries.get(ref)
+            if popularity is None:
+                popularity = previous['popularity'] if previous else 0
+            old_keys = previous['keys'] if previous else set()
+            for key in old_keys - keys:
+                position = bisect_left(self.keys, (key, ref))
+                if position < len(self.keys) and self.keys[position] == (key, ref):
+                    del self.keys[position]
+            for key in keys - old_keys:
+                insort(self.keys, (key, ref))
+            self.entries[ref] = {
+                'type': entry_type,
+                'id': identifier,
+                'label': label,
+                'year': year,
+                'popularity': popularity,
+                'keys': keys,
+                'actors': previous.get('actors', []) if previous else [],
+            }
+            for key in old_keys | keys:
+                self._forget_prefixes(key)
+
+    def add_popularity(self, entry_type, identifier, delta):
+        """Ajuster la popularité d'une entrée (note ajoutée / retirée)"""
+        ref = (entry_type, identifier)
+        with self.lock:
+            entry = self.entries.get(ref)
+            if entry is None:
+                return None
+            entry['popularity'] = max(0, entry['popularity'] + delta)
+            for key in entry['keys']:
+                self._forget_prefixes(key)
+            return entry
+
+    def remove(self, entry_type, identifier):
+        ref = (entry_type, identifier)
+        with self.lock:
+            entry = self.entries.pop(ref, None)
+            if entry is None:
+                return
+            for key in entry['keys']:
+                position = bisect_left(self.keys, (key, ref))
+                if position < len(self.keys) and self.keys[position] == (key, ref):
+                    del self.keys[position]
+                self._forget_prefixes(key)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# Popularité lue dans l'agrégat s.rating_count (tenu par Rating.create / delete),
+# sans parcourir les relations RATED
+SERIES_QUERY = """
+    MATCH (s:Series)
+    WHERE s.is_adult = false
+    RETURN s.series_id as id,
+           s.title as label,
+           s.original_title as original_title,
+           s.year as year,
+           coalesce(s.rating_count, 0) as popularity,
+           [(s)-[:HAS_ACTOR]->(a:Actor) WHERE a.name IS NOT NULL | a.actor_id] as actors
+    """
+
+# Popularité d'un acteur: notes reçues par ses séries
+ACTORS_QUERY = """
+    MATCH (a:Actor)
+    WHERE a.name IS NOT NULL
+    RETURN a.actor_id as id,
+           a.name as label,
+           reduce(total = 0, count IN [(a)<-[:HAS_ACTOR]-(s:Series) | coalesce(s.rating_count, 0)]
+                  | total + count) as popularity
+    """
+
+
+def load_entries():
+    """Entrées de l'index depuis Neo4j (deux lectures, au chargement seulement)"""
+    from tv_recommender.neo4j_db import neo4j_db
+
+    for row in neo4j_db.read(SERIES_QUERY):
+        row = dict(row, type='series')
+        original_title = row.pop('original_title')
+        aliases = [original_title] if original_title and original_title != row['label'] else []
+        row['keys'] = prefix_keys(row['label'], *aliases)
+        yield row
+    for row in neo4j_db.read(ACTORS_QUERY):
+        yield dict(row, type='actor', year=None, keys=prefix_keys(row['label']))
+
+
+_index = None
+_index_lock = threading.Lock()
+# Modifications reçues pendant une reconstruction, rejouées sur le nouvel index:
+# [(change, idempotent)], voir rebuild
+_pending = None
+
+
+def build_index(entries=None):
+    config = get_config()
+    return PrefixIndex.build(
+        load_entries() if entries is None else entries,
+        max_limit=config['MAX_LIMIT'],
+        hot_prefix_size=config['HOT_PREFIX_SIZE'],
+    )
+
+
+def get_index():
+    """Index partagé par le processus, construit depuis Neo4j s'il n'existe pas encore (bloquant)"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = build_index()
+        return _index
+
+
+def rebuild():
+    """
+    Reconstruire l'index depuis Neo4j puis remplacer l'ancien, qui reste servi
+    pendant la lecture. Renvoie False si une reconstruction est déjà en cours.
+    """
+    global _index, _pending
+    with _index_lock:
+        if _pending is not None:
+            return False
+        _pending = []
+    try:
+        entries = list(load_entries())
+        with _index_lock:
+            # Notes reçues pendant la lecture: déjà comptées dans le rating_count lu
+            # (au pire une note manquée, rattrapée à la reconstruction suivante), alors
+            # que les ajouts/suppressions de séries peuvent être rejoués sans risque
+            _pending[:] = [(change, idempotent) for change, idempotent in _pending if idempotent]
+        index = build_index(entries)
+    except Exception:
+        with _index_lock:
+            _pending = None
+        raise
+    with _index_lock:
+        for change, _ in _pending:
+            change(index)
+        _index, _pending = index, None
+    return True
+
+
+def preload():
+    """(Re)construire l'index en tâche de fond (démarrage du serveur, après un import)"""
+    def run():
+        try:
+            rebuild()
+        except Exception:
+            # Neo4j indisponible: l'index sera construit au prochain preload / get_index
+            pass
+    threading.Thread(target=run, name='autocomplete-preload', daemon=True).start()
+
+
+def start():
+    """Au démarrage du serveur (wsgi.py / asgi.py), si AUTOCOMPLETE['PRELOAD']"""
+    if get_config()['PRELOAD']:
+        preload()
+
+
+def reset_index():
+    """Après un import: reconstruire en tâche de fond l'index déjà chargé, sinon rien"""
+    if _index is not None:
+        preload()
+
+
+def _apply(change, idempotent=True):
+    """
+    Appliquer `change(index)` à l'index chargé et à celui en cours de reconstruction
+    (un changement non idempotent n'y est rejoué que s'il suit la lecture depuis Neo4j)
+    """
+    with _index_lock:
+        index = _index
+        if _pending is not None:
+            _pending.append((change, idempotent))
+    if index is not None:
+        change(index)
+
+
+def series_saved(series):
+    """Répercuter une création/modification de série (si l'index est chargé)"""
+    if not series:
+        return
+    if series.get('is_adult'):
+        _apply(lambda index: index.remove('series', series['series_id']))
+        return
+    original_title = series.get('original_title')
+    _apply(lambda index: index.put(
+        'series', series['series_id'], series['title'], year=series.get('year'),
+        aliases=[original_title] if original_title and original_title != series['title'] else [],
+    ))
+
+
+def series_deleted(series_id):
+    _apply(lambda index: index.remove('series', series_id))
+
+
+def rating_changed(series_id, delta):
+    """Note ajoutée (+1) ou retirée (-1): popularité de la série et de ses acteurs"""
+    def change(index):
+        entry = index.add_popularity('series', series_id, delta)
+        for actor_id in entry['actors'] if entry else []:
+            index.add_popularity('actor', actor_id, delta)
+    _apply(change, idempotent=False)
+
+
+def complete(text, limit=None, types=None):
+    """
+    Suggestions pour `text` (titres et/ou acteurs), sans accès à la base.
+    Index pas encore prêt: aucune suggestion, et construction lancée en tâche de fond.
+    """
+    index = _index
+    if index is None:
+        if _pending is None:
+            preload()
+        return []
+    return index.search(text, limit or get_config()['LIMIT'], types)
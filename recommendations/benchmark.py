@@ -0,0 +1,517 @@
+# recommendations/benchmark.py
+"""
+Banc d'essai des requêtes des modèles (python manage.py benchmark_models)
+- mode neo4j: chaque méthode de User/Series/Genre/Actor/Rating/Similarity/
+  Recommendation est chronométrée; les requêtes Cypher qu'elle envoie sont
+  capturées puis rejouées avec PROFILE dans une transaction annulée
+  (db hits, lignes) sans modifier la base.
+- mode python: parties sans base (parseurs CSV, matrice creuse, index ANN,
+  ALS, fusion du pipeline hybride, cache) sur le même graphe synthétique.
+Le rapport JSON peut être comparé à un rapport de référence (compare()).
+"""
+
+import csv
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+from recommendations import csv_import
+
+
+class Case:
+    """Méthode à mesurer: run(i) est appelée à chaque répétition i"""
+
+    def __init__(self, name, run):
+        self.name = name
+        self.run = run
+
+
+def percentiles(samples):
+    """Statistiques de latence en millisecondes"""
+    ordered = sorted(samples)
+
+    def rank(fraction):
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'p50_ms': round(rank(0.50) * 1000, 3),
+        'p90_ms': round(rank(0.90) * 1000, 3),
+        'p99_ms': round(rank(0.99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+
+def time_case(case, repeat, warmup=1):
+    """Latences (secondes) de `repeat` exécutions après `warmup` exécutions ignorées"""
+    for i in range(warmup):
+        case.run(i)
+    samples = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        case.run(warmup + i)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+# ===== CAPTURE ET PROFILAGE CYPHER =====
+
+@contextmanager
+def record_queries(connection):
+    """Capturer les (requête, paramètres) envoyés à neo4j_db pendant le bloc"""
+    recorded = []
+    originals = {}
+
+    def wrap(name, build_params):
+        original = getattr(connection, name)
+        originals[name] = original
+
+        def recorder(query, *args, **kwargs):
+            recorded.append((query, build_params(*args, **kwargs)))
+            return original(query, *args, **kwargs)
+        setattr(connection, name, recorder)
+
+    for name in ('query', 'read', 'write'):
+        wrap(name, lambda parameters=None, db=None: parameters or {})
+    wrap('write_batch', lambda rows: {'rows': rows})
+    try:
+        yield recorded
+    finally:
+        for name in originals:
+            delattr(connection, name)
+
+
+SCHEMA_PREFIXES = ('CREATE INDEX', 'CREATE CONSTRAINT', 'CREATE FULLTEXT', 'DROP ')
+
+
+def _plan_totals(plan):
+    """Somme des db hits d'un plan PROFILE (dict du driver, récursif)"""
+    if not plan:
+        return 0
+    hits = plan.get('dbHits', plan.get('db_hits', 0)) or 0
+    return hits + sum(_plan_totals(child) for child in plan.get('children', []))
+
+
+def profile_query(connection, query, parameters):
+    """(db hits, lignes) d'une requête rejouée avec PROFILE puis annulée"""
+    with connection.session() as session:
+        tx = session.begin_transaction()
+        try:
+            result = tx.run(f'PROFILE {query}', parameters)
+            rows = sum(1 for _ in result)
+            summary = result.consume()
+            return _plan_totals(summary.profile), rows
+        finally:
+            tx.rollback()
+
+
+def profile_case(connection, case):
+    """Totaux PROFILE de toutes les requêtes envoyées par un appel du cas"""
+    with record_queries(connection) as recorded:
+        case.run(0)
+    db_hits = rows = 0
+    for query, parameters in recorded:
+        # Les commandes de schéma (index, contraintes) ne sont pas profilables
+        if query.lstrip().upper().startswith(SCHEMA_PREFIXES):
+            continue
+        hits, count = profile_query(connection, query, parameters)
+        db_hits += hits
+        rows += count
+    return {'queries': len(recorded), 'db_hits': db_hits, 'rows': rows}
+
+
+# ===== CHARGEMENT DU GRAPHE =====
+
+def load_graph(graph, batch_size=10000, progress=None):
+    """Charger un SyntheticGraph via les bulk_create des modèles; débit par étape"""
+    from recommendations.models import Actor, Genre, Rating, Series, User
+
+    stages = [
+        ('genres', graph.iter_genres(), Genre.bulk_create),
+        ('series', graph.iter_series(), Series.bulk_create),
+        ('actors', graph.iter_actors(), Actor.bulk_create),
+        ('series_genres', graph.iter_series_genres(), Genre.bulk_link_to_series),
+        ('series_actors', graph.iter_series_actors(), Actor.bulk_link_to_series),
+        ('users', graph.iter_users(), User.bulk_create),
+        ('ratings', graph.iter_ratings(), Rating.bulk_create),
+    ]
+    report = {}
+    for stage, rows, writer in stages:
+        throughput = csv_import.Throughput()
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                writer(batch)
+                throughput.add(len(batch))
+                batch = []
+        if batch:
+            writer(batch)
+            throughput.add(len(batch))
+        report[stage] = {
+            'rows': throughput.rows,
+            'seconds': round(throughput.elapsed, 3),
+            'rows_per_second': round(throughput.rate, 1),
+        }
+        if progress:
+            progress(stage, report[stage])
+
+    # Compteurs dénormalisés (bulk_create ne les tient pas à jour), débit en notes agrégées
+    throughput = csv_import.Throughput()
+    Rating.repair_aggregates(batch_size=batch_size)
+    throughput.add(report['ratings']['rows'])
+    report['rating_aggregates'] = {
+        'rows': throughput.rows,
+        'seconds': round(throughput.elapsed, 3),
+        'rows_per_second': round(throughput.rate, 1),
+    }
+    if progress:
+        progress('rating_aggregates', report['rating_aggregates'])
+    return report
+
+
+# ===== CAS: MÉTHODES DES MODÈLES =====
+
+def _cycle(values):
+    return lambda i: values[i % len(values)]
+
+
+def model_cases(graph):
+    """Un cas par méthode des modèles, sur des identifiants du graphe synthétique"""
+    from recommendations.models import (
+        Actor, Genre, Rating, Recommendation, Series, Similarity, User,
+    )
+    from recommendations.seen import seen_sets
+
+    # Têtes et queues des distributions de Zipf
+    series_index = sorted({0, 1, graph.series // 100, graph.series // 2, graph.series - 1})
+    user_index = sorted({0, graph.users // 10, graph.users // 2, graph.users - 1})
+    actor_index = sorted({0, graph.actors // 100, graph.actors - 1})
+    series_ids = [graph.series_id(i) for i in series_index]
+    user_ids = [graph.user_id(i) for i in user_index]
+    actor_ids = [graph.actor_id(i) for i in actor_index]
+    titles = [row['title'] for row in graph.iter_series(0, 1)] + \
+             [row['title'] for row in graph.iter_series(graph.series - 1, graph.series)]
+
+    series = _cycle(series_ids)
+    users = _cycle(user_ids)
+    actors = _cycle(actor_ids)
+    title = _cycle(titles)
+    keyword = _cycle(['dark', 'city', 'storm 1', 'zzz-no-match'])
+
+    bench_user = 'bench-user'
+    bench_series = 'bench-series'
+    cast_ids = [graph.actor_id(i) for i in range(min(graph.actors, 300))]
+
+    cases = [
+        # User
+        Case('User.create', lambda i: User.create(bench_user, 'bench', 'bench@example.com')),
+        Case('User.bulk_create', lambda i: User.bulk_create([
+            {'user_id': f'bench-bulk-{j}', 'name': f'bench{j}', 'email': f'bench{j}@example.com',
+             'age': None, 'gender': None, 'occupation': None, 'join_date': None}
+            for j in range(100)
+        ])),
+        Case('User.get', lambda i: User.get(users(i))),
+        Case('User.get_by_name', lambda i: User.get_by_name(f'user{user_index[i % len(user_index)] + 1}')),
+        Case('User.update', lambda i: User.update(bench_user, occupation='benchmark')),
+        Case('User.exists', lambda i: User.exists(users(i))),
+        Case('User.bulk_status', lambda i: User.bulk_status([users(i + j) for j in range(50)])),
+        Case('User.most_active', lambda i: User.most_active(10)),
+        # Series
+        Case('Series.create', lambda i: Series.create(bench_series, 'Bench', 'Bench', 2000)),
+        Case('Series.get', lambda i: Series.get(series(i))),
+        Case('Series.get_by_title', lambda i: Series.get_by_title(title(i))),
+        Case('Series.get_all', lambda i: Series.get_all(limit=50)),
+        # Page profonde: doit coûter autant que la première
+        Case('Series.get_page', lambda i: Series.get_page(after=(title(i), ''))),
+        Case('Series.get_page (genre)', lambda i: Series.get_page(after=(title(i), ''), genre='Drama')),
+        Case('Series.most_rated', lambda i: Series.most_rated(10)),
+        Case('Series.search', lambda i: Series.search(keyword(i))),
+        Case('Series.update', lambda i: Series.update(bench_series, year=2001)),
+        Case('Series.describe_scored', lambda i: Series.describe_scored(
+            [(series_id, 1.0 / (rank + 1)) for rank, series_id in enumerate(series_ids)]
+        )),
+        # Genre
+        Case('Genre.get_or_create', lambda i: Genre.get_or_create('Drama')),
+        Case('Genre.get_all', lambda i: Genre.get_all()),
+        Case('Genre.link_to_series', lambda i: Genre.link_to_series(bench_series, 'Drama')),
+        # Actor
+        Case('Actor.get', lambda i: Actor.get(actors(i))),
+        Case('Actor.get_all', lambda i: Actor.get_all(limit=100)),
+        Case('Actor.link_to_series', lambda i: Actor.link_to_series(bench_series, actor_ids[0])),
+        Case('Actor.get_series', lambda i: Actor.get_series(actors(i))),
+        # Distribution de plusieurs centaines d'acteurs sur bench-series: page de détail
+        # en une requête (get_detail) contre l'enchaînement d'avant (4 allers-retours,
+        # produit genres × acteurs dans Series.get)
+        Case('Actor.bulk_link_to_series', lambda i: Actor.bulk_link_to_series(
+            [{'series_id': bench_series, 'actor_id': actor_id} for actor_id in cast_ids]
+        )),
+        Case('Series.get_detail (large cast)', lambda i: Series.get_detail(bench_series, users(i))),
+        Case('Series detail, sequential (large cast)', lambda i: (
+            Series.get(bench_series) or Series.get_by_title(bench_series),
+            Rating.get_average_rating(bench_series),
+            Rating.get(users(i), bench_series),
+            Similarity.similar_series(bench_series, limit=6),
+        )),
+        Case('Series.get_detail', lambda i: Series.get_detail(series(i), users(i))),
+        # Rating
+        Case('Rating.create', lambda i: Rating.create(bench_user, series(i), 4)),
+        Case('Rating.get', lambda i: Rating.get(users(i), series(i))),
+        Case('Rating.get_user_ratings', lambda i: Rating.get_user_ratings(users(i))),
+        Case('Rating.get_user_rating_values', lambda i: Rating.get_user_rating_values(users(i))),
+        # Chargement à froid du seen-set (les stratégies ci-dessous le trouvent en mémoire)
+        Case('seen_sets.get', lambda i: (seen_sets.forget(users(i)), seen_sets.get(users(i)))),
+        Case('Rating.get_series_ratings', lambda i: Rating.get_series_ratings(series(i))),
+        Case('Rating.get_average_rating', lambda i: Rating.get_average_rating(series(i))),
+        Case('Rating.get_user_statistics', lambda i: Rating.get_user_statistics(users(i))),
+        Case('Rating.delete', lambda i: Rating.delete(bench_user, series(i))),
+        # Similarity
+        Case('Similarity.series_to_refresh', lambda i: Similarity.series_to_refresh()),
+        Case('Similarity.similar_series', lambda i: Similarity.similar_series(series(i))),
+        # Recommendation (calcul direct, hors cache)
+        Case('Recommendation.users_to_materialize', lambda i: Recommendation.users_to_materialize()),
+        Case('Recommendation.materialized', lambda i: Recommendation.materialized(users(i))),
+    ]
+    for strategy, (query_name, _) in sorted(Recommendation.STRATEGIES.items()):
+        # Stratégies Cypher et pipeline hybride; embedding/als dépendent de fichiers entraînés
+        if query_name is not None or strategy == 'hybrid':
+            cases.append(Case(
+                f'Recommendation.{strategy}',
+                lambda i, strategy=strategy: Recommendation.compute(strategy, users(i), 10),
+            ))
+    return cases
+
+
+def cleanup_model_cases():
+    """
+    Supprimer les entités créées par les cas d'écriture, via User/Series.delete_many:
+    les notes de bench-user sur les séries du graphe sont retirées de leurs agrégats
+    """
+    from recommendations.models import Series, User
+    from tv_recommender.neo4j_db import neo4j_db
+    rows = neo4j_db.read("""
+    MATCH (u:User)
+    WHERE u.user_id = 'bench-user' OR u.user_id STARTS WITH 'bench-bulk-'
+    RETURN u.user_id as user_id
+    """)
+    User.delete_many(row['user_id'] for row in rows)
+    Series.delete_many(['bench-series'])
+
+
+# ===== CROISSANCE DES DB HITS (PROFILE) =====
+
+# Tailles de fixture: une série à `size` genres et `size` acteurs. En doublant
+# size, les db hits d'une requête doublent environ si genres et acteurs sont
+# parcourus séparément, et quadruplent s'ils sont croisés (genres × acteurs).
+SCALING_SIZES = (5, 10, 20)
+SCALING_MAX_GROWTH = 2.5
+
+SCALING_PREFIX = 'bench-scale'
+
+
+def scaling_fixture(size):
+    """(series_id, user_id) d'une série à `size` genres et acteurs, notée par un utilisateur dédié"""
+    from tv_recommender.neo4j_db import neo4j_db
+
+    series_id = f'{SCALING_PREFIX}-{size}'
+    user_id = f'{SCALING_PREFIX}-user-{size}'
+    neo4j_db.write("""
+    MERGE (s:Series {series_id: $series_id})
+    SET s.title = $series_id, s.original_title = $series_id, s.year = 2000, s.is_adult = false
+    MERGE (u:User {user_id: $user_id})
+    SET u.name = $user_id
+    MERGE (u)-[r:RATED]->(s)
+    SET r.rating = 4, r.timestamp = 0
+    WITH s
+    UNWIND range(1, $size) AS i
+    MERGE (g:Genre {name: $prefix + '-genre-' + toString(i)})
+    MERGE (a:Actor {actor_id: $prefix + '-actor-' + toString(i)})
+    SET a.name = $prefix + ' actor ' + toString(i)
+    MERGE (s)-[:HAS_GENRE]->(g)
+    MERGE (s)-[:HAS_ACTOR]->(a)
+    """, {'series_id': series_id, 'user_id': user_id, 'size': size, 'prefix': SCALING_PREFIX})
+    return series_id, user_id
+
+
+def scaling_cases(series_id, user_id):
+    """Requêtes qui lisent genres et acteurs (ou genres par note) d'une même série"""
+    from recommendations.models import Rating, Recommendation, Series
+
+    candidates = [{'series_id': series_id, 'score': 1.0, 'sources': ['bench']}]
+    return [
+        Case('Series.get', lambda i: Series.get(series_id)),
+        Case('Series.get_by_title', lambda i: Series.get_by_title(series_id)),
+        Case('Series.get_detail', lambda i: Series.get_detail(series_id, user_id)),
+        Case('Rating.get_user_ratings', lambda i: Rating.get_user_ratings(user_id)),
+        Case('Rating.get_user_statistics', lambda i: Rating.get_user_statistics(user_id)),
+        # Utilisateur sans note: la série candidate n'est pas filtrée
+        Case('Recommendation.describe_fused', lambda i: Recommendation.describe_fused(
+            f'{SCALING_PREFIX}-user-none', candidates
+        )),
+    ]
+
+
+def scaling_check(connection, sizes=SCALING_SIZES, max_growth=SCALING_MAX_GROWTH):
+    """
+    {cas: {db_hits: {size: hits}, growth, linear}}: growth est le plus grand
+    rapport de db hits entre deux tailles consécutives (qui doublent)
+    """
+    from tv_recommender.neo4j_db import neo4j_db
+
+    neo4j_db.write("MERGE (u:User {user_id: $user_id})", {'user_id': f'{SCALING_PREFIX}-user-none'})
+    hits = {}
+    try:
+        for size in sizes:
+            for case in scaling_cases(*scaling_fixture(size)):
+                hits.setdefault(case.name, {})[size] = profile_case(connection, case)['db_hits']
+    finally:
+        cleanup_scaling()
+
+    results = {}
+    for name, by_size in hits.items():
+        growth = max(
+            (by_size[after] / by_size[before] for before, after in zip(sizes, sizes[1:]) if by_size[before]),
+            default=0.0,
+        )
+        results[name] = {
+            'db_hits': by_size,
+            'growth': round(growth, 2),
+            'linear': growth <= max_growth,
+        }
+    return results
+
+
+def cleanup_scaling():
+    """Supprimer les fixtures de scaling_check"""
+    from tv_recommender.neo4j_db import neo4j_db
+    neo4j_db.write("""
+    MATCH (n)
+    WHERE (n:Series AND n.series_id STARTS WITH $prefix)
+       OR (n:User AND n.user_id STARTS WITH $prefix)
+       OR (n:Actor AND n.actor_id STARTS WITH $prefix)
+       OR (n:Genre AND n.name STARTS WITH $prefix)
+    DETACH DELETE n
+    """, {'prefix': SCALING_PREFIX})
+
+
+# ===== CAS: PARTIES PYTHON (SANS BASE) =====
+
+def write_ratings_csv(graph, path):
+    """Écrire ratings.csv du graphe (format d'import_csv_data)"""
+    fields = ['user_id', 'series_id', 'rating', 'date', 'timestamp']
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(graph.iter_ratings())
+
+
+def python_cases(graph, workdir):
+    """Cas sans Neo4j; ceux qui demandent numpy/scipy sont omis s'ils manquent"""
+    from recommendations import cache, genre_index, pipeline, seen
+
+    ratings_path = os.path.join(workdir, 'ratings.csv')
+    write_ratings_csv(graph, ratings_path)
+    rating_rows = list(csv_import.iter_rows(ratings_path, csv_import.parse_rating))
+    user_ids = [graph.user_id(i) for i in sorted({0, graph.users // 10, graph.users // 2, graph.users - 1})]
+    users = _cycle(user_ids)
+
+    memory = cache.MemoryBackend(ttl=600, max_entries=10000)
+    candidates = {
+        'genre': [{'series_id': graph.series_id(j), 'score': 50 - j} for j in range(50)],
+        'collaborative': [{'series_id': graph.series_id(j * 2), 'score': 10 - j / 5} for j in range(50)],
+        'actors': [{'series_id': graph.series_id(j * 3), 'score': 5} for j in range(50)],
+    }
+    weights = {'genre': 2.0, 'collaborative': 3.0, 'actors': 1.0}
+
+    rated = {}
+    rating_counts = {}
+    for row in rating_rows:
+        rated.setdefault(row['user_id'], {})[row['series_id']] = row['rating']
+        rating_counts[row['series_id']] = rating_counts.get(row['series_id'], 0) + 1
+    series_genres = {}
+    for row in graph.iter_series_genres():
+        series_genres.setdefault(row['series_id'], []).append(row['genre_name'])
+    seen_by_user = {
+        user_id: seen.Seen(
+            seen.SeenSet(rated.get(user_id, {})),
+            seen.SeenSet(
+                series_id for series_id, rating in rated.get(user_id, {}).items()
+                if rating >= seen.LIKE_THRESHOLD
+            ),
+        )
+        for user_id in user_ids
+    }
+    probes = [graph.series_id(j) for j in range(0, graph.series, max(1, graph.series // 100))]
+    genres = genre_index.GenreIndex(
+        dict(row, genres=series_genres.get(row['series_id'], []),
+             rating_count=rating_counts.get(row['series_id'], 0))
+        for row in graph.iter_series() if not row['is_adult']
+    )
+
+    cases = [
+        Case('csv_import.parse_rating', lambda i: sum(
+            1 for _ in csv_import.iter_rows(ratings_path, csv_import.parse_rating, limit=10000)
+        )),
+        Case('synthetic.iter_ratings', lambda i: sum(1 for _ in graph.iter_ratings(0, 100))),
+        Case('cache.memory_set_get', lambda i: (
+            memory.set(users(i), f'hybrid:{i}', [1, 2, 3]), memory.get(users(i), f'hybrid:{i}')
+        )),
+        Case('pipeline.fuse', lambda i: pipeline.fuse(candidates, weights)),
+        Case('pipeline.fuse_rank', lambda i: pipeline.fuse(candidates, weights, 'rank')),
+        Case('seen.SeenSet.contains', lambda i: sum(
+            1 for series_id in probes if series_id in seen_by_user[users(i)].rated
+        )),
+        Case('genre_index.recommend', lambda i: genres.recommend(
+            seen_by_user[users(i)].liked, 10, exclude=seen_by_user[users(i)].rated
+        )),
+    ]
+
+    try:
+        from recommendations import als, ann, sparse_cf
+    except ImportError:
+        return cases
+
+    matrix = sparse_cf.RatingMatrix.from_rows(
+        (row['user_id'], row['series_id'], row['rating']) for row in rating_rows
+    )
+    engine = sparse_cf.SparseCollaborativeEngine(matrix)
+    series_ids, vectors = ann.build_embeddings(matrix, {}, dim=32)
+    index = ann.IVFIndex.build(series_ids, vectors)
+    users_factors, items_factors, global_mean = als.train(matrix.matrix, factors=32, iterations=3)
+    model = als.ALSModel(users_factors, items_factors, matrix.user_ids, matrix.series_ids,
+                         {'global_mean': global_mean, 'regularization': 0.1})
+
+    cases += [
+        Case('sparse_cf.RatingMatrix.from_rows', lambda i: sparse_cf.RatingMatrix.from_rows(
+            (row['user_id'], row['series_id'], row['rating']) for row in rating_rows
+        )),
+        Case('sparse_cf.recommend', lambda i: engine.recommend(users(i), 10)),
+        Case('ann.search', lambda i: index.search(vectors[i % len(vectors)], 10)),
+        Case('als.train_iteration', lambda i: als.train(matrix.matrix, factors=32, iterations=1,
+                                                        user_init=users_factors, item_init=items_factors)),
+        Case('als.recommend', lambda i: model.recommend(users(i), rated.get(users(i), {}), 10)),
+    ]
+    return cases
+
+
+# ===== RAPPORT =====
+
+def compare(report, baseline, threshold=0.25, min_ms=1.0):
+    """
+    Régressions par rapport à un rapport de référence:
+    p50 plus lent de plus de `threshold` (et d'au moins min_ms), ou db hits en hausse
+    """
+    regressions = []
+    for name, current in report.get('cases', {}).items():
+        previous = baseline.get('cases', {}).get(name)
+        if not previous:
+            continue
+        before, after = previous.get('p50_ms', 0), current.get('p50_ms', 0)
+        if after > before * (1 + threshold) and after - before >= min_ms:
+            regressions.append((name, 'p50_ms', before, after))
+        before, after = previous.get('db_hits'), current.get('db_hits')
+        if before is not None and after is not None and after > before * (1 + threshold):
+            regressions.append((name, 'db_hits', before, after))
+    return regressions
@@ -0,0 +1,146 @@
+# recommendations/bulk_export.py
+"""
+Conversion des CSV du projet en fichiers pour `neo4j-admin database import`
+Les fichiers sont lus et écrits en flux: seule la liste des noms de genres
+(quelques dizaines) est gardée en mémoire pour la déduplication.
+"""
+
+import csv
+import os
+
+from recommendations import csv_import
+
+
+# Fichier de sortie -> (en-tête annoté, colonnes lues dans la ligne normalisée)
+NODE_FILES = {
+    'Actor': (
+        'actors.csv',
+        ['actor_id:ID(Actor)', 'name', 'birth_year:int', 'death_year:int',
+         'professions', 'known_for_titles'],
+        ['actor_id', 'name', 'birth_year', 'death_year', 'professions', 'known_for_titles'],
+    ),
+    'Series': (
+        'series.csv',
+        ['series_id:ID(Series)', 'title', 'original_title', 'year:int', 'is_adult:boolean'],
+        ['series_id', 'title', 'original_title', 'year', 'is_adult'],
+    ),
+    'User': (
+        'users.csv',
+        ['user_id:ID(User)', 'name', 'email', 'age:int', 'gender', 'occupation', 'join_date'],
+        ['user_id', 'name', 'email', 'age', 'gender', 'occupation', 'join_date'],
+    ),
+}
+
+RELATIONSHIP_FILES = {
+    'HAS_GENRE': (
+        'has_genre.csv',
+        [':START_ID(Series)', ':END_ID(Genre)'],
+        ['series_id', 'genre_name'],
+    ),
+    'HAS_ACTOR': (
+        'has_actor.csv',
+        [':START_ID(Series)', ':END_ID(Actor)'],
+        ['series_id', 'actor_id'],
+    ),
+    'RATED': (
+        'rated.csv',
+        [':START_ID(User)', ':END_ID(Series)', 'rating:float', 'date:datetime', 'timestamp:long'],
+        ['user_id', 'series_id', 'rating', 'date', 'timestamp'],
+    ),
+}
+
+GENRE_FILE = ('genres.csv', ['name:ID(Genre)', 'genre_id'])
+
+# Source CSV -> (fichier de sortie, parseur)
+SOURCES = {
+    'actors': ('Actor', csv_import.parse_actor),
+    'series': ('Series', csv_import.parse_series),
+    'users': ('User', csv_import.parse_user),
+    'series_genres': ('HAS_GENRE', csv_import.parse_series_genre),
+    'series_actors': ('HAS_ACTOR', csv_import.parse_series_actor),
+    'ratings': ('RATED', csv_import.parse_rating),
+}
+
+
+def format_value(value):
+    """Formater une valeur pour neo4j-admin (champ vide = propriété absente)"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return value
+
+
+def write_rows(output_path, header, columns, rows):
+    """Écrire un fichier d'import en flux, retourne le nombre de lignes écrites"""
+    count = 0
+    with open(output_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow([format_value(row.get(column)) for column in columns])
+            count += 1
+    return count
+
+
+def export_all(sources, output_dir, limit=None):
+    """
+    Convertir les CSV fournis (clé -> chemin, mêmes clés que import_csv_data)
+    en fichiers d'import dans `output_dir`.
+    Retourne {fichier de sortie: nombre de lignes}.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    counts = {}
+
+    # Genres: dédupliqués par nom, depuis genres.csv et series_genres.csv
+    genres = {}
+
+    def track_genres(rows):
+        for row in rows:
+            genres.setdefault(row['genre_name'], None)
+            yield row
+
+    if sources.get('genres'):
+        for row in csv_import.iter_rows(sources['genres'], csv_import.parse_genre):
+            if genres.get(row['name']) is None:
+                genres[row['name']] = row['genre_id']
+
+    for key, (target, parser) in SOURCES.items():
+        path = sources.get(key)
+        if not path:
+            continue
+        filename, header, columns = NODE_FILES.get(target) or RELATIONSHIP_FILES[target]
+        rows = csv_import.iter_rows(path, parser, limit)
+        if key == 'series_genres':
+            rows = track_genres(rows)
+        counts[filename] = write_rows(os.path.join(output_dir, filename), header, columns, rows)
+
+    if genres:
+        filename, header = GENRE_FILE
+        counts[filename] = write_rows(
+            os.path.join(output_dir, filename),
+            header,
+            ['name', 'genre_id'],
+            ({'name': name, 'genre_id': genre_id} for name, genre_id in sorted(genres.items())),
+        )
+
+    return counts
+
+
+def admin_import_command(output_dir, counts, database='neo4j'):
+    """Construire la ligne de commande neo4j-admin pour les fichiers générés"""
+    args = ['neo4j-admin database import full', database]
+
+    node_labels = {filename: label for label, (filename, _, _) in NODE_FILES.items()}
+    node_labels[GENRE_FILE[0]] = 'Genre'
+    rel_types = {filename: rel_type for rel_type, (filename, _, _) in RELATIONSHIP_FILES.items()}
+
+    for filename in counts:
+        path = os.path.join(output_dir, filename)
+        if filename in node_labels:
+            args.append(f'--nodes={node_labels[filename]}={path}')
+        else:
+            args.append(f'--relationships={rel_types[filename]}={path}')
+
+    args += ['--skip-duplicate-nodes=true', '--skip-bad-relationships=true']
+    return ' \\\n    '.join(args)
@@ -0,0 +1,336 @@
+# recommendations/cache.py
+"""
+Cache des recommandations par utilisateur et par stratégie
+Backends: mémoire locale (LRU + TTL), framework de cache Django, fichiers.
+Les entrées d'un utilisateur sont invalidées dès qu'il note ou retire une note
+(Rating.create / Rating.delete).
+
+Le backend 'memory' est propre à chaque processus: avec plusieurs workers
+gunicorn, une invalidation n'atteint que le worker qui a reçu la notation,
+les autres servent l'ancienne liste jusqu'au TTL. Utiliser 'django' (Redis,
+Memcached) pour une invalidation partagée.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+
+DEFAULTS = {
+    'BACKEND': 'memory',
+    'TTL': 600,
+    'MAX_ENTRIES': 10000,
+    'LOCATION': None,
+    'CACHE_ALIAS': 'default',
+}
+
+
+class MemoryBackend:
+    """LRU en mémoire, borné à max_entries, avec expiration par entrée"""
+
+    def __init__(self, ttl, max_entries, **kwargs):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()   # clé -> (expiration, valeur)
+        self.user_keys = {}            # user_id -> ensemble de clés
+        self.lock = threading.Lock()
+
+    def get(self, user_id, key):
+        with self.lock:
+            entry = self.entries.get((user_id, key))
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                self._remove((user_id, key))
+                return None
+            self.entries.move_to_end((user_id, key))
+            return value
+
+    def set(self, user_id, key, value):
+        with self.lock:
+            self.entries[(user_id, key)] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end((user_id, key))
+            self.user_keys.setdefault(user_id, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    def invalidate_user(self, user_id):
+        with self.lock:
+            for key in self.user_keys.pop(user_id, ()):
+                self.entries.pop((user_id, key), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.user_keys.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _remove(self, full_key):
+        self.entries.pop(full_key, None)
+        user_id, key = full_key
+        keys = self.user_keys.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.user_keys[user_id]
+
+
+class DjangoCacheBackend:
+    """
+    Framework de cache Django (CACHES[alias]); l'éviction est celle du backend.
+    L'invalidation incrémente une génération par utilisateur incluse dans les clés.
+    """
+
+    def __init__(self, ttl, cache_alias='default', **kwargs):
+        from django.core.cache import caches
+        self.ttl = ttl
+        self.cache = caches[cache_alias]
+
+    def _generation(self, user_id):
+        return self.cache.get(f'reco:gen:{user_id}', 0)
+
+    def get(self, user_id, key):
+        return self.cache.get(f'reco:{user_id}:{self._generation(user_id)}:{key}')
+
+    def set(self, user_id, key, value):
+        self.cache.set(f'reco:{user_id}:{self._generation(user_id)}:{key}', value, self.ttl)
+
+    def invalidate_user(self, user_id):
+        try:
+            self.cache.incr(f'reco:gen:{user_id}')
+        except ValueError:
+            self.cache.set(f'reco:gen:{user_id}', 1, None)
+
+    def clear(self):
+        self.cache.clear()
+
+    def __len__(self):
+        return 0
+
+
+class FileBackend:
+    """
+    Un fichier JSON par entrée dans `location`; au-delà de max_entries,
+    les fichiers les plus anciens sont supprimés. Les clés d'un utilisateur
+    (user-*.keys, pour l'invalidation) sont listées une seule fois chacune et
+    le fichier disparaît avec la dernière de ses entrées.
+    """
+
+    def __init__(self, ttl, max_entries, location=None, **kwargs):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.location = str(location or os.path.join(settings.BASE_DIR, '.recommendation_cache'))
+        os.makedirs(self.location, exist_ok=True)
+
+    def _path(self, user_id, key):
+        digest = hashlib.sha1(f'{user_id}:{key}'.encode('utf-8')).hexdigest()
+        return os.path.join(self.location, f'{digest}.json')
+
+    def _user_path(self, user_id):
+        digest = hashlib.sha1(str(user_id).encode('utf-8')).hexdigest()
+        return os.path.join(self.location, f'user-{digest}.keys')
+
+    def get(self, user_id, key):
+        try:
+            with open(self._path(user_id, key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry['expires'] < time.time():
+            return None
+        return entry['value']
+
+    def set(self, user_id, key, value):
+        path = self._path(user_id, key)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'expires': time.time() + self.ttl, 'value': value}, f, default=str)
+        os.replace(tmp_path, path)
+        user_path = self._user_path(user_id)
+        try:
+            with open(user_path, 'r', encoding='utf-8') as f:
+                known = key in f.read().split()
+        except OSError:
+            known = False
+        if known:
+            # Rafraîchir la date: le fichier de clés doit survivre à ses entrées (_cull)
+            os.utime(user_path)
+        else:
+            with open(user_path, 'a', encoding='utf-8') as f:
+                f.write(f'{key}\n')
+        self._cull()
+
+    def invalidate_user(self, user_id):
+        user_path = self._user_path(user_id)
+        try:
+            with open(user_path, 'r', encoding='utf-8') as f:
+                keys = set(f.read().split())
+        except OSError:
+            return
+        for key in keys:
+            try:
+                os.remove(self._path(user_id, key))
+            except OSError:
+                pass
+        os.remove(user_path)
+
+    def clear(self):
+        for name in os.listdir(self.location):
+            os.remove(os.path.join(self.location, name))
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.location) if name.endswith('.json'))
+
+    def _cull(self):
+        entries = [
+            entry for entry in os.scandir(self.location) if entry.name.endswith('.json')
+        ]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        # Supprimer un dixième en plus pour ne pas relancer le tri à chaque écriture
+        removed = entries[:len(entries) - self.max_entries + self.max_entries // 10]
+        for entry in removed:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+        if not removed:
+            return
+        # Fichier de clés touché après chaque entrée de l'utilisateur: plus ancien
+        # que la plus ancienne entrée restante, toutes ses entrées ont été supprimées
+        kept = entries[len(removed):]
+        cutoff = kept[0].stat().st_mtime if kept else float('inf')
+        for entry in os.scandir(self.location):
+            if not entry.name.endswith('.keys'):
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+
+BACKENDS = {
+    'memory': MemoryBackend,
+    'django': DjangoCacheBackend,
+    'file': FileBackend,
+}
+
+
+class RecommendationCache:
+    """Cache des top-N par (utilisateur, stratégie, limite) avec compteurs hit/miss"""
+
+    def __init__(self):
+        self._backend = None
+        self.hits = 0
+        self.misses = 0
+        # Horloge incrémentée à chaque invalidation; user_id -> horloge de sa dernière
+        # invalidation (LRU borné à MAX_ENTRIES, voir _store)
+        self.clock = 0
+        self.versions = OrderedDict()
+        # Horloge de la plus récente invalidation sortie de `versions`
+        self.pruned = 0
+        self.lock = threading.Lock()
+        self.config = None
+
+    def _config(self):
+        if self.config is None:
+            self.config = dict(DEFAULTS, **getattr(settings, 'RECOMMENDATION_CACHE', {}))
+        return self.config
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            config = self._config()
+            self._backend = BACKENDS[config['BACKEND']](
+                ttl=config['TTL'],
+                max_entries=config['MAX_ENTRIES'],
+                location=config['LOCATION'],
+                cache_alias=config['CACHE_ALIAS'],
+            )
+        return self._backend
+
+    @staticmethod
+    def _key(strategy, limit):
+        return f'{strategy}:{limit}'
+
+    def get(self, user_id, strategy, limit):
+        value = self.backend.get(user_id, self._key(strategy, limit))
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, user_id, strategy, limit, value):
+        self.backend.set(user_id, self._key(strategy, limit), value)
+
+    def _store(self, user_id, strategy, limit, value, version):
+        with self.lock:
+            # Une notation arrivée pendant le calcul: ne pas écraser l'invalidation.
+            # Utilisateur sorti de `versions`: sa dernière invalidation date au plus de `pruned`
+            if self.versions.get(user_id, self.pruned) > version:
+                return
+            self.set(user_id, strategy, limit, value)
+
+    def get_or_compute(self, user_id, strategy, limit, compute):
+        """Retourner la liste en cache, sinon la calculer avec compute() et la stocker"""
+        version = self.clock
+        value = self.get(user_id, strategy, limit)
+        if value is None:
+            value = compute()
+            self._store(user_id, strategy, limit, value, version)
+        return value
+
+    async def _acall(self, func, *args):
+        # Backends django/file: accès réseau ou disque, exécutés hors de la boucle d'événements
+        if isinstance(self.backend, MemoryBackend):
+            return func(*args)
+        return await sync_to_async(func, thread_sensitive=False)(*args)
+
+    async def aget_or_compute(self, user_id, strategy, limit, compute):
+        """Version async de get_or_compute (compute() renvoie une coroutine)"""
+        version = self.clock
+        value = await self._acall(self.get, user_id, strategy, limit)
+        if value is None:
+            value = await compute()
+            await self._acall(self._store, user_id, strategy, limit, value, version)
+        return value
+
+    def invalidate_user(self, user_id):
+        max_versions = self._config()['MAX_ENTRIES']
+        with self.lock:
+            self.clock += 1
+            self.versions[user_id] = self.clock
+            self.versions.move_to_end(user_id)
+            while len(self.versions) > max_versions:
+                _, self.pruned = self.versions.popitem(last=False)
+            self.backend.invalidate_user(user_id)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'entries': len(self.backend),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total * 100, 1) if total else 0.0,
+        }
+
+
+# Instance globale
+recommendation_cache = RecommendationCache()
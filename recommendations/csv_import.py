@@ -0,0 +1,235 @@
+# recommendations/csv_import.py
+"""
+Lecture en flux des fichiers CSV du projet pour l'import vers Neo4j
+Chaque parseur normalise une ligne CSV en dictionnaire prêt pour un UNWIND
+"""
+
+import csv
+import json
+import os
+import threading
+import time
+
+
+NULL_VALUES = (None, '', '\\N')
+
+
+def clean(value):
+    """Convertir les valeurs nulles du CSV (vide, \\N) en None"""
+    if value in NULL_VALUES:
+        return None
+    return value
+
+
+def to_int(value):
+    """Convertir une valeur CSV en entier (None si absente ou invalide)"""
+    value = clean(value)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_float(value):
+    """Convertir une valeur CSV en flottant (None si absente ou invalide)"""
+    value = clean(value)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# ===== PARSEURS PAR FICHIER =====
+
+def parse_genre(row):
+    """genres.csv: genre_id, name"""
+    genre_id = clean(row.get('genre_id'))
+    name = clean(row.get('name'))
+    if not (genre_id and name):
+        return None
+    return {'genre_id': genre_id, 'name': name}
+
+
+def parse_actor(row):
+    """actors.csv: actor_id, name, birth_year, death_year, professions, known_for_titles"""
+    actor_id = clean(row.get('actor_id'))
+    name = clean(row.get('name'))
+    if not (actor_id and name):
+        return None
+    return {
+        'actor_id': actor_id,
+        'name': name,
+        'birth_year': to_int(row.get('birth_year')),
+        'death_year': to_int(row.get('death_year')),
+        'professions': clean(row.get('professions')),
+        'known_for_titles': clean(row.get('known_for_titles')),
+    }
+
+
+def parse_series(row):
+    """series.csv: series_id, title, original_title, year, is_adult"""
+    series_id = clean(row.get('series_id'))
+    title = clean(row.get('title'))
+    if not (series_id and title):
+        return None
+    return {
+        'series_id': series_id,
+        'title': title,
+        'original_title': clean(row.get('original_title')) or title,
+        'year': to_int(row.get('year')),
+        'is_adult': row.get('is_adult', '0') == '1',
+    }
+
+
+def parse_series_genre(row):
+    """series_genres.csv: series_id, genre_name"""
+    series_id = clean(row.get('series_id'))
+    genre_name = clean(row.get('genre_name'))
+    if not (series_id and genre_name):
+        return None
+    return {'series_id': series_id, 'genre_name': genre_name}
+
+
+def parse_series_actor(row):
+    """series_actors.csv: series_id, actor_id"""
+    series_id = clean(row.get('series_id'))
+    actor_id = clean(row.get('actor_id'))
+    if not (series_id and actor_id):
+        return None
+    return {'series_id': series_id, 'actor_id': actor_id}
+
+
+def parse_user(row):
+    """users.csv: user_id, name, email, age, gender, occupation, join_date"""
+    user_id = clean(row.get('user_id'))
+    name = clean(row.get('name'))
+    email = clean(row.get('email'))
+    if not (user_id and name and email):
+        return None
+    return {
+        'user_id': user_id,
+        'name': name,
+        'email': email,
+        'age': to_int(row.get('age')),
+        'gender': clean(row.get('gender')),
+        'occupation': clean(row.get('occupation')),
+        'join_date': clean(row.get('join_date')),
+    }
+
+
+def parse_rating(row):
+    """ratings.csv: user_id, series_id, rating, date, timestamp"""
+    user_id = clean(row.get('user_id'))
+    series_id = clean(row.get('series_id'))
+    rating = to_float(row.get('rating'))
+    if not (user_id and series_id) or rating is None:
+        return None
+    return {
+        'user_id': user_id,
+        'series_id': series_id,
+        'rating': rating,
+        'date': clean(row.get('date')),
+        'timestamp': to_int(row.get('timestamp')),
+    }
+
+
+# ===== LECTURE EN FLUX =====
+
+def iter_rows(filepath, parser, limit=None):
+    """Lire un CSV ligne par ligne et renvoyer les lignes valides normalisées"""
+    count = 0
+    with open(filepath, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            if limit and count >= limit:
+                break
+            parsed = parser(row)
+            if parsed is None:
+                continue
+            count += 1
+            yield parsed
+
+
+def iter_chunks(filepath, parser, size, limit=None, offset=0, rows_done=0):
+    """
+    Lire un CSV par lots de `size` lignes valides, à partir d'un offset d'octets.
+    Renvoie (lot, offset après le lot, lignes valides lues depuis le début du fichier)
+    pour pouvoir enregistrer un point de reprise après chaque lot validé.
+    """
+    count = rows_done
+    with open(filepath, 'r', encoding='utf-8', newline='') as f:
+        header = next(csv.reader([f.readline()]), None)
+        if not header:
+            return
+        if offset:
+            f.seek(offset)
+        # readline (et non l'itération directe) pour garder f.tell() disponible
+        reader = csv.DictReader(iter(f.readline, ''), fieldnames=header)
+
+        chunk = []
+        for row in reader:
+            if limit and count >= limit:
+                break
+            parsed = parser(row)
+            if parsed is None:
+                continue
+            chunk.append(parsed)
+            count += 1
+            if len(chunk) >= size:
+                yield chunk, f.tell(), count
+                chunk = []
+        if chunk:
+            yield chunk, f.tell(), count
+
+
+class Throughput:
+    """Compteur de lignes importées et débit (lignes/s)"""
+
+    def __init__(self):
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    def add(self, count):
+        self.rows += count
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        elapsed = self.elapsed
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+
+class Checkpoint:
+    """
+    Points de reprise de l'import, par fichier: offset d'octets et nombre de
+    lignes déjà validées. Stockés en JSON, réécrits atomiquement après chaque lot.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def key(stage, filepath):
+        return f'{stage}:{os.path.abspath(filepath)}'
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def save(self, key, offset, rows, done=False):
+        with self.lock:
+            self.entries[key] = {'offset': offset, 'rows': rows, 'done': done}
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=2)
+            os.replace(tmp_path, self.path)
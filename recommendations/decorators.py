@@ -3,9 +3,12 @@ Décorateurs de permissions adaptés
 """
 
 from functools import wraps
+from django.core.handlers.asgi import ASGIRequest
 from django.http import JsonResponse
 from django.shortcuts import redirect
 
+from tv_recommender.neo4j_async import async_neo4j_db
+
 
 def admin_required(view_func):
     """Décorateur pour vérifier que l'utilisateur est admin"""
@@ -36,3 +39,30 @@ def get_user_neo4j_id(request):
     if request.user.is_authenticated:
         return str(request.user.id)
     return None
+
+
+
+async def aget_user_neo4j_id(request):
+    """Version async de get_user_neo4j_id (via request.auser)"""
+    user = await request.auser()
+    if user.is_authenticated:
+        return str(user.id)
+    return None
+
+
+def async_neo4j_view(view_func):
+    """
+    Décorateur des vues async qui utilisent async_neo4j_db.
+    Sous WSGI (runserver, gunicorn), Django exécute la vue dans une boucle
+    d'événements créée pour la requête: le driver de cette boucle est fermé en
+    fin de vue au lieu de rester ouvert (pool et sockets perdus à chaque requête).
+    Sous ASGI la boucle est partagée et le driver, avec son pool, est conservé.
+    """
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view_func(request, *args, **kwargs)
+        finally:
+            if not isinstance(request, ASGIRequest):
+                await async_neo4j_db.close()
+    return wrapper
@@ -0,0 +1,219 @@
+# recommendations/genre_index.py
+"""
+Recommandation par genres sur un index en mémoire: pour chaque genre, la liste
+des séries triée par popularité décroissante.
+
+Score d'une série = popularité × somme des poids des genres aimés qu'elle porte
+(poids d'un genre = nombre de séries de ce genre notées >= 4 par l'utilisateur).
+Les listes des genres aimés sont fusionnées par l'algorithme à seuil (Fagin):
+on avance en parallèle dans chaque liste, chaque série rencontrée reçoit son
+score complet, et l'on s'arrête dès que le N-ième meilleur score atteint le
+seuil (somme pondérée des popularités en tête de liste), qu'aucune série non
+encore vue ne peut dépasser. Le parcours dépend de N et non de la taille des
+genres « hubs » (Drama, Comedy), contrairement à l'expansion Cypher
+(rec)-[:HAS_GENRE]->(g).
+
+Popularité = 1 + log(1 + rating_count): une série sans note garde un score
+non nul et les séries très notées n'écrasent pas la pondération des genres.
+
+L'index est un instantané: les écritures (notes, séries, genres) le marquent
+périmé et il est reconstruit en tâche de fond, au plus toutes les
+REFRESH_INTERVAL secondes, l'ancien instantané restant servi pendant la lecture.
+
+Configuration: settings.RECOMMENDATION_GENRE_BACKEND, settings.GENRE_INDEX
+"""
+
+import heapq
+import math
+import threading
+import time
+
+
+def popularity(rating_count):
+    return 1.0 + math.log1p(rating_count or 0)
+
+
+class GenreIndex:
+    """Séries non adultes et, par genre, leurs positions triées par popularité décroissante"""
+
+    def __init__(self, rows):
+        rows = list(rows)
+        self.series_ids = [row['series_id'] for row in rows]
+        self.rows = [
+            {
+                'series_id': row['series_id'],
+                'title': row['title'],
+                'original_title': row.get('original_title'),
+                'year': row.get('year'),
+                'genres': list(row['genres']),
+            }
+            for row in rows
+        ]
+        self.popularity = [popularity(row.get('rating_count')) for row in rows]
+        self.position = {series_id: i for i, series_id in enumerate(self.series_ids)}
+        self.max_genres = max((len(row['genres']) for row in self.rows), default=0)
+
+        by_genre = {}
+        for i, row in enumerate(rows):
+            for genre in row['genres']:
+                by_genre.setdefault(genre, []).append(i)
+        self.by_genre = {
+            genre: sorted(positions, key=lambda i: -self.popularity[i])
+            for genre, positions in by_genre.items()
+        }
+
+    @classmethod
+    def from_neo4j(cls):
+        from tv_recommender.neo4j_db import neo4j_db
+        query = """
+        MATCH (s:Series)
+        WHERE s.is_adult = false
+        RETURN s.series_id as series_id,
+               s.title as title,
+               s.original_title as original_title,
+               s.year as year,
+               coalesce(s.rating_count, 0) as rating_count,
+               [(s)-[:HAS_GENRE]->(g:Genre) | g.name] as genres
+        """
+        return cls(neo4j_db.read(query))
+
+    def genre_weights(self, liked):
+        """{genre: poids} à partir des series_id aimés (notés >= 4) par l'utilisateur"""
+        weights = {}
+        for series_id in liked:
+            i = self.position.get(series_id)
+            if i is None:
+                continue
+            for genre in self.rows[i]['genres']:
+                weights[genre] = weights.get(genre, 0) + 1
+        return weights
+
+    def score(self, i, weights):
+        return self.popularity[i] * sum(weights.get(genre, 0) for genre in self.rows[i]['genres'])
+
+    def top(self, weights, limit, exclude=()):
+        """
+        [(position, score)] des `limit` meilleures séries, hors `exclude` (series_id),
+        et nombre d'entrées lues dans les listes
+        """
+        lists = [(self.by_genre[genre], weight) for genre, weight in weights.items()
+                 if weight > 0 and genre in self.by_genre]
+        if not lists or limit <= 0:
+            return [], 0
+
+        # Une série porte au plus max_genres genres: son score est aussi borné par
+        # (popularité en tête de liste la plus haute) × (somme des max_genres plus gros poids)
+        top_weights = sum(sorted((weight for _, weight in lists), reverse=True)[:self.max_genres])
+
+        best = []          # tas min des (score, -position) retenus
+        seen = set()
+        depth = 0
+        reads = 0
+        while True:
+            threshold = 0.0
+            frontier = 0.0
+            active = False
+            for positions, weight in lists:
+                if depth >= len(positions):
+                    continue
+                active = True
+                i = positions[depth]
+                reads += 1
+                threshold += weight * self.popularity[i]
+                frontier = max(frontier, self.popularity[i])
+                if i in seen:
+                    continue
+                seen.add(i)
+                if self.series_ids[i] in exclude:
+                    continue
+                entry = (self.score(i, weights), -i)
+                if len(best) < limit:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+            depth += 1
+            threshold = min(threshold, frontier * top_weights)
+            # Arrêt: aucune série non vue ne peut dépasser le seuil
+            if not active or (len(best) == limit and best[0][0] >= threshold):
+                break
+
+        ranked = sorted(best, reverse=True)
+        return [(-negative, score) for score, negative in ranked], reads
+
+    def recommend(self, liked, limit=10, exclude=()):
+        """Recommandations au format de BY_GENRE_QUERY, hors séries déjà notées (`exclude`)"""
+        weights = self.genre_weights(liked)
+        hits, _ = self.top(weights, limit, exclude=exclude)
+        results = []
+        for i, score in hits:
+            row = dict(self.rows[i])
+            row['genres'] = [genre for genre in row['genres'] if weights.get(genre)]
+            row['score'] = round(score, 3)
+            results.append(row)
+        return results
+
+
+_index = None
+_index_built_at = 0.0
+_index_lock = threading.Lock()
+_stale = False
+_rebuilding = False
+
+
+def _rebuild():
+    global _index, _index_built_at, _stale, _rebuilding
+    try:
+        index = GenreIndex.from_neo4j()
+        with _index_lock:
+            _index, _index_built_at = index, time.monotonic()
+    except Exception:
+        # Neo4j indisponible: l'ancien instantané reste servi, nouvel essai au prochain appel
+        _stale = True
+    finally:
+        with _index_lock:
+            _rebuilding = False
+
+
+def get_index(max_age=None, refresh_interval=0):
+    """
+    Index partagé par le processus. Construit depuis Neo4j au premier appel;
+    ensuite, après `max_age` secondes ou une écriture (mark_stale), reconstruit
+    en tâche de fond pendant que l'instantané courant reste servi
+    """
+    global _index, _index_built_at, _stale, _rebuilding
+    with _index_lock:
+        if _index is None:
+            _index = GenreIndex.from_neo4j()
+            _index_built_at = time.monotonic()
+            _stale = False
+            return _index
+        age = time.monotonic() - _index_built_at
+        expired = max_age is not None and age > max_age
+        if (expired or (_stale and age > refresh_interval)) and not _rebuilding:
+            # Les écritures reçues à partir d'ici repasseront l'index à périmé
+            _rebuilding, _stale = True, False
+            threading.Thread(target=_rebuild, name='genre-index-rebuild', daemon=True).start()
+        return _index
+
+
+def mark_stale():
+    """Note ajoutée/retirée, série ou genres modifiés: reconstruire au prochain get_index"""
+    global _stale
+    _stale = True
+
+
+def reset_index():
+    """Oublier l'index (reconstruit au prochain appel)"""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def recommend_for_user(user_id, limit=10):
+    """Recommandations par genres: séries notées/aimées depuis le seen-set, fusion en mémoire"""
+    from django.conf import settings
+    from recommendations.seen import seen_sets
+    config = getattr(settings, 'GENRE_INDEX', {})
+    index = get_index(max_age=config.get('MAX_AGE', 3600), refresh_interval=config.get('REFRESH_INTERVAL', 60))
+    seen = seen_sets.get(user_id)
+    return index.recommend(seen.liked, limit, exclude=seen.rated)
@@ -0,0 +1,176 @@
+"""
+Commande de banc d'essai des requêtes des modèles sur un graphe synthétique
+Usage: python manage.py benchmark_models --scale small --load --confirm --output bench.json
+       python manage.py benchmark_models --output bench.json --baseline baseline.json
+       python manage.py benchmark_models --mode python --scale medium
+       python manage.py benchmark_models --cases Series --scaling
+
+--load vide la base Neo4j configurée puis y charge le graphe synthétique
+(utiliser un conteneur Neo4j local dédié). Sans --load, le graphe déjà chargé
+avec les mêmes paramètres est réutilisé. Le mode python ne demande aucune base.
+"""
+
+import json
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recommendations import benchmark
+from recommendations.synthetic import SCALES, SyntheticGraph
+
+
+class Command(BaseCommand):
+    help = 'Mesurer latences et db hits des requêtes des modèles (graphe synthétique)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['neo4j', 'python'], default='neo4j')
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small', help='Taille du graphe synthétique')
+        parser.add_argument('--users', type=int, help="Nombre d'utilisateurs (remplace --scale)")
+        parser.add_argument('--series', type=int, help='Nombre de séries (remplace --scale)')
+        parser.add_argument('--actors', type=int, help="Nombre d'acteurs (remplace --scale)")
+        parser.add_argument('--ratings-per-user', type=int, help='Notes moyennes par utilisateur (remplace --scale)')
+        parser.add_argument('--zipf', type=float, default=None, help='Exposant de Zipf des popularités (défaut: 1.1)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=20, help='Exécutions mesurées par cas')
+        parser.add_argument('--warmup', type=int, default=2, help='Exécutions de chauffe par cas')
+        parser.add_argument('--cases', nargs='+', help='Ne mesurer que les cas commençant par ces préfixes')
+        parser.add_argument('--no-profile', action='store_true', help='Ne pas rejouer les requêtes avec PROFILE')
+        parser.add_argument('--load', action='store_true', help='Vider la base et charger le graphe synthétique')
+        parser.add_argument('--confirm', action='store_true', help='Confirmer --load')
+        parser.add_argument('--output', type=str, help='Rapport JSON')
+        parser.add_argument('--baseline', type=str, help='Rapport JSON de référence à comparer')
+        parser.add_argument('--threshold', type=float, default=0.25, help='Tolérance de régression (0.25 = +25%%)')
+        parser.add_argument(
+            '--scaling',
+            action='store_true',
+            help='Vérifier avec PROFILE que les db hits croissent linéairement (genres + acteurs, pas genres × acteurs)',
+        )
+
+    def handle(self, *args, **options):
+        graph = SyntheticGraph.from_scale(
+            options['scale'],
+            seed=options['seed'],
+            users=options['users'],
+            series=options['series'],
+            actors=options['actors'],
+            ratings_per_user=options['ratings_per_user'],
+            zipf=options['zipf'],
+        )
+
+        self.stdout.write('='*60)
+        self.stdout.write(f"BANC D'ESSAI DES MODÈLES ({options['mode']})")
+        self.stdout.write('='*60)
+        self.stdout.write(', '.join(f'{key}={value}' for key, value in graph.params().items()))
+
+        report = {
+            'meta': {
+                'mode': options['mode'],
+                'graph': graph.params(),
+                'repeat': options['repeat'],
+                'warmup': options['warmup'],
+                'created_at': int(time.time()),
+            },
+            'cases': {},
+        }
+
+        if options['mode'] == 'python':
+            with tempfile.TemporaryDirectory() as workdir:
+                self.run_cases(benchmark.python_cases(graph, workdir), report, options, connection=None)
+        else:
+            from tv_recommender.neo4j_db import neo4j_db
+
+            if options['load']:
+                report['load'] = self.load(graph, options)
+            try:
+                self.run_cases(benchmark.model_cases(graph), report, options, connection=neo4j_db)
+            finally:
+                benchmark.cleanup_model_cases()
+            if options['scaling']:
+                report['scaling'] = self.run_scaling(neo4j_db)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write(f"\nRapport: {options['output']}")
+
+        if options['baseline']:
+            self.check_baseline(report, options)
+
+        nonlinear = [name for name, stats in report.get('scaling', {}).items() if not stats['linear']]
+        if nonlinear:
+            raise CommandError(f"Croissance non linéaire des db hits: {', '.join(nonlinear)}")
+
+    def load(self, graph, options):
+        if not options['confirm']:
+            raise CommandError(
+                '--load supprime toutes les données Neo4j: ajouter --confirm '
+                '(sur une base de test uniquement)'
+            )
+        from tv_recommender.neo4j_db import neo4j_db
+
+        self.stdout.write('\nChargement du graphe synthétique...')
+        # CALL ... IN TRANSACTIONS: transaction implicite (auto-commit) obligatoire
+        neo4j_db.query('MATCH (n) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS')
+
+        def progress(stage, stats):
+            self.stdout.write(self.style.SUCCESS(
+                f"✓ {stage}: {stats['rows']} lignes en {stats['seconds']:.1f}s "
+                f"({stats['rows_per_second']:,.0f} lignes/s)"
+            ))
+        return benchmark.load_graph(graph, progress=progress)
+
+    def run_cases(self, cases, report, options, connection):
+        if options['cases']:
+            cases = [case for case in cases if case.name.startswith(tuple(options['cases']))]
+
+        self.stdout.write(f'\n{"cas":<42} {"p50":>9} {"p90":>9} {"p99":>9} {"db hits":>10} {"lignes":>8}')
+        for case in cases:
+            try:
+                stats = benchmark.percentiles(
+                    benchmark.time_case(case, options['repeat'], options['warmup'])
+                )
+                if connection is not None and not options['no_profile']:
+                    stats.update(benchmark.profile_case(connection, case))
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'✗ {case.name}: {e}'))
+                report['cases'][case.name] = {'error': str(e)}
+                continue
+
+            report['cases'][case.name] = stats
+            self.stdout.write(
+                f"{case.name:<42} {stats['p50_ms']:>7.2f}ms {stats['p90_ms']:>7.2f}ms "
+                f"{stats['p99_ms']:>7.2f}ms {stats.get('db_hits', '-'):>10} {stats.get('rows', '-'):>8}"
+            )
+
+    def run_scaling(self, connection):
+        sizes = benchmark.SCALING_SIZES
+        self.stdout.write(
+            f'\nCroissance des db hits (genres = acteurs = {", ".join(map(str, sizes))}; '
+            f'linéaire si x{benchmark.SCALING_MAX_GROWTH} au plus quand la taille double)'
+        )
+        results = benchmark.scaling_check(connection)
+        for name, stats in results.items():
+            hits = ' -> '.join(str(stats['db_hits'][size]) for size in sizes)
+            line = f"{name:<32} {hits:<24} x{stats['growth']}"
+            self.stdout.write(self.style.SUCCESS(f'✓ {line}') if stats['linear'] else self.style.ERROR(f'✗ {line}'))
+        return results
+
+    def check_baseline(self, report, options):
+        if not os.path.exists(options['baseline']):
+            raise CommandError(f"Rapport de référence introuvable: {options['baseline']}")
+        with open(options['baseline'], 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+        if baseline.get('meta', {}).get('graph') != report['meta']['graph']:
+            self.stdout.write(self.style.WARNING('Graphe différent de la référence: comparaison indicative'))
+
+        regressions = benchmark.compare(report, baseline, options['threshold'])
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS(f"\n✓ Aucune régression par rapport à {options['baseline']}"))
+            return
+        self.stdout.write(self.style.ERROR(f'\n✗ {len(regressions)} régression(s):'))
+        for name, metric, before, after in regressions:
+            self.stdout.write(self.style.ERROR(f'  {name}: {metric} {before} -> {after}'))
+        raise CommandError('Régressions détectées')
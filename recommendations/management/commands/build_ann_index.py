@@ -0,0 +1,62 @@
+"""
+Commande pour construire l'index ANN des embeddings de séries (recommendations/ann.py)
+Usage: python manage.py build_ann_index [--ratings data/ratings.csv --series data/series.csv
+                                         --series-genres data/series_genres.csv] [--dim 64]
+
+Sans --ratings, les notes et les métadonnées sont lues dans Neo4j.
+L'index est écrit dans settings.ANN_INDEX['PATH'] (ou --output).
+"""
+
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Construire l'index ANN (SVD + genres, IVF) des séries"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ratings', type=str, help='ratings.csv (sinon Neo4j)')
+        parser.add_argument('--series', type=str, help='series.csv (titres, contenu adulte)')
+        parser.add_argument('--series-genres', type=str, help='series_genres.csv')
+        parser.add_argument('--dim', type=int, default=64, help='Dimension de la SVD tronquée')
+        parser.add_argument('--genre-weight', type=float, default=0.5, help='Poids de la composante genres')
+        parser.add_argument('--nlist', type=int, default=None, help='Nombre de listes IVF (défaut: racine du nombre de séries)')
+        parser.add_argument('--seed', type=int, default=0, help='Graine du k-means')
+        parser.add_argument('--output', type=str, default=None, help="Dossier de l'index")
+
+    def handle(self, *args, **options):
+        from recommendations import ann
+
+        config = getattr(settings, 'ANN_INDEX', {})
+        output = options['output'] or config.get('PATH', os.path.join(settings.BASE_DIR, '.ann_index'))
+
+        self.stdout.write('='*60)
+        self.stdout.write("CONSTRUCTION DE L'INDEX ANN")
+        self.stdout.write('='*60)
+        self.stdout.write(f"Source: {options['ratings'] or 'Neo4j'}")
+
+        try:
+            started = time.perf_counter()
+            index = ann.build_index(
+                ratings_path=options['ratings'],
+                series_path=options['series'],
+                series_genres_path=options['series_genres'],
+                dim=options['dim'],
+                genre_weight=options['genre_weight'],
+                nlist=options['nlist'],
+                seed=options['seed'],
+            )
+            index.save(output)
+            ann.reset_index()
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'✗ Erreur: {e}'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✓ {len(index.ids)} séries, dimension {index.vectors.shape[1]}, '
+            f'{len(index.centroids)} listes en {time.perf_counter() - started:.1f}s'
+        ))
+        self.stdout.write(f'Index: {output}')
@@ -0,0 +1,89 @@
+"""
+Commande pour pré-calculer le graphe de similarité entre séries
+(:Series)-[:SIMILAR_TO {score}]->(:Series), top-K voisins par série
+Usage: python manage.py compute_similar_series [--top-k 20] [--workers 4] [--full]
+
+Par défaut, seules les séries modifiées depuis le dernier calcul (nouvelle
+note, genres/acteurs édités dans l'admin) sont recalculées. Les poids sont
+ceux de settings.SIMILARITY.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from recommendations import csv_import
+from recommendations.models import Recommendation, Similarity
+
+
+class Command(BaseCommand):
+    help = 'Pré-calculer les relations SIMILAR_TO entre séries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=None, help='Voisins conservés par série (défaut: SIMILARITY["TOP_K"])')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Nombre de séries par transaction')
+        parser.add_argument('--workers', type=int, default=4, help='Nombre de workers parallèles')
+        parser.add_argument('--series', nargs='+', help='Limiter à ces series_id')
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recalculer toutes les séries, pas seulement celles modifiées',
+        )
+
+    def handle(self, *args, **options):
+        config = Similarity.config()
+        top_k = options['top_k'] or config['TOP_K']
+
+        self.stdout.write('='*60)
+        self.stdout.write('CALCUL DU GRAPHE DE SIMILARITÉ (SIMILAR_TO)')
+        self.stdout.write('='*60)
+        self.stdout.write(
+            f"top-K={top_k}, poids genres={config['GENRE_WEIGHT']}, "
+            f"acteurs={config['ACTOR_WEIGHT']}, notes={config['RATING_WEIGHT']}"
+        )
+
+        # Horodatage pris une fois, avant les lectures, sur l'horloge de la base (comme
+        # s.similarity_updated_at): une note ajoutée pendant le calcul sera plus
+        # récente et la série reprise au prochain passage
+        computed_at = Recommendation.database_time()
+
+        if options['series']:
+            series_ids = options['series']
+        else:
+            series_ids = Similarity.series_to_refresh(incremental=not options['full'])
+
+        self.stdout.write(f'{len(series_ids)} série(s) à traiter')
+        if not series_ids:
+            return
+
+        chunk_size = max(1, options['chunk_size'])
+        chunks = [series_ids[i:i + chunk_size] for i in range(0, len(series_ids), chunk_size)]
+        progress = csv_import.Throughput()
+        edges = 0
+        errors = 0
+
+        def refresh(chunk):
+            return Similarity.refresh(chunk, computed_at, top_k)
+
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            futures = [(chunk, pool.submit(refresh, chunk)) for chunk in chunks]
+            for chunk, future in futures:
+                try:
+                    edges += future.result()
+                except Exception as e:
+                    errors += len(chunk)
+                    self.stdout.write(self.style.ERROR(f'✗ Lot {chunk[0]}..{chunk[-1]}: {e}'))
+                    continue
+
+                progress.add(len(chunk))
+                self.stdout.write(
+                    f'  {progress.rows}/{len(series_ids)} séries... '
+                    f'({progress.rate:,.1f} séries/s)'
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✓ {progress.rows} série(s), {edges} relation(s) SIMILAR_TO en {progress.elapsed:.1f}s '
+            f'({progress.rate:,.1f} séries/s)'
+        ))
+        if errors:
+            self.stdout.write(self.style.ERROR(f'Erreurs: {errors}'))
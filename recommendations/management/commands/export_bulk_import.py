@@ -0,0 +1,61 @@
+"""
+Commande pour générer les fichiers d'import hors-ligne `neo4j-admin database import`
+à partir des mêmes CSV que import_csv_data (aucune connexion Neo4j nécessaire)
+Usage: python manage.py export_bulk_import --output import/ --series series.csv ...
+"""
+
+from django.core.management.base import BaseCommand
+
+from recommendations import bulk_export, csv_import
+
+
+class Command(BaseCommand):
+    help = 'Générer les fichiers CSV annotés pour neo4j-admin database import'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', type=str, required=True, help='Dossier de sortie')
+        parser.add_argument('--actors', type=str, help='Chemin vers actors.csv')
+        parser.add_argument('--series', type=str, help='Chemin vers series.csv')
+        parser.add_argument('--genres', type=str, help='Chemin vers genres.csv')
+        parser.add_argument('--series-genres', type=str, help='Chemin vers series_genres.csv')
+        parser.add_argument('--series-actors', type=str, help='Chemin vers series_actors.csv')
+        parser.add_argument('--users', type=str, help='Chemin vers users.csv')
+        parser.add_argument('--ratings', type=str, help='Chemin vers ratings.csv')
+        parser.add_argument('--limit', type=int, default=None, help='Limiter le nombre de lignes par fichier')
+        parser.add_argument('--database', type=str, default='neo4j', help='Base cible de neo4j-admin')
+
+    def handle(self, *args, **options):
+        self.stdout.write('='*60)
+        self.stdout.write('GÉNÉRATION DES FICHIERS NEO4J-ADMIN IMPORT')
+        self.stdout.write('='*60)
+
+        sources = {
+            key: options[key]
+            for key in ('genres', 'actors', 'series', 'series_genres', 'series_actors', 'users', 'ratings')
+            if options[key]
+        }
+        if not sources:
+            self.stdout.write(self.style.WARNING('Aucun fichier CSV fourni'))
+            return
+
+        progress = csv_import.Throughput()
+        try:
+            counts = bulk_export.export_all(sources, options['output'], options['limit'])
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'✗ Erreur: {e}'))
+            return
+
+        for filename, count in counts.items():
+            progress.add(count)
+            self.stdout.write(self.style.SUCCESS(f'✓ {filename:15} : {count:>10} lignes'))
+
+        self.stdout.write(
+            f'\n{progress.rows} lignes écrites en {progress.elapsed:.1f}s '
+            f'({progress.rate:,.0f} lignes/s)'
+        )
+        self.stdout.write('\nBase arrêtée, lancer:\n')
+        self.stdout.write(bulk_export.admin_import_command(options['output'], counts, options['database']))
+        self.stdout.write(
+            '\nPuis, base redémarrée: python manage.py init_neo4j_constraints '
+            '&& python manage.py repair_rating_aggregates'
+        )
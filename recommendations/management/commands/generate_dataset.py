@@ -0,0 +1,115 @@
+"""
+Commande pour générer un jeu de données synthétique au format d'import_csv_data
+(actors, series, genres, series_genres, series_actors, users, ratings)
+Usage: python manage.py generate_dataset --output-dir data/synthetic --scale large --workers 8
+       python manage.py generate_dataset --output-dir data/100m --scale xlarge --seed 42
+
+Sortie déterministe pour une graine donnée, quel que soit --workers: chaque
+plage d'index est écrite par un processus dans un fichier partiel, puis les
+parties sont concaténées dans l'ordre. La mémoire ne dépend pas du nombre de notes.
+"""
+
+import csv
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recommendations import csv_import
+from recommendations.synthetic import CSV_FILES, SCALES, SyntheticGraph, write_part
+
+
+# Entités par fichier partiel (utilisateurs pour ratings/users, séries, acteurs)
+DEFAULT_CHUNK_SIZE = 20000
+
+
+class Command(BaseCommand):
+    help = 'Générer des CSV synthétiques (popularité Zipf, affinités de genres) pour import_csv_data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', type=str, required=True, help='Dossier de sortie')
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small', help='Taille du jeu de données')
+        parser.add_argument('--users', type=int, help="Nombre d'utilisateurs (remplace --scale)")
+        parser.add_argument('--series', type=int, help='Nombre de séries (remplace --scale)')
+        parser.add_argument('--actors', type=int, help="Nombre d'acteurs (remplace --scale)")
+        parser.add_argument('--ratings-per-user', type=int, help='Notes moyennes par utilisateur (remplace --scale)')
+        parser.add_argument('--zipf', type=float, default=None, help='Exposant de Zipf des popularités (défaut: 1.1)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Processus de génération')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Entités par fichier partiel')
+        parser.add_argument('--files', nargs='+', choices=sorted(CSV_FILES), help='Ne générer que ces fichiers')
+        parser.add_argument('--force', action='store_true', help='Écraser les fichiers existants')
+
+    def handle(self, *args, **options):
+        graph = SyntheticGraph.from_scale(
+            options['scale'],
+            seed=options['seed'],
+            users=options['users'],
+            series=options['series'],
+            actors=options['actors'],
+            ratings_per_user=options['ratings_per_user'],
+            zipf=options['zipf'],
+        )
+        output_dir = options['output_dir']
+        kinds = options['files'] or list(CSV_FILES)
+
+        os.makedirs(output_dir, exist_ok=True)
+        existing = [
+            CSV_FILES[kind][0] for kind in kinds
+            if os.path.exists(os.path.join(output_dir, CSV_FILES[kind][0]))
+        ]
+        if existing and not options['force']:
+            raise CommandError(f"Fichiers déjà présents ({', '.join(existing)}): utiliser --force")
+
+        self.stdout.write('='*60)
+        self.stdout.write('GÉNÉRATION DU JEU DE DONNÉES SYNTHÉTIQUE')
+        self.stdout.write('='*60)
+        self.stdout.write(', '.join(f'{key}={value}' for key, value in graph.params().items()))
+
+        chunk_size = max(1, options['chunk_size'])
+        with ProcessPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            for kind in kinds:
+                try:
+                    self.generate(pool, graph, kind, output_dir, chunk_size)
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f'✗ Erreur ({kind}): {e}'))
+                    return
+
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Jeu de données écrit dans {output_dir}'))
+        self.stdout.write(
+            'Import: python manage.py import_csv_data ' + ' '.join(
+                f"--{kind.replace('_', '-')} {os.path.join(output_dir, CSV_FILES[kind][0])}"
+                for kind in kinds
+            )
+        )
+
+    def generate(self, pool, graph, kind, output_dir, chunk_size):
+        filename, columns, _, total_attr = CSV_FILES[kind]
+        total = getattr(graph, total_attr) if total_attr else 1
+        ranges = [(start, min(start + chunk_size, total)) for start in range(0, total, chunk_size)]
+        progress = csv_import.Throughput()
+
+        with tempfile.TemporaryDirectory(dir=output_dir, prefix=f'.{kind}-') as parts_dir:
+            futures = [
+                (pool.submit(write_part, graph, kind, start, stop, os.path.join(parts_dir, f'{i:06d}.csv')),
+                 os.path.join(parts_dir, f'{i:06d}.csv'))
+                for i, (start, stop) in enumerate(ranges)
+            ]
+
+            # Concaténation dans l'ordre des plages, au fil de l'eau
+            tmp_path = os.path.join(output_dir, f'{filename}.tmp')
+            with open(tmp_path, 'w', encoding='utf-8', newline='') as out:
+                csv.writer(out).writerow(columns)
+                for future, part_path in futures:
+                    progress.add(future.result())
+                    with open(part_path, 'r', encoding='utf-8', newline='') as part:
+                        shutil.copyfileobj(part, out)
+                    os.remove(part_path)
+            os.replace(tmp_path, os.path.join(output_dir, filename))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {filename}: {progress.rows:,} lignes en {progress.elapsed:.1f}s '
+            f'({progress.rate:,.0f} lignes/s)'
+        ))
@@ -2,18 +2,52 @@
 """
 Commande Django pour importer les données CSV vers Neo4j
 Usage: python manage.py import_csv_data --actors actors.csv --series series.csv ...
+
+Les lignes sont lues en flux et envoyées par lots (--batch-size) via une seule
+requête `UNWIND $rows AS row MERGE ...` par lot, dans une transaction d'écriture.
+
+Avec --workers N, les étapes de nœuds indépendantes (genres, acteurs, séries,
+utilisateurs) tournent en parallèle ; une étape de relations ne démarre qu'une
+fois ses étapes de nœuds terminées. Les notations sont réparties entre N
+workers par user_id, pour que deux transactions ne verrouillent jamais le même
+nœud User en même temps.
+
+Après chaque lot validé, l'offset atteint dans le fichier est enregistré
+(--checkpoint). En cas d'échec, --resume reprend au dernier lot validé ; toutes
+les écritures étant des MERGE, rejouer un lot partiellement validé est sans effet.
 """
 
-from django.core.management.base import BaseCommand
-from recommendations.models import User, Series, Genre, Actor, Rating
-from tv_recommender.neo4j_db import neo4j_db
-import csv
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from django.core.management.base import BaseCommand, CommandError
+from recommendations.models import User, Series, Genre, Actor, Rating, Similarity
+from recommendations import csv_import
 import os
+import queue
+import threading
+import zlib
+
+
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_CHECKPOINT = '.import_checkpoint.json'
+
+# Étapes d'import: (option, méthode, dépendances)
+STAGES = [
+    ('genres', 'import_genres', ()),
+    ('actors', 'import_actors', ()),
+    ('series', 'import_series', ()),
+    ('series_genres', 'import_series_genres', ('series', 'genres')),
+    ('series_actors', 'import_series_actors', ('series', 'actors')),
+    ('users', 'import_users', ()),
+    ('ratings', 'import_ratings', ('users', 'series')),
+]
+
+# Étapes qui acceptent --limit
+LIMITED_STAGES = ('actors', 'series', 'users', 'ratings')
 
 
 class Command(BaseCommand):
     help = 'Importer les données CSV vers Neo4j'
-    
+
     def add_arguments(self, parser):
         parser.add_argument('--actors', type=str, help='Chemin vers actors.csv')
         parser.add_argument('--series', type=str, help='Chemin vers series.csv')
@@ -23,319 +57,316 @@ class Command(BaseCommand):
         parser.add_argument('--users', type=str, help='Chemin vers users.csv')
         parser.add_argument('--ratings', type=str, help='Chemin vers ratings.csv')
         parser.add_argument('--limit', type=int, default=None, help='Limiter le nombre de lignes importées')
-    
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Nombre de lignes envoyées par transaction (défaut: {DEFAULT_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Nombre de workers parallèles (défaut: 1, import séquentiel)'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            default=DEFAULT_CHECKPOINT,
+            help=f'Fichier des points de reprise (défaut: {DEFAULT_CHECKPOINT})'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Reprendre chaque fichier au dernier lot validé',
+        )
+
     def handle(self, *args, **options):
+        self.batch_size = max(1, options['batch_size'])
+        self.workers = max(1, options['workers'])
+        self.resume = options['resume']
+        if not self.resume and os.path.exists(options['checkpoint']):
+            os.remove(options['checkpoint'])
+        self.checkpoint = csv_import.Checkpoint(options['checkpoint'])
+
         self.stdout.write('='*60)
         self.stdout.write('IMPORT DES DONNÉES CSV VERS NEO4J')
+        self.stdout.write(f'Taille des lots: {self.batch_size} - Workers: {self.workers}')
         self.stdout.write('='*60)
-        
-        # Import des genres
-        if options['genres']:
-            self.import_genres(options['genres'])
-        
-        # Import des acteurs
-        if options['actors']:
-            self.import_actors(options['actors'], options['limit'])
-        
-        # Import des séries
-        if options['series']:
-            self.import_series(options['series'], options['limit'])
-        
-        # Import des relations series-genres
-        if options['series_genres']:
-            self.import_series_genres(options['series_genres'])
-        
-        # Import des relations series-acteurs
-        if options['series_actors']:
-            self.import_series_actors(options['series_actors'])
-        
-        # Import des utilisateurs
-        if options['users']:
-            self.import_users(options['users'], options['limit'])
-
-        # Import des notations (relations RATED)
-        if options['ratings']:
-            self.import_ratings(options['ratings'], options['limit'])
-        
+
+        # Étapes demandées, dans l'ordre genres → acteurs → séries → relations → notations
+        stages = {}
+        for option, method, deps in STAGES:
+            if not options[option]:
+                continue
+            stage_args = [options[option]]
+            if option in LIMITED_STAGES:
+                stage_args.append(options['limit'])
+            stages[option] = (deps, getattr(self, method), stage_args)
+
+        if self.workers > 1:
+            self.run_stages(stages)
+        else:
+            for deps, method, stage_args in stages.values():
+                method(*stage_args)
+
         self.stdout.write(self.style.SUCCESS('\n✓ Import terminé!'))
-    
-    def import_genres(self, filepath):
-        """Importer les genres depuis genres.csv"""
-        self.stdout.write(f'\n--- Import des genres depuis {filepath} ---')
-        
+
+    def run_stages(self, stages):
+        """
+        Exécuter les étapes en parallèle en respectant leurs dépendances
+        (une étape démarre dès que toutes ses dépendances demandées sont terminées)
+        """
+        pending = {
+            name: ([dep for dep in deps if dep in stages], method, stage_args)
+            for name, (deps, method, stage_args) in stages.items()
+        }
+        done = set()
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while pending or running:
+                for name, (deps, method, stage_args) in list(pending.items()):
+                    if all(dep in done for dep in deps):
+                        running[pool.submit(method, *stage_args)] = name
+                        del pending[name]
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    # Étape en échec (CommandError): ses dépendantes ne sont pas lancées
+                    future.result()
+                    done.add(name)
+
+    def run_batched(self, stage, filepath, label, parser, writer, limit=None, partition_key=None,
+                    finalize=None):
+        """
+        Lire `filepath` en flux, normaliser chaque ligne avec `parser`
+        et envoyer les lignes par lots à `writer` (une transaction par lot).
+        Un point de reprise est enregistré après chaque lot validé.
+        Si `partition_key` est fourni et --workers > 1, les lots sont répartis
+        entre les workers selon cette clé.
+        `finalize(rows, resumed)` tourne après le dernier lot; l'étape n'est
+        marquée terminée qu'une fois finalize réussi, donc rejouée par --resume.
+        Un lot en échec lève CommandError: les étapes qui en dépendent ne
+        démarrent pas et le point de reprise reste sur le dernier lot validé.
+        """
         if not os.path.exists(filepath):
-            self.stdout.write(self.style.ERROR(f'✗ Fichier introuvable: {filepath}'))
-            return
-        
+            raise CommandError(f'Fichier introuvable: {filepath}')
+
+        batch_size = getattr(self, 'batch_size', DEFAULT_BATCH_SIZE)
+        workers = getattr(self, 'workers', 1)
+        checkpoint = getattr(self, 'checkpoint', None)
+        key = csv_import.Checkpoint.key(stage, filepath)
+
+        # Reprise depuis le dernier lot validé
+        offset, rows_done = 0, 0
+        if checkpoint is not None and getattr(self, 'resume', False):
+            saved = checkpoint.get(key)
+            if saved and saved.get('done'):
+                self.stdout.write(f'  Déjà importé ({saved["rows"]} {label}), skip...')
+                return 0
+            if saved:
+                offset, rows_done = saved['offset'], saved['rows']
+                self.stdout.write(f'  Reprise après {rows_done} {label} (offset {offset})')
+
+        progress = csv_import.Throughput()
+
+        def commit(offset, rows):
+            if checkpoint is not None:
+                checkpoint.save(key, offset, rows)
+
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                count = 0
-                
-                for row in reader:
-                    genre_id = row.get('genre_id')
-                    name = row.get('name')
-                    
-                    if genre_id and name:
-                        Genre.create(genre_id, name)
-                        count += 1
-                        if count % 10 == 0:
-                            self.stdout.write(f'  {count} genres importés...')
-            
-            self.stdout.write(self.style.SUCCESS(f'✓ {count} genres importés'))
-        
+            if partition_key and workers > 1:
+                chunks = csv_import.iter_chunks(
+                    filepath, parser, batch_size * workers, limit, offset, rows_done
+                )
+                self.write_partitioned(chunks, label, writer, partition_key, progress, commit)
+            else:
+                chunks = csv_import.iter_chunks(filepath, parser, batch_size, limit, offset, rows_done)
+                for chunk, chunk_offset, rows in chunks:
+                    writer(chunk)
+                    commit(chunk_offset, rows)
+                    progress.add(len(chunk))
+                    self.stdout.write(
+                        f'  {rows} {label} importé(e)s... ({progress.rate:,.0f} lignes/s)'
+                    )
+
+            if finalize is not None:
+                finalize(progress.rows, resumed=bool(offset or rows_done))
+
+            if checkpoint is not None:
+                saved = checkpoint.get(key) or {'offset': offset, 'rows': rows_done}
+                checkpoint.save(key, saved['offset'], saved['rows'], done=True)
+
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ {progress.rows} {label} importé(e)s en {progress.elapsed:.1f}s '
+                f'({progress.rate:,.0f} lignes/s)'
+            ))
+
         except Exception as e:
-            self.stdout.write(self.style.ERROR(f'✗ Erreur: {e}'))
-    
+            self.stdout.write(self.style.ERROR(
+                f'✗ Erreur après {progress.rows} {label}: {e}'
+            ))
+            if checkpoint is not None:
+                self.stdout.write('  Relancer avec --resume pour reprendre au dernier lot validé')
+            raise CommandError(f'Import des {label} interrompu: {e}') from e
+
+        return progress.rows
+
+    def write_partitioned(self, chunks, label, writer, partition_key, progress, commit):
+        """
+        Répartir chaque lot lu entre les workers selon `partition_key`.
+        Toutes les lignes d'une même clé vont au même worker, qui écrit ses
+        lots l'un après l'autre: pas de verrous concurrents sur ce nœud.
+        Le point de reprise n'avance que lorsque tous les lots précédents
+        sont validés, quel que soit l'ordre de fin des workers.
+        """
+        workers = self.workers
+        # File bornée par worker: la mémoire reste constante quelle que soit la taille du fichier
+        queues = [queue.Queue(maxsize=2) for _ in range(workers)]
+        lock = threading.Lock()
+        errors = []
+        # numéro de lot -> [parties restantes, offset, lignes lues]
+        pending = {}
+        next_commit = [0]
+
+        def part_done(seq, count):
+            with lock:
+                progress.add(count)
+                pending[seq][0] -= 1
+                last = None
+                while next_commit[0] in pending and pending[next_commit[0]][0] == 0:
+                    last = pending.pop(next_commit[0])
+                    next_commit[0] += 1
+                if last is not None:
+                    commit(last[1], last[2])
+                    self.stdout.write(
+                        f'  {last[2]} {label} importé(e)s... ({progress.rate:,.0f} lignes/s)'
+                    )
+
+        def consume(parts):
+            while True:
+                item = parts.get()
+                if item is None:
+                    return
+                if errors:
+                    # Une erreur est survenue: on vide la file sans écrire
+                    continue
+                seq, part = item
+                try:
+                    writer(part)
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                part_done(seq, len(part))
+
+        threads = [
+            threading.Thread(target=consume, args=(parts,), daemon=True)
+            for parts in queues
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            for seq, (chunk, chunk_offset, rows) in enumerate(chunks):
+                if errors:
+                    break
+                parts = [[] for _ in range(workers)]
+                for row in chunk:
+                    index = zlib.crc32(str(row[partition_key]).encode('utf-8')) % workers
+                    parts[index].append(row)
+                parts = [(index, part) for index, part in enumerate(parts) if part]
+
+                with lock:
+                    pending[seq] = [len(parts), chunk_offset, rows]
+                for index, part in parts:
+                    queues[index].put((seq, part))
+        finally:
+            for parts in queues:
+                parts.put(None)
+            for thread in threads:
+                thread.join()
+
+        if errors:
+            raise errors[0]
+
+    def import_genres(self, filepath):
+        """Importer les genres depuis genres.csv"""
+        self.stdout.write(f'\n--- Import des genres depuis {filepath} ---')
+        return self.run_batched('genres', filepath, 'genres', csv_import.parse_genre, Genre.bulk_create)
+
     def import_actors(self, filepath, limit=None):
         """Importer les acteurs depuis actors.csv"""
         self.stdout.write(f'\n--- Import des acteurs depuis {filepath} ---')
-        
-        if not os.path.exists(filepath):
-            self.stdout.write(self.style.ERROR(f'✗ Fichier introuvable: {filepath}'))
-            return
-        
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                count = 0
-                
-                for row in reader:
-                    if limit and count >= limit:
-                        break
-                    
-                    actor_id = row.get('actor_id')
-                    name = row.get('name')
-                    birth_year = row.get('birth_year')
-                    death_year = row.get('death_year')
-                    professions = row.get('professions')
-                    known_for_titles = row.get('known_for_titles')
-                    
-                    if actor_id and name:
-                        try:
-                            Actor.create(
-                                actor_id=actor_id,
-                                name=name,
-                                birth_year=int(birth_year) if birth_year and birth_year != '\\N' else None,
-                                death_year=int(death_year) if death_year and death_year != '\\N' else None,
-                                professions=professions,
-                                known_for_titles=known_for_titles
-                            )
-                            count += 1
-                            if count % 100 == 0:
-                                self.stdout.write(f'  {count} acteurs importés...')
-                        except Exception as actor_error:
-                            # Si l'acteur existe déjà, continuer
-                            if "already exists" in str(actor_error):
-                                self.stdout.write(f'  Acteur "{name}" (ID: {actor_id}) déjà existent, skip...')
-                                continue
-                            else:
-                                raise actor_error
-            
-            self.stdout.write(self.style.SUCCESS(f'✓ {count} acteurs importés'))
-        
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'✗ Erreur: {e}'))
-    
+        return self.run_batched(
+            'actors', filepath, 'acteurs', csv_import.parse_actor, Actor.bulk_create, limit
+        )
+
     def import_series(self, filepath, limit=None):
         """Importer les séries depuis series.csv"""
         self.stdout.write(f'\n--- Import des séries depuis {filepath} ---')
-        
-        if not os.path.exists(filepath):
-            self.stdout.write(self.style.ERROR(f'✗ Fichier introuvable: {filepath}'))
-            return
-        
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                count = 0
-                
-                for row in reader:
-                    if limit and count >= limit:
-                        break
-                    
-                    series_id = row.get('series_id')
-                    title = row.get('title')
-                    original_title = row.get('original_title')
-                    year = row.get('year')
-                    is_adult = row.get('is_adult', '0')
-                    
-                    if series_id and title:
-                        try:
-                            Series.create(
-                                series_id=series_id,
-                                title=title,
-                                original_title=original_title or title,
-                                year=int(year) if year and year != '\\N' else None,
-                                is_adult=(is_adult == '1')
-                            )
-                            count += 1
-                            if count % 100 == 0:
-                                self.stdout.write(f'  {count} séries importées...')
-                        except Exception as series_error:
-                            # Si la série existe déjà, continuer
-                            if "already exists" in str(series_error):
-                                self.stdout.write(f'  Série "{title}" (ID: {series_id}) déjà existente, skip...')
-                                continue
-                            else:
-                                raise series_error
-            
-            self.stdout.write(self.style.SUCCESS(f'✓ {count} séries importées'))
-        
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'✗ Erreur: {e}'))
-    
+        return self.run_batched(
+            'series', filepath, 'séries', csv_import.parse_series, Series.bulk_create, limit
+        )
+
     def import_series_genres(self, filepath):
         """Importer les relations series-genres depuis series_genres.csv"""
         self.stdout.write(f'\n--- Import des relations series-genres depuis {filepath} ---')
-        
-        if not os.path.exists(filepath):
-            self.stdout.write(self.style.ERROR(f'✗ Fichier introuvable: {filepath}'))
-            return
-        
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                count = 0
-                
-                for row in reader:
-                    series_id = row.get('series_id')
-                    genre_name = row.get('genre_name')
-                    
-                    if series_id and genre_name:
-                        Genre.link_to_series(series_id, genre_name)
-                        count += 1
-                        if count % 100 == 0:
-                            self.stdout.write(f'  {count} relations créées...')
-            
-            self.stdout.write(self.style.SUCCESS(f'✓ {count} relations series-genres créées'))
-        
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'✗ Erreur: {e}'))
-    
+        return self.run_batched(
+            'series_genres', filepath, 'relations series-genres',
+            csv_import.parse_series_genre, Genre.bulk_link_to_series
+        )
+
     def import_series_actors(self, filepath):
         """Importer les relations series-acteurs depuis series_actors.csv"""
         self.stdout.write(f'\n--- Import des relations series-acteurs depuis {filepath} ---')
-        
-        if not os.path.exists(filepath):
-            self.stdout.write(self.style.ERROR(f'✗ Fichier introuvable: {filepath}'))
-            return
-        
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                count = 0
-                
-                for row in reader:
-                    series_id = row.get('series_id')
-                    actor_id = row.get('actor_id')
-                    
-                    if series_id and actor_id:
-                        Actor.link_to_series(series_id, actor_id)
-                        count += 1
-                        if count % 100 == 0:
-                            self.stdout.write(f'  {count} relations créées...')
-            
-            self.stdout.write(self.style.SUCCESS(f'✓ {count} relations series-acteurs créées'))
-        
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'✗ Erreur: {e}'))
-    
+        return self.run_batched(
+            'series_actors', filepath, 'relations series-acteurs',
+            csv_import.parse_series_actor, Actor.bulk_link_to_series
+        )
+
     def import_users(self, filepath, limit=None):
         """Importer les utilisateurs depuis users.csv"""
         self.stdout.write(f'\n--- Import des utilisateurs depuis {filepath} ---')
-        
-        if not os.path.exists(filepath):
-            self.stdout.write(self.style.ERROR(f'✗ Fichier introuvable: {filepath}'))
-            return
-        
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                count = 0
-                
-                for row in reader:
-                    if limit and count >= limit:
-                        break
-                    
-                    user_id = row.get('user_id')
-                    name = row.get('name')
-                    email = row.get('email')
-                    age = row.get('age')
-                    gender = row.get('gender')
-                    occupation = row.get('occupation')
-                    join_date = row.get('join_date')
-                    
-                    if user_id and name and email:
-                        User.create(
-                            user_id=user_id,
-                            name=name,
-                            email=email,
-                            age=int(age) if age and age != '\\N' else None,
-                            gender=gender,
-                            occupation=occupation,
-                            join_date=join_date
-                        )
-                        count += 1
-                        if count % 100 == 0:
-                            self.stdout.write(f'  {count} utilisateurs importés...')
-            
-            self.stdout.write(self.style.SUCCESS(f'✓ {count} utilisateurs importés'))
-        
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'✗ Erreur: {e}'))
+        return self.run_batched(
+            'users', filepath, 'utilisateurs', csv_import.parse_user, User.bulk_create, limit
+        )
 
     def import_ratings(self, filepath, limit=None):
         """Importer les notations depuis ratings.csv (création de relations RATED)"""
         self.stdout.write(f'\n--- Import des notations depuis {filepath} ---')
+        batch_size = getattr(self, 'batch_size', DEFAULT_BATCH_SIZE)
+        rated_series = set()
+        lock = threading.Lock()
 
-        if not os.path.exists(filepath):
-            self.stdout.write(self.style.ERROR(f'✗ Fichier introuvable: {filepath}'))
-            return
-
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                count = 0
-
-                for row in reader:
-                    if limit and count >= limit:
-                        break
-
-                    user_id = row.get('user_id')
-                    series_id = row.get('series_id')
-                    rating = row.get('rating')
-                    date = row.get('date')
-                    timestamp = row.get('timestamp')
-
-                    if not (user_id and series_id and rating):
-                        continue
-
-                    try:
-                        rating_value = float(rating)
-                    except (TypeError, ValueError):
-                        continue
-
-                    timestamp_value = None
-                    if timestamp not in (None, '', '\\N'):
-                        try:
-                            timestamp_value = int(timestamp)
-                        except (TypeError, ValueError):
-                            timestamp_value = None
-
-                    Rating.create(
-                        user_id=user_id,
-                        series_id=series_id,
-                        rating=rating_value,
-                        date=date if date not in (None, '', '\\N') else None,
-                        timestamp=timestamp_value,
-                    )
+        def write(chunk):
+            Rating.bulk_create(chunk)
+            with lock:
+                rated_series.update(row['series_id'] for row in chunk)
 
-                    count += 1
-                    if count % 500 == 0:
-                        self.stdout.write(f'  {count} notations importées...')
+        def finalize(rows, resumed):
+            if not rows and not resumed:
+                return
+            # Rating.bulk_create ne tient pas les compteurs à jour: recalcul en fin d'import
+            # (toujours après une reprise: l'exécution interrompue a pu écrire des notes)
+            self.stdout.write('  Recalcul des agrégats de notes...')
+            Rating.repair_aggregates(batch_size=batch_size)
+            self.stdout.write(self.style.SUCCESS('✓ Agrégats de notes recalculés'))
 
-            self.stdout.write(self.style.SUCCESS(f'✓ {count} notations importées'))
+            if resumed:
+                # Séries des lots validés avant l'interruption: relues dans le fichier
+                rated_series.update(
+                    row['series_id'] for row in csv_import.iter_rows(filepath, csv_import.parse_rating, limit)
+                )
+            if rated_series:
+                # Séries notées: similarités à recalculer, marquées une seule fois en fin d'import
+                Similarity.mark_stale(sorted(rated_series), batch_size=batch_size)
+                self.stdout.write(self.style.SUCCESS(
+                    f'✓ {len(rated_series)} série(s) marquée(s) pour recalcul des similarités'
+                ))
 
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'✗ Erreur: {e}'))
\ No newline at end of file
+        return self.run_batched(
+            'ratings', filepath, 'notations', csv_import.parse_rating, write, limit,
+            partition_key='user_id', finalize=finalize
+        )
@@ -27,10 +27,23 @@ class Command(BaseCommand):
             "CREATE INDEX user_name IF NOT EXISTS FOR (u:User) ON (u.name)",
             "CREATE INDEX user_email IF NOT EXISTS FOR (u:User) ON (u.email)",
             "CREATE INDEX series_title IF NOT EXISTS FOR (s:Series) ON (s.title)",
+            "CREATE INDEX series_original_title IF NOT EXISTS FOR (s:Series) ON (s.original_title)",
             "CREATE INDEX series_year IF NOT EXISTS FOR (s:Series) ON (s.year)",
             "CREATE INDEX actor_name IF NOT EXISTS FOR (a:Actor) ON (a.name)",
             "CREATE INDEX rating_timestamp IF NOT EXISTS FOR ()-[r:RATED]-() ON (r.timestamp)",
             "CREATE INDEX rating_value IF NOT EXISTS FOR ()-[r:RATED]-() ON (r.rating)",
+            "CREATE INDEX series_rating_count IF NOT EXISTS FOR (s:Series) ON (s.rating_count)",
+            "CREATE INDEX user_rating_count IF NOT EXISTS FOR (u:User) ON (u.rating_count)",
+        ]
+
+        # Index full-text de Series.search (accents et casse repliés: standard-folding)
+        fulltext_indexes = [
+            "CREATE FULLTEXT INDEX series_title_fulltext IF NOT EXISTS "
+            "FOR (s:Series) ON EACH [s.title, s.original_title] "
+            "OPTIONS {indexConfig: {`fulltext.analyzer`: 'standard-folding'}}",
+            "CREATE FULLTEXT INDEX actor_name_fulltext IF NOT EXISTS "
+            "FOR (a:Actor) ON EACH [a.name] "
+            "OPTIONS {indexConfig: {`fulltext.analyzer`: 'standard-folding'}}",
         ]
 
         try:
@@ -46,6 +59,12 @@ class Command(BaseCommand):
                 neo4j_db.query(index)
                 self.stdout.write(self.style.SUCCESS(f'✓ {index[:60]}...'))
 
+            # Créer les index full-text
+            self.stdout.write('\nCréation des index full-text...')
+            for index in fulltext_indexes:
+                neo4j_db.query(index)
+                self.stdout.write(self.style.SUCCESS(f'✓ {index[:60]}...'))
+
             self.stdout.write(self.style.SUCCESS('\n✓ Initialisation terminée!'))
 
         except Exception as e:
@@ -0,0 +1,113 @@
+"""
+Commande pour pré-calculer les recommandations de tous les utilisateurs
+et les écrire en relations (:User)-[:RECOMMENDED {strategy, score, rank, computed_at}]->(:Series)
+Usage: python manage.py materialize_recommendations [--strategy hybrid] [--workers 4] [--full]
+
+Par défaut, seuls les utilisateurs dont les notes ont changé depuis le dernier
+calcul (u.ratings_updated_at > u.recommendations_computed_at) sont recalculés.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import zlib
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recommendations import csv_import
+from recommendations.models import Recommendation
+
+
+class Command(BaseCommand):
+    help = 'Pré-calculer les recommandations (relations RECOMMENDED)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--strategy',
+            choices=sorted(Recommendation.STRATEGIES),
+            default='hybrid',
+            help='Stratégie à matérialiser (défaut: hybrid)',
+        )
+        parser.add_argument('--limit', type=int, default=10, help='Nombre de recommandations par utilisateur')
+        parser.add_argument('--chunk-size', type=int, default=500, help="Nombre d'utilisateurs par lot")
+        parser.add_argument('--workers', type=int, default=4, help='Nombre de workers parallèles')
+        parser.add_argument('--users', nargs='+', help='Limiter à ces user_id')
+        parser.add_argument('--shard', type=str, default=None, help='Ne traiter que la partie i/n des utilisateurs (ex: 0/4)')
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recalculer tous les utilisateurs, pas seulement ceux dont les notes ont changé',
+        )
+
+    def handle(self, *args, **options):
+        strategy = options['strategy']
+        limit = options['limit']
+        _, score_field = Recommendation.STRATEGIES[strategy]
+
+        self.stdout.write('='*60)
+        self.stdout.write(f'MATÉRIALISATION DES RECOMMANDATIONS ({strategy})')
+        self.stdout.write('='*60)
+
+        if options['users']:
+            user_ids = options['users']
+        else:
+            user_ids = Recommendation.users_to_materialize(incremental=not options['full'])
+
+        if options['shard']:
+            try:
+                index, count = (int(part) for part in options['shard'].split('/'))
+            except ValueError:
+                raise CommandError('--shard attend la forme i/n, ex: 0/4')
+            if count < 1 or not 0 <= index < count:
+                raise CommandError(f'--shard {index}/{count}: attendu 0 <= i < n et n >= 1')
+            user_ids = [
+                user_id for user_id in user_ids
+                if zlib.crc32(str(user_id).encode('utf-8')) % count == index
+            ]
+
+        self.stdout.write(f'{len(user_ids)} utilisateur(s) à traiter')
+        if not user_ids:
+            return
+
+        def compute(user_id):
+            recs = Recommendation.compute(strategy, user_id, limit)
+            return {
+                'user_id': user_id,
+                'strategy': strategy,
+                'recs': [
+                    {'series_id': rec['series_id'], 'score': rec.get(score_field), 'rank': rank}
+                    for rank, rec in enumerate(recs, 1)
+                ],
+            }
+
+        progress = csv_import.Throughput()
+        errors = 0
+        chunk_size = max(1, options['chunk_size'])
+
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            for start in range(0, len(user_ids), chunk_size):
+                chunk = user_ids[start:start + chunk_size]
+                # Horodatage pris avant la lecture, sur l'horloge de la base (comme
+                # u.ratings_updated_at): une note ajoutée pendant le calcul sera plus
+                # récente et l'utilisateur repris au prochain passage
+                computed_at = Recommendation.database_time()
+                try:
+                    rows = list(pool.map(compute, chunk))
+                    for row in rows:
+                        row['computed_at'] = computed_at
+                    Recommendation.materialize(rows)
+                except Exception as e:
+                    errors += len(chunk)
+                    self.stdout.write(self.style.ERROR(f'✗ Lot {start}-{start + len(chunk)}: {e}'))
+                    continue
+
+                progress.add(len(chunk))
+                self.stdout.write(
+                    f'  {progress.rows}/{len(user_ids)} utilisateurs... '
+                    f'({progress.rate:,.1f} utilisateurs/s)'
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✓ {progress.rows} utilisateur(s) matérialisé(s) en {progress.elapsed:.1f}s '
+            f'({progress.rate:,.1f} utilisateurs/s)'
+        ))
+        if errors:
+            self.stdout.write(self.style.ERROR(f'Erreurs: {errors}'))
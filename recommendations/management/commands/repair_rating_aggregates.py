@@ -0,0 +1,45 @@
+"""
+Commande pour recalculer les agrégats de notes dénormalisés
+(Series.rating_count / rating_sum / rating_histogram, User.rating_count)
+Usage: python manage.py repair_rating_aggregates [--batch-size 1000] [--series-only | --users-only]
+
+Rating.create / Rating.delete tiennent ces compteurs à jour; à lancer après
+un import en masse (neo4j-admin import, Rating.bulk_create) ou pour corriger
+une dérive.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from recommendations.models import Rating
+
+
+class Command(BaseCommand):
+    help = 'Recalculer les compteurs de notes des séries et des utilisateurs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Nœuds mis à jour par transaction')
+        scope = parser.add_mutually_exclusive_group()
+        scope.add_argument('--series-only', action='store_true', help='Ne recalculer que les séries')
+        scope.add_argument('--users-only', action='store_true', help='Ne recalculer que les utilisateurs')
+
+    def handle(self, *args, **options):
+        self.stdout.write('='*60)
+        self.stdout.write('RECALCUL DES AGRÉGATS DE NOTES')
+        self.stdout.write('='*60)
+
+        started = time.perf_counter()
+        try:
+            Rating.repair_aggregates(
+                batch_size=max(1, options['batch_size']),
+                series=not options['users_only'],
+                users=not options['series_only'],
+            )
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'✗ Erreur: {e}'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Agrégats recalculés en {time.perf_counter() - started:.1f}s'
+        ))
@@ -5,6 +5,7 @@ Usage: python manage.py stats_neo4j
 
 from django.core.management.base import BaseCommand
 
+from recommendations.models import Series
 from tv_recommender.neo4j_db import neo4j_db
 
 
@@ -47,18 +48,8 @@ class Command(BaseCommand):
                 total_rels += rel['count']
             self.stdout.write(f"  {'TOTAL':15} : {total_rels:>6}")
 
-            # Séries les plus notées
-            top_series_query = """
-            MATCH (u:User)-[r:RATED]->(s:Series)
-            WITH s, r, coalesce(r['rating'], r['score']) AS rating_value
-            WHERE rating_value IS NOT NULL
-            RETURN s.title as title,
-                   COUNT(r) as ratings_count,
-                   AVG(toFloat(rating_value)) as avg_rating
-            ORDER BY ratings_count DESC
-            LIMIT 10
-            """
-            top_series = neo4j_db.query(top_series_query)
+            # Séries les plus notées (compteurs dénormalisés, index series_rating_count)
+            top_series = Series.most_rated(10)
 
             if top_series:
                 self.stdout.write('\nTop 10 séries les plus notées:')
@@ -0,0 +1,137 @@
+"""
+Commande pour entraîner la factorisation ALS des notes (recommendations/als.py)
+Usage: python manage.py train_als [--ratings data/ratings.csv --series data/series.csv] [--factors 64] [--iterations 15]
+                                  [--implicit] [--threads 8] [--warm-start]
+
+Les notes sont lues dans Neo4j sauf si --ratings est donné. Avec --holdout > 0,
+une part des notes est mise de côté pour mesurer RMSE et recall@k, puis le modèle
+est réajusté sur toutes les notes avant d'être sauvegardé dans settings.ALS_MODEL['PATH'].
+"""
+
+import os
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+BLAS_THREAD_VARIABLES = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+
+
+class Command(BaseCommand):
+    help = 'Entraîner les facteurs ALS (stratégie de recommandation als)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ratings', type=str, help='ratings.csv (sinon Neo4j)')
+        parser.add_argument('--series', type=str, help='series.csv (contenu adulte, sinon Neo4j si --ratings absent)')
+        parser.add_argument('--factors', type=int, default=64, help='Nombre de facteurs latents')
+        parser.add_argument('--regularization', type=float, default=0.1, help='Régularisation L2')
+        parser.add_argument('--iterations', type=int, default=15, help="Nombre d'itérations ALS")
+        parser.add_argument('--implicit', action='store_true', help='ALS implicite (confiance 1 + alpha * note)')
+        parser.add_argument('--alpha', type=float, default=40.0, help='Poids de confiance en mode implicite')
+        parser.add_argument('--holdout', type=float, default=0.1, help='Part des notes réservée à l\'évaluation (0 pour ne pas évaluer)')
+        parser.add_argument('--refit-iterations', type=int, default=2, help='Itérations de réajustement sur toutes les notes après évaluation')
+        parser.add_argument('--k', type=int, default=10, help='k du recall@k')
+        parser.add_argument('--threads', type=int, default=None, help='Threads BLAS')
+        parser.add_argument('--warm-start', action='store_true', help='Partir des facteurs déjà sauvegardés')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', type=str, default=None, help='Dossier du modèle')
+
+    def handle(self, *args, **options):
+        self.set_blas_threads(options['threads'])
+        from recommendations import als
+
+        config = getattr(settings, 'ALS_MODEL', {})
+        output = options['output'] or config.get('PATH', os.path.join(settings.BASE_DIR, '.als_model'))
+        params = {
+            'factors': options['factors'],
+            'regularization': options['regularization'],
+            'implicit': options['implicit'],
+            'alpha': options['alpha'],
+            'seed': options['seed'],
+        }
+
+        self.stdout.write('='*60)
+        self.stdout.write('ENTRAÎNEMENT ALS')
+        self.stdout.write('='*60)
+
+        try:
+            ratings = als.load_ratings(options['ratings'])
+            matrix = ratings.matrix
+            self.stdout.write(
+                f'{matrix.shape[0]} utilisateurs × {matrix.shape[1]} séries, {matrix.nnz} notes'
+            )
+
+            user_init = item_init = None
+            if options['warm_start'] and os.path.exists(os.path.join(output, 'meta.json')):
+                previous = als.ALSModel.load(output, mmap=False)
+                if previous.item_factors.shape[1] == options['factors']:
+                    user_init, item_init = previous.warm_start(ratings, seed=options['seed'])
+                    self.stdout.write(f'Reprise depuis {output}')
+                else:
+                    self.stdout.write(self.style.ERROR('✗ Nombre de facteurs différent: reprise ignorée'))
+
+            def report(iteration, users, items, global_mean):
+                line = f'  itération {iteration}/{iterations}'
+                if not options['implicit']:
+                    line += f' - RMSE entraînement {als.rmse(train_matrix, users, items, global_mean):.4f}'
+                self.stdout.write(f'{line} ({time.perf_counter() - started:.1f}s)')
+
+            started = time.perf_counter()
+            metrics = {}
+            if options['holdout'] > 0:
+                train_matrix, holdout = als.split_holdout(matrix, options['holdout'], seed=options['seed'])
+                iterations = options['iterations']
+                users, items, global_mean = als.train(
+                    train_matrix, iterations=iterations, user_init=user_init, item_init=item_init,
+                    callback=report, **params
+                )
+                if not options['implicit']:
+                    metrics['rmse'] = als.rmse(holdout, users, items, global_mean)
+                metrics[f"recall@{options['k']}"] = als.recall_at_k(
+                    train_matrix, holdout, users, items, k=options['k'], seed=options['seed']
+                )
+                for name, value in metrics.items():
+                    self.stdout.write(self.style.SUCCESS(f'✓ {name} (holdout {holdout.nnz} notes): {value:.4f}'))
+
+                # Réajustement sur toutes les notes, en partant des facteurs évalués
+                user_init, item_init = users, items
+                iterations = options['refit_iterations']
+            else:
+                iterations = options['iterations']
+
+            train_matrix = matrix
+            users, items, global_mean = als.train(
+                matrix, iterations=iterations, user_init=user_init, item_init=item_init,
+                callback=report, **params
+            )
+
+            meta = dict(params, global_mean=global_mean, metrics=metrics, trained_at=int(time.time()))
+            adult = als.load_adult_mask(ratings.series_ids, options['ratings'], options['series'])
+            als.ALSModel(users, items, ratings.user_ids, ratings.series_ids, meta, adult=adult).save(output)
+            als.reset_model()
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'✗ Erreur: {e}'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✓ Modèle sauvegardé dans {output} ({time.perf_counter() - started:.1f}s)'
+        ))
+
+    def set_blas_threads(self, threads):
+        """Nombre de threads BLAS: variables d'environnement si numpy n'est pas encore chargé"""
+        if not threads:
+            return
+        if 'numpy' not in sys.modules:
+            for variable in BLAS_THREAD_VARIABLES:
+                os.environ[variable] = str(threads)
+            return
+        try:
+            from threadpoolctl import threadpool_limits
+        except ImportError:
+            self.stdout.write(self.style.ERROR(
+                '✗ numpy déjà chargé: --threads ignoré (installer threadpoolctl)'
+            ))
+            return
+        self._threadpool_limits = threadpool_limits(limits=threads, user_api='blas')
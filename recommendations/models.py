@@ -3,8 +3,48 @@
 Models Neo4j adaptés pour vos datasets CSV existants
 """
 
+import asyncio
+import base64
+import json
+import re
+import unicodedata
 from datetime import datetime
-from tv_recommender.neo4j_db import neo4j_db
+from django.conf import settings
+from tv_recommender.neo4j_db import neo4j_db, detached
+from tv_recommender.neo4j_async import async_neo4j_db
+from recommendations.cache import recommendation_cache
+from recommendations.seen import seen_sets
+from recommendations import autocomplete, genre_index
+
+
+# Retrait de relations RATED `r` = (u)-[r]->(s) et de leurs notes des agrégats de u
+# et s (Rating.delete, suppression d'un utilisateur / d'une série). Les SET d'horodatage
+# prennent les verrous d'écriture sur u et s avant la lecture des agrégats.
+UNRATE_CLAUSE = """
+        SET u.ratings_updated_at = timestamp(),
+            s.similarity_updated_at = timestamp()
+        WITH u, s, r, r.rating as previous, coalesce(s.rating_histogram, [0, 0, 0, 0, 0]) as histogram
+        DELETE r
+        SET s.rating_count = CASE WHEN s.rating_count > 0 THEN s.rating_count - 1 ELSE 0 END,
+            s.rating_sum = coalesce(s.rating_sum, 0) - previous,
+            s.rating_histogram = [i IN range(0, 4) | histogram[i]
+                - CASE WHEN i = toInteger(round(previous)) - 1 AND histogram[i] > 0 THEN 1 ELSE 0 END],
+            u.rating_count = CASE WHEN u.rating_count > 0 THEN u.rating_count - 1 ELSE 0 END
+"""
+
+
+# Mots vides de l'analyseur standard(-folding) de Lucene: absents de l'index full-text
+LUCENE_STOP_WORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'if', 'in', 'into',
+    'is', 'it', 'no', 'not', 'of', 'on', 'or', 'such', 'that', 'the', 'their', 'then',
+    'there', 'these', 'they', 'this', 'to', 'was', 'will', 'with',
+])
+
+
+def fold(text):
+    """Minuscules sans accents (équivalent de l'analyseur standard-folding)"""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
 
 
 class Neo4jBaseModel:
@@ -39,7 +79,7 @@ class User(Neo4jBaseModel):
         })
         RETURN u.user_id as user_id, u.name as name, u.email as email
         """
-        result = neo4j_db.query(query, {
+        result = neo4j_db.write(query, {
             'user_id': user_id,
             'name': name,
             'email': email,
@@ -50,6 +90,21 @@ class User(Neo4jBaseModel):
         })
         return result[0] if result else None
     
+    @staticmethod
+    def bulk_create(rows):
+        """Créer/mettre à jour un lot d'utilisateurs (une transaction par lot)"""
+        query = """
+        UNWIND $rows AS row
+        MERGE (u:User {user_id: row.user_id})
+        SET u.name = row.name,
+            u.email = row.email,
+            u.age = row.age,
+            u.gender = row.gender,
+            u.occupation = row.occupation,
+            u.join_date = coalesce(row.join_date, toString(localdatetime()))
+        """
+        return neo4j_db.write_batch(query, rows)
+    
     @staticmethod
     def get(user_id):
         """Récupérer un utilisateur par user_id"""
@@ -59,7 +114,7 @@ class User(Neo4jBaseModel):
                u.age as age, u.gender as gender, u.occupation as occupation,
                u.join_date as join_date
         """
-        result = neo4j_db.query(query, {'user_id': user_id})
+        result = neo4j_db.read(query, {'user_id': user_id})
         return result[0] if result else None
     
     @staticmethod
@@ -70,7 +125,7 @@ class User(Neo4jBaseModel):
         RETURN u.user_id as user_id, u.name as name, u.email as email,
                u.age as age, u.gender as gender, u.occupation as occupation
         """
-        result = neo4j_db.query(query, {'name': name})
+        result = neo4j_db.read(query, {'name': name})
         return result[0] if result else None
     
     @staticmethod
@@ -92,19 +147,40 @@ class User(Neo4jBaseModel):
         SET {', '.join(set_clauses)}
         RETURN u.user_id as user_id, u.name as name, u.email as email
         """
-        result = neo4j_db.query(query, params)
+        result = neo4j_db.write(query, params)
         return result[0] if result else None
     
+    # Notes retirées des agrégats des séries avant le DETACH DELETE
+    DELETE_QUERY = """
+        UNWIND $user_ids AS user_id
+        MATCH (u:User {user_id: user_id})
+        CALL {
+            WITH u
+            MATCH (u)-[r:RATED]->(s:Series)
+            """ + UNRATE_CLAUSE + """
+            RETURN COLLECT(s.series_id) as series_ids
+        }
+        DETACH DELETE u
+        RETURN user_id, series_ids
+        """
+
     @staticmethod
     def delete(user_id):
         """Supprimer un utilisateur et toutes ses relations"""
-        query = """
-        MATCH (u:User {user_id: $user_id})
-        DETACH DELETE u
-        RETURN COUNT(u) as deleted
-        """
-        result = neo4j_db.query(query, {'user_id': user_id})
-        return result[0]['deleted'] > 0 if result else False
+        return User.delete_many([user_id]) > 0
+
+    @staticmethod
+    def delete_many(user_ids):
+        """Supprimer des utilisateurs (et retirer leurs notes des agrégats); nombre supprimé"""
+        result = neo4j_db.write(User.DELETE_QUERY, {'user_ids': list(user_ids)})
+        for row in result:
+            seen_sets.forget(row['user_id'])
+            recommendation_cache.invalidate_user(row['user_id'])
+            for series_id in row['series_ids']:
+                autocomplete.rating_changed(series_id, -1)
+        if any(row['series_ids'] for row in result):
+            genre_index.mark_stale()
+        return len(result)
     
     @staticmethod
     def exists(user_id):
@@ -113,117 +189,394 @@ class User(Neo4jBaseModel):
         MATCH (u:User {user_id: $user_id})
         RETURN COUNT(u) > 0 as exists
         """
-        result = neo4j_db.query(query, {'user_id': user_id})
+        result = neo4j_db.read(query, {'user_id': user_id})
         return result[0]['exists'] if result else False
 
+    BULK_STATUS_QUERY = """
+        UNWIND $user_ids AS user_id
+        OPTIONAL MATCH (u:User {user_id: user_id})
+        RETURN user_id,
+               u IS NOT NULL as exists,
+               coalesce(u.rating_count, 0) as ratings_count
+        """
+
+    @staticmethod
+    def bulk_status(user_ids):
+        """{user_id: {exists, ratings_count}} pour une liste d'utilisateurs, en une requête"""
+        if not user_ids:
+            return {}
+        rows = neo4j_db.read(User.BULK_STATUS_QUERY, {'user_ids': list(user_ids)})
+        return {
+            row['user_id']: {'exists': row['exists'], 'ratings_count': row['ratings_count']}
+            for row in rows
+        }
+
+    @staticmethod
+    def most_active(limit=10):
+        """Utilisateurs ayant le plus de notes (index user_rating_count)"""
+        query = """
+        MATCH (u:User)
+        WHERE u.rating_count > 0
+        RETURN u.user_id as user_id,
+               u.name as username,
+               u.rating_count as ratings_count
+        ORDER BY u.rating_count DESC
+        LIMIT $limit
+        """
+        return neo4j_db.read(query, {'limit': limit})
+
 
 class Series(Neo4jBaseModel):
     """
     Model Series pour Neo4j
     Correspondance: series_id, title, original_title, year, is_adult
     """
+
+    # Genres et acteurs en compréhensions de motifs: une ligne par série, coût
+    # genres + acteurs (deux OPTIONAL MATCH enchaînés produisaient genres × acteurs
+    # lignes avant COLLECT DISTINCT). Liste complète des acteurs: l'édition admin
+    # recrée les liens HAS_ACTOR à partir de celle-ci.
+    GET_QUERY = """
+        MATCH (s:Series {series_id: $series_id})
+        RETURN s.series_id as series_id,
+               s.title as title,
+               s.original_title as original_title,
+               s.year as year,
+               s.is_adult as is_adult,
+               [(s)-[:HAS_GENRE]->(g:Genre) | g.name] as genres,
+               [(s)-[:HAS_ACTOR]->(a:Actor) | {actor_id: a.actor_id, name: a.name}] as actors
+        """
+
+    GET_BY_TITLE_QUERY = """
+        CALL {
+            MATCH (s:Series {title: $title})
+            RETURN s
+            UNION
+            MATCH (s:Series {original_title: $title})
+            RETURN s
+        }
+        WITH s LIMIT 1
+        RETURN s.series_id as series_id,
+               s.title as title,
+               s.original_title as original_title,
+               s.year as year,
+               [(s)-[:HAS_GENRE]->(g:Genre) | g.name] as genres,
+               [(s)-[:HAS_ACTOR]->(a:Actor) | {actor_id: a.actor_id, name: a.name}] as actors
+        """
     
     @staticmethod
     def create(series_id, title, original_title, year, is_adult=False):
-        """Créer une série"""
-        query = """
-        CREATE (s:Series {
-            series_id: $series_id,
-            title: $title,
-            original_title: $original_title,
-            year: $year,
-            is_adult: $is_adult
-        })
+        """Créer une série (idempotent: MERGE sur series_id)"""
+        query = """
+        MERGE (s:Series {series_id: $series_id})
+        SET s.title = $title,
+            s.original_title = $original_title,
+            s.year = $year,
+            s.is_adult = $is_adult
         RETURN s.series_id as series_id, s.title as title, 
-               s.original_title as original_title, s.year as year
+               s.original_title as original_title, s.year as year,
+               s.is_adult as is_adult
         """
-        result = neo4j_db.query(query, {
+        result = neo4j_db.write(query, {
             'series_id': series_id,
             'title': title,
             'original_title': original_title,
             'year': year,
             'is_adult': is_adult
         })
+        if result:
+            autocomplete.series_saved(result[0])
+            genre_index.mark_stale()
         return result[0] if result else None
     
+    @staticmethod
+    def bulk_create(rows):
+        """Créer/mettre à jour un lot de séries (une transaction par lot)"""
+        query = """
+        UNWIND $rows AS row
+        MERGE (s:Series {series_id: row.series_id})
+        SET s.title = row.title,
+            s.original_title = row.original_title,
+            s.year = row.year,
+            s.is_adult = row.is_adult
+        """
+        written = neo4j_db.write_batch(query, rows)
+        # Import en masse: les index chargés sont reconstruits en tâche de fond
+        autocomplete.reset_index()
+        genre_index.mark_stale()
+        return written
+    
     @staticmethod
     def get(series_id):
         """Récupérer une série par series_id"""
-        query = """
-        MATCH (s:Series {series_id: $series_id})
-        OPTIONAL MATCH (s)-[:HAS_GENRE]->(g:Genre)
-        OPTIONAL MATCH (s)-[:HAS_ACTOR]->(a:Actor)
+        result = neo4j_db.read(Series.GET_QUERY, {'series_id': series_id})
+        return result[0] if result else None
+    
+    @staticmethod
+    async def aget(series_id):
+        """Version async de get"""
+        result = await async_neo4j_db.read(Series.GET_QUERY, {'series_id': series_id})
+        return result[0] if result else None
+    
+    @staticmethod
+    def get_by_title(title):
+        """Récupérer une série par titre"""
+        result = neo4j_db.read(Series.GET_BY_TITLE_QUERY, {'title': title})
+        return result[0] if result else None
+    
+    @staticmethod
+    async def aget_by_title(title):
+        """Version async de get_by_title"""
+        result = await async_neo4j_db.read(Series.GET_BY_TITLE_QUERY, {'title': title})
+        return result[0] if result else None
+    
+    PAGE_SIZE = 24
+    MAX_PAGE_SIZE = 100
+
+    # Pagination par clé (keyset) sur (title, series_id): la page suivante repart
+    # de la dernière clé vue via l'index series_title, sans SKIP; le coût d'une
+    # page ne dépend pas de sa position dans le catalogue. Une série sans titre
+    # n'est pas listée.
+    LIST_QUERY = """
+        MATCH (s:Series)
+        WHERE s.title >= $after_title
+          AND (s.title > $after_title OR s.series_id > $after_id)
+          AND s.is_adult = false
+          AND ($genre IS NULL OR EXISTS { (s)-[:HAS_GENRE]->(:Genre {name: $genre}) })
+        WITH s
+        ORDER BY s.title, s.series_id
+        LIMIT $limit
+        RETURN s.series_id as series_id,
+               s.title as title,
+               s.original_title as original_title,
+               s.year as year,
+               [(s)-[:HAS_GENRE]->(g:Genre) | g.name] as genres
+        """
+
+    @staticmethod
+    def encode_cursor(row):
+        """Curseur opaque (pour l'URL) désignant la position après `row`"""
+        key = json.dumps([row['title'], row['series_id']], ensure_ascii=False)
+        return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """(title, series_id) d'un curseur, ou None s'il est absent ou invalide"""
+        if not cursor:
+            return None
+        try:
+            title, series_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        except (ValueError, TypeError):
+            return None
+        if not isinstance(title, str) or not isinstance(series_id, str):
+            return None
+        return title, series_id
+
+    @staticmethod
+    def _list(limit, after=None, genre=None):
+        after_title, after_id = after or ('', '')
+        return neo4j_db.read(Series.LIST_QUERY, {
+            'after_title': after_title,
+            'after_id': after_id,
+            'genre': genre or None,
+            'limit': limit,
+        })
+
+    # Page de détail en un aller-retour: résolution par series_id puis par titre,
+    # genres/acteurs/voisins en compréhensions de motifs (pas de produit
+    # genres × acteurs), compteurs dénormalisés et note de l'utilisateur courant
+    DETAIL_QUERY = """
+        CALL {
+            MATCH (s:Series {series_id: $identifier})
+            RETURN s, 0 as priority
+            UNION
+            MATCH (s:Series {title: $identifier})
+            RETURN s, 1 as priority
+            UNION
+            MATCH (s:Series {original_title: $identifier})
+            RETURN s, 1 as priority
+        }
+        WITH s ORDER BY priority LIMIT 1
+        OPTIONAL MATCH (:User {user_id: $user_id})-[mine:RATED]->(s)
+        WITH s, mine, coalesce(s.rating_count, 0) as total
         RETURN s.series_id as series_id,
                s.title as title,
                s.original_title as original_title,
                s.year as year,
                s.is_adult as is_adult,
-               COLLECT(DISTINCT g.name) as genres,
-               COLLECT(DISTINCT {
-                   actor_id: a.actor_id,
-                   name: a.name
-               }) as actors
+               [(s)-[:HAS_GENRE]->(g:Genre) | g.name] as genres,
+               COLLECT {
+                   MATCH (s)-[:HAS_ACTOR]->(a:Actor)
+                   RETURN {actor_id: a.actor_id, name: a.name}
+                   LIMIT $max_actors
+               } as actors,
+               COUNT { (s)-[:HAS_ACTOR]->(:Actor) } as actor_count,
+               {
+                   average_rating: CASE WHEN total > 0 THEN toFloat(s.rating_sum) / total END,
+                   average_score: CASE WHEN total > 0 THEN ROUND(toFloat(s.rating_sum) / total * 10) / 10.0 END,
+                   total_ratings: total,
+                   histogram: coalesce(s.rating_histogram, [0, 0, 0, 0, 0])
+               } as rating_info,
+               mine.rating as user_rating,
+               COLLECT {
+                   MATCH (s)-[sim:SIMILAR_TO]->(other:Series)
+                   WHERE other.is_adult = false
+                   RETURN {series_id: other.series_id, title: other.title, year: other.year, score: sim.score}
+                   ORDER BY sim.score DESC
+                   LIMIT $similar_limit
+               } as similar_series
+        """
+
+    DETAIL_MAX_ACTORS = 50
+
+    @staticmethod
+    def get_detail(identifier, user_id=None, similar_limit=6, max_actors=DETAIL_MAX_ACTORS):
         """
-        result = neo4j_db.query(query, {'series_id': series_id})
+        Série (par series_id ou titre) avec genres, acteurs (au plus max_actors,
+        total dans actor_count), rating_info, note de `user_id` (user_rating)
+        et séries similaires, en une requête
+        """
+        result = neo4j_db.read(Series.DETAIL_QUERY, {
+            'identifier': identifier,
+            'user_id': user_id,
+            'similar_limit': similar_limit,
+            'max_actors': max_actors,
+        })
         return result[0] if result else None
-    
+
     @staticmethod
-    def get_by_title(title):
-        """Récupérer une série par titre"""
+    async def aget_detail(identifier, user_id=None, similar_limit=6, max_actors=DETAIL_MAX_ACTORS):
+        """Version async de get_detail"""
+        result = await async_neo4j_db.read(Series.DETAIL_QUERY, {
+            'identifier': identifier,
+            'user_id': user_id,
+            'similar_limit': similar_limit,
+            'max_actors': max_actors,
+        })
+        return result[0] if result else None
+
+    @staticmethod
+    def get_all(limit=None, after=None, genre=None):
+        """
+        Séries par titre, au plus `limit` (plafonné à MAX_PAGE_SIZE)
+        after: (title, series_id) de la dernière série de la page précédente
+        """
+        limit = min(limit or Series.PAGE_SIZE, Series.MAX_PAGE_SIZE)
+        return Series._list(limit, after, genre)
+
+    @staticmethod
+    def get_page(limit=None, after=None, genre=None):
+        """(séries, curseur de la page suivante ou None)"""
+        limit = min(limit or Series.PAGE_SIZE, Series.MAX_PAGE_SIZE)
+        # Une ligne de plus pour savoir s'il existe une page suivante
+        rows = Series._list(limit + 1, after, genre)
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, Series.encode_cursor(rows[-1])
+
+    @staticmethod
+    def count():
+        """Nombre de séries (compteur de label, sans parcours)"""
+        result = neo4j_db.read("MATCH (s:Series) RETURN COUNT(s) as count")
+        return result[0]['count'] if result else 0
+
+    @staticmethod
+    def most_rated(limit=10):
+        """Séries les plus notées, avec leur moyenne (index series_rating_count)"""
         query = """
         MATCH (s:Series)
-        WHERE s.title = $title OR s.original_title = $title
-        OPTIONAL MATCH (s)-[:HAS_GENRE]->(g:Genre)
-        OPTIONAL MATCH (s)-[:HAS_ACTOR]->(a:Actor)
+        WHERE s.rating_count > 0
         RETURN s.series_id as series_id,
                s.title as title,
-               s.original_title as original_title,
-               s.year as year,
-               COLLECT(DISTINCT g.name) as genres,
-               COLLECT(DISTINCT {
-                   actor_id: a.actor_id,
-                   name: a.name
-               }) as actors
+               s.rating_count as ratings_count,
+               ROUND(toFloat(s.rating_sum) / s.rating_count * 10) / 10.0 as avg_rating
+        ORDER BY s.rating_count DESC
+        LIMIT $limit
         """
-        result = neo4j_db.query(query, {'title': title})
-        return result[0] if result else None
+        return neo4j_db.read(query, {'limit': limit})
     
     @staticmethod
-    def get_all(limit=None):
-        """Récupérer toutes les séries"""
+    def describe_scored(hits):
+        """
+        Compléter des (series_id, score) calculés hors base avec titre/année/genres,
+        dans l'ordre des scores et sans contenu adulte
+        """
         query = """
-        MATCH (s:Series)
+        UNWIND $hits AS hit
+        MATCH (s:Series {series_id: hit.series_id})
         WHERE s.is_adult = false
-        OPTIONAL MATCH (s)-[:HAS_GENRE]->(g:Genre)
         RETURN s.series_id as series_id,
                s.title as title,
-               s.original_title as original_title,
                s.year as year,
-               COLLECT(DISTINCT g.name) as genres
-        ORDER BY s.title
+               [(s)-[:HAS_GENRE]->(g:Genre) | g.name] as genres,
+               ROUND(hit.score * 1000) / 1000.0 as score
+        ORDER BY hit.score DESC
         """
-        if limit:
-            query += f" LIMIT {limit}"
-        return neo4j_db.query(query)
+        return neo4j_db.read(query, {
+            'hits': [{'series_id': series_id, 'score': score} for series_id, score in hits]
+        })
     
-    @staticmethod
-    def search(keyword, limit=20):
-        """Rechercher des séries par mot-clé"""
-        query = """
-        MATCH (s:Series)
-        WHERE toLower(s.title) CONTAINS toLower($keyword) 
-           OR toLower(s.original_title) CONTAINS toLower($keyword)
-        AND s.is_adult = false
-        OPTIONAL MATCH (s)-[:HAS_GENRE]->(g:Genre)
+    SEARCH_QUERY = """
+        CALL db.index.fulltext.queryNodes('series_title_fulltext', $lucene) YIELD node, score
+        WHERE node.is_adult = false
+        RETURN node.series_id as series_id,
+               node.title as title,
+               node.original_title as original_title,
+               node.year as year,
+               [(node)-[:HAS_GENRE]->(g:Genre) | g.name] as genres,
+               score
+        ORDER BY score DESC, title
+        SKIP $skip
+        LIMIT $limit
+        """
+
+    # Titres et noms d'acteurs: une série trouvée par un acteur garde le meilleur score
+    SEARCH_WITH_ACTORS_QUERY = """
+        CALL {
+            CALL db.index.fulltext.queryNodes('series_title_fulltext', $lucene) YIELD node, score
+            RETURN node as s, score
+            UNION ALL
+            CALL db.index.fulltext.queryNodes('actor_name_fulltext', $lucene) YIELD node, score
+            MATCH (node)<-[:HAS_ACTOR]-(s:Series)
+            RETURN s, score * $actor_weight as score
+        }
+        WITH s, MAX(score) as score
+        WHERE s.is_adult = false
         RETURN s.series_id as series_id,
                s.title as title,
                s.original_title as original_title,
                s.year as year,
-               COLLECT(DISTINCT g.name) as genres
-        ORDER BY s.title
+               [(s)-[:HAS_GENRE]->(g:Genre) | g.name] as genres,
+               score
+        ORDER BY score DESC, title
+        SKIP $skip
         LIMIT $limit
         """
-        return neo4j_db.query(query, {'keyword': keyword, 'limit': limit})
+
+    @staticmethod
+    def lucene_query(keyword):
+        """
+        Requête Lucene: chaque mot est requis, en mot exact (favorisé) ou en préfixe.
+        Les préfixes ne passent pas par l'analyseur: découpage, repli des accents
+        et mots vides sont appliqués ici (ce qui écarte aussi la syntaxe Lucene).
+        """
+        words = [word for word in re.findall(r"\w+(?:['’]\w+)*", fold(keyword)) if word not in LUCENE_STOP_WORDS]
+        return ' AND '.join(f'({word}^2 OR {word}*)' for word in words)
+
+    @staticmethod
+    def search(keyword, limit=20, skip=0, include_actors=False):
+        """Rechercher des séries (index full-text), par pertinence décroissante"""
+        lucene = Series.lucene_query(keyword or '')
+        if not lucene:
+            return []
+        query = Series.SEARCH_WITH_ACTORS_QUERY if include_actors else Series.SEARCH_QUERY
+        return neo4j_db.read(query, {
+            'lucene': lucene,
+            'skip': skip,
+            'limit': limit,
+            'actor_weight': 0.5,
+        })
     
     @staticmethod
     def update(series_id, **kwargs):
@@ -242,21 +595,47 @@ class Series(Neo4jBaseModel):
         query = f"""
         MATCH (s:Series {{series_id: $series_id}})
         SET {', '.join(set_clauses)}
-        RETURN s.series_id as series_id, s.title as title
+        RETURN s.series_id as series_id, s.title as title,
+               s.original_title as original_title, s.year as year,
+               s.is_adult as is_adult
         """
-        result = neo4j_db.query(query, params)
+        result = neo4j_db.write(query, params)
+        if result:
+            autocomplete.series_saved(result[0])
+            genre_index.mark_stale()
         return result[0] if result else None
     
+    # Notes retirées des agrégats des utilisateurs avant le DETACH DELETE
+    DELETE_QUERY = """
+        UNWIND $series_ids AS series_id
+        MATCH (s:Series {series_id: series_id})
+        CALL {
+            WITH s
+            MATCH (u:User)-[r:RATED]->(s)
+            """ + UNRATE_CLAUSE + """
+            RETURN COLLECT(u.user_id) as user_ids
+        }
+        DETACH DELETE s
+        RETURN series_id, user_ids
+        """
+
     @staticmethod
     def delete(series_id):
         """Supprimer une série"""
-        query = """
-        MATCH (s:Series {series_id: $series_id})
-        DETACH DELETE s
-        RETURN COUNT(s) as deleted
-        """
-        result = neo4j_db.query(query, {'series_id': series_id})
-        return result[0]['deleted'] > 0 if result else False
+        return Series.delete_many([series_id]) > 0
+
+    @staticmethod
+    def delete_many(series_ids):
+        """Supprimer des séries (et retirer leurs notes des agrégats); nombre supprimé"""
+        result = neo4j_db.write(Series.DELETE_QUERY, {'series_ids': list(series_ids)})
+        for row in result:
+            autocomplete.series_deleted(row['series_id'])
+            for user_id in row['user_ids']:
+                seen_sets.unrated(user_id, row['series_id'])
+                recommendation_cache.invalidate_user(user_id)
+        if result:
+            genre_index.mark_stale()
+        return len(result)
 
 
 class Genre(Neo4jBaseModel):
@@ -267,20 +646,28 @@ class Genre(Neo4jBaseModel):
     
     @staticmethod
     def create(genre_id, name):
-        """Créer un genre"""
+        """Créer un genre (idempotent: MERGE sur name)"""
         query = """
-        CREATE (g:Genre {
-            genre_id: $genre_id,
-            name: $name
-        })
+        MERGE (g:Genre {name: $name})
+        SET g.genre_id = $genre_id
         RETURN g.genre_id as genre_id, g.name as name
         """
-        result = neo4j_db.query(query, {
+        result = neo4j_db.write(query, {
             'genre_id': genre_id,
             'name': name
         })
         return result[0] if result else None
     
+    @staticmethod
+    def bulk_create(rows):
+        """Créer/mettre à jour un lot de genres (une transaction par lot)"""
+        query = """
+        UNWIND $rows AS row
+        MERGE (g:Genre {name: row.name})
+        SET g.genre_id = row.genre_id
+        """
+        return neo4j_db.write_batch(query, rows)
+    
     @staticmethod
     def get_or_create(name):
         """Récupérer ou créer un genre (par nom uniquement)"""
@@ -288,7 +675,7 @@ class Genre(Neo4jBaseModel):
         MERGE (g:Genre {name: $name})
         RETURN g.name as name
         """
-        result = neo4j_db.query(query, {'name': name})
+        result = neo4j_db.write(query, {'name': name})
         return result[0] if result else None
     
     @staticmethod
@@ -299,7 +686,7 @@ class Genre(Neo4jBaseModel):
         RETURN g.genre_id as genre_id, g.name as name
         ORDER BY g.name
         """
-        return neo4j_db.query(query)
+        return neo4j_db.read(query)
     
     @staticmethod
     def link_to_series(series_id, genre_name):
@@ -310,11 +697,25 @@ class Genre(Neo4jBaseModel):
         MERGE (s)-[:HAS_GENRE]->(g)
         RETURN s.series_id as series_id, g.name as genre_name
         """
-        result = neo4j_db.query(query, {
+        result = neo4j_db.write(query, {
             'series_id': series_id,
             'genre_name': genre_name
         })
+        genre_index.mark_stale()
         return result[0] if result else None
+    
+    @staticmethod
+    def bulk_link_to_series(rows):
+        """Lier un lot de couples (series_id, genre_name)"""
+        query = """
+        UNWIND $rows AS row
+        MATCH (s:Series {series_id: row.series_id})
+        MERGE (g:Genre {name: row.genre_name})
+        MERGE (s)-[:HAS_GENRE]->(g)
+        """
+        written = neo4j_db.write_batch(query, rows)
+        genre_index.mark_stale()
+        return written
 
 
 class Actor(Neo4jBaseModel):
@@ -325,19 +726,17 @@ class Actor(Neo4jBaseModel):
     
     @staticmethod
     def create(actor_id, name, birth_year=None, death_year=None, professions=None, known_for_titles=None):
-        """Créer un acteur"""
+        """Créer un acteur (idempotent: MERGE sur actor_id)"""
         query = """
-        CREATE (a:Actor {
-            actor_id: $actor_id,
-            name: $name,
-            birth_year: $birth_year,
-            death_year: $death_year,
-            professions: $professions,
-            known_for_titles: $known_for_titles
-        })
+        MERGE (a:Actor {actor_id: $actor_id})
+        SET a.name = $name,
+            a.birth_year = $birth_year,
+            a.death_year = $death_year,
+            a.professions = $professions,
+            a.known_for_titles = $known_for_titles
         RETURN a.actor_id as actor_id, a.name as name
         """
-        result = neo4j_db.query(query, {
+        result = neo4j_db.write(query, {
             'actor_id': actor_id,
             'name': name,
             'birth_year': birth_year,
@@ -347,6 +746,20 @@ class Actor(Neo4jBaseModel):
         })
         return result[0] if result else None
     
+    @staticmethod
+    def bulk_create(rows):
+        """Créer/mettre à jour un lot d'acteurs (une transaction par lot)"""
+        query = """
+        UNWIND $rows AS row
+        MERGE (a:Actor {actor_id: row.actor_id})
+        SET a.name = row.name,
+            a.birth_year = row.birth_year,
+            a.death_year = row.death_year,
+            a.professions = row.professions,
+            a.known_for_titles = row.known_for_titles
+        """
+        return neo4j_db.write_batch(query, rows)
+    
     @staticmethod
     def get(actor_id):
         """Récupérer un acteur"""
@@ -359,7 +772,7 @@ class Actor(Neo4jBaseModel):
                a.professions as professions,
                a.known_for_titles as known_for_titles
         """
-        result = neo4j_db.query(query, {'actor_id': actor_id})
+        result = neo4j_db.read(query, {'actor_id': actor_id})
         return result[0] if result else None
     
     @staticmethod
@@ -371,7 +784,7 @@ class Actor(Neo4jBaseModel):
         ORDER BY a.name
         LIMIT $limit
         """
-        return neo4j_db.query(query, {'limit': limit})
+        return neo4j_db.read(query, {'limit': limit})
     
     @staticmethod
     def link_to_series(series_id, actor_id):
@@ -382,12 +795,23 @@ class Actor(Neo4jBaseModel):
         MERGE (s)-[:HAS_ACTOR]->(a)
         RETURN s.series_id as series_id, a.actor_id as actor_id
         """
-        result = neo4j_db.query(query, {
+        result = neo4j_db.write(query, {
             'series_id': series_id,
             'actor_id': actor_id
         })
         return result[0] if result else None
     
+    @staticmethod
+    def bulk_link_to_series(rows):
+        """Lier un lot de couples (series_id, actor_id)"""
+        query = """
+        UNWIND $rows AS row
+        MATCH (s:Series {series_id: row.series_id})
+        MATCH (a:Actor {actor_id: row.actor_id})
+        MERGE (s)-[:HAS_ACTOR]->(a)
+        """
+        return neo4j_db.write_batch(query, rows)
+    
     @staticmethod
     def get_series(actor_id):
         """Récupérer toutes les séries d'un acteur"""
@@ -399,7 +823,7 @@ class Actor(Neo4jBaseModel):
                s.year as year
         ORDER BY s.year DESC
         """
-        return neo4j_db.query(query, {'actor_id': actor_id})
+        return neo4j_db.read(query, {'actor_id': actor_id})
 
 
 class Rating(Neo4jBaseModel):
@@ -407,52 +831,147 @@ class Rating(Neo4jBaseModel):
     Model pour gérer les notations (relation RATED)
     Correspondance: user_id, series_id, series_title, rating, date, timestamp
     """
-    
-    @staticmethod
-    def create(user_id, series_id, rating, date=None, timestamp=None):
-        """Créer ou mettre à jour une notation"""
-        if date is None:
-            date = datetime.now().isoformat()
-        if timestamp is None:
-            timestamp = int(datetime.now().timestamp())
-        
-        query = """
+
+    GET_QUERY = """
+        MATCH (u:User {user_id: $user_id})-[r:RATED]->(s:Series {series_id: $series_id})
+        RETURN u.user_id as user_id,
+               s.series_id as series_id,
+               s.title as series_title,
+               r.rating as rating,
+               r.date as date,
+               r.timestamp as timestamp
+        """
+
+    # Agrégats dénormalisés, tenus à jour par create/delete dans la même transaction:
+    # Series.rating_count, rating_sum, rating_histogram (nombre de notes arrondies
+    # à 1..5, index 0 = note 1) et User.rating_count.
+    # Recalcul complet: python manage.py repair_rating_aggregates
+    AVERAGE_RATING_QUERY = """
+        MATCH (s:Series {series_id: $series_id})
+        WITH s, coalesce(s.rating_count, 0) as total
+        RETURN s.series_id as series_id,
+               s.title as series_title,
+               CASE WHEN total > 0 THEN toFloat(s.rating_sum) / total END as average_rating,
+               CASE WHEN total > 0 THEN ROUND(toFloat(s.rating_sum) / total * 10) / 10.0 END as average_score,
+               total as total_ratings,
+               coalesce(s.rating_histogram, [0, 0, 0, 0, 0]) as histogram
+        """
+
+    # Les SET d'horodatage prennent les verrous d'écriture sur u et s avant la
+    # lecture des agrégats: deux notations concurrentes ne perdent pas de mise à jour
+    CREATE_QUERY = """
         MATCH (u:User {user_id: $user_id})
         MATCH (s:Series {series_id: $series_id})
+        SET u.ratings_updated_at = timestamp(),
+            s.similarity_updated_at = timestamp()
         MERGE (u)-[r:RATED]->(s)
+        WITH u, s, r, r.rating as previous
         SET r.rating = $rating,
             r.series_title = s.title,
             r.date = datetime($date),
             r.timestamp = $timestamp
+        WITH u, s, r, previous, coalesce(s.rating_histogram, [0, 0, 0, 0, 0]) as histogram
+        SET s.rating_count = coalesce(s.rating_count, 0) + CASE WHEN previous IS NULL THEN 1 ELSE 0 END,
+            s.rating_sum = coalesce(s.rating_sum, 0) + $rating - coalesce(previous, 0),
+            s.rating_histogram = [i IN range(0, 4) | histogram[i]
+                + CASE WHEN i = toInteger(round($rating)) - 1 THEN 1 ELSE 0 END
+                - CASE WHEN i = toInteger(round(previous)) - 1 THEN 1 ELSE 0 END],
+            u.rating_count = coalesce(u.rating_count, 0) + CASE WHEN previous IS NULL THEN 1 ELSE 0 END
         RETURN u.user_id as user_id,
                s.series_id as series_id,
                s.title as series_title,
                r.rating as rating,
                r.date as date,
-               r.timestamp as timestamp
+               r.timestamp as timestamp,
+               previous IS NULL as created
         """
-        result = neo4j_db.query(query, {
+
+    DELETE_QUERY = """
+        MATCH (u:User {user_id: $user_id})-[r:RATED]->(s:Series {series_id: $series_id})
+        """ + UNRATE_CLAUSE + """
+        RETURN COUNT(r) as deleted
+        """
+
+    REPAIR_SERIES_QUERY = """
+        MATCH (s:Series)
+        CALL {
+            WITH s
+            OPTIONAL MATCH (s)<-[r:RATED]-(:User)
+            WITH s, COLLECT(r.rating) as ratings
+            SET s.rating_count = size(ratings),
+                s.rating_sum = reduce(total = 0.0, rating IN ratings | total + rating),
+                s.rating_histogram = [i IN range(0, 4) |
+                    size([rating IN ratings WHERE toInteger(round(rating)) - 1 = i])]
+        } IN TRANSACTIONS OF $batch_size ROWS
+        """
+
+    REPAIR_USERS_QUERY = """
+        MATCH (u:User)
+        CALL {
+            WITH u
+            SET u.rating_count = COUNT { (u)-[:RATED]->(:Series) }
+        } IN TRANSACTIONS OF $batch_size ROWS
+        """
+    
+    @staticmethod
+    def create(user_id, series_id, rating, date=None, timestamp=None):
+        """Créer ou mettre à jour une notation (et les agrégats de u et s)"""
+        if date is None:
+            date = datetime.now().isoformat()
+        if timestamp is None:
+            timestamp = int(datetime.now().timestamp())
+        
+        result = neo4j_db.write(Rating.CREATE_QUERY, {
             'user_id': user_id,
             'series_id': series_id,
             'rating': rating,
             'date': date,
             'timestamp': timestamp
         })
-        return result[0] if result else None
+        recommendation_cache.invalidate_user(user_id)
+        if not result:
+            return None
+        seen_sets.rated(user_id, series_id, rating)
+        if result[0].pop('created'):
+            autocomplete.rating_changed(series_id, 1)
+            genre_index.mark_stale()
+        return result[0]
     
     @staticmethod
-    def get(user_id, series_id):
-        """Récupérer la notation d'un utilisateur pour une série"""
+    def bulk_create(rows):
+        """
+        Créer/mettre à jour un lot de notations (relations RATED)
+        Les agrégats ne sont pas tenus à jour ici: appeler repair_aggregates après l'import,
+        puis Similarity.mark_stale sur les séries notées (une fois, pas à chaque lot)
+        """
         query = """
-        MATCH (u:User {user_id: $user_id})-[r:RATED]->(s:Series {series_id: $series_id})
-        RETURN u.user_id as user_id,
-               s.series_id as series_id,
-               s.title as series_title,
-               r.rating as rating,
-               r.date as date,
-               r.timestamp as timestamp
+        UNWIND $rows AS row
+        MATCH (u:User {user_id: row.user_id})
+        MATCH (s:Series {series_id: row.series_id})
+        MERGE (u)-[r:RATED]->(s)
+        SET r.rating = row.rating,
+            r.series_title = s.title,
+            r.date = CASE WHEN row.date IS NULL THEN datetime() ELSE datetime(row.date) END,
+            r.timestamp = coalesce(row.timestamp, timestamp() / 1000),
+            u.ratings_updated_at = timestamp()
         """
-        result = neo4j_db.query(query, {
+        result = neo4j_db.write_batch(query, rows)
+        seen_sets.clear()
+        return result
+    
+    @staticmethod
+    def get(user_id, series_id):
+        """Récupérer la notation d'un utilisateur pour une série"""
+        result = neo4j_db.read(Rating.GET_QUERY, {
+            'user_id': user_id,
+            'series_id': series_id
+        })
+        return result[0] if result else None
+    
+    @staticmethod
+    async def aget(user_id, series_id):
+        """Version async de get"""
+        result = await async_neo4j_db.read(Rating.GET_QUERY, {
             'user_id': user_id,
             'series_id': series_id
         })
@@ -463,17 +982,25 @@ class Rating(Neo4jBaseModel):
         """Récupérer toutes les notations d'un utilisateur"""
         query = """
         MATCH (u:User {user_id: $user_id})-[r:RATED]->(s:Series)
-        OPTIONAL MATCH (s)-[:HAS_GENRE]->(g:Genre)
         RETURN s.series_id as series_id,
                s.title as series_title,
                s.year as year,
                r.rating as rating,
                r.date as date,
                r.timestamp as timestamp,
-               COLLECT(DISTINCT g.name) as genres
+               [(s)-[:HAS_GENRE]->(g:Genre) | g.name] as genres
         ORDER BY r.timestamp DESC
         """
-        return neo4j_db.query(query, {'user_id': user_id})
+        return neo4j_db.read(query, {'user_id': user_id})
+    
+    @staticmethod
+    def get_user_rating_values(user_id):
+        """{series_id: note} d'un utilisateur (sans métadonnées)"""
+        query = """
+        MATCH (u:User {user_id: $user_id})-[r:RATED]->(s:Series)
+        RETURN s.series_id as series_id, r.rating as rating
+        """
+        return {row['series_id']: row['rating'] for row in neo4j_db.read(query, {'user_id': user_id})}
     
     @staticmethod
     def get_series_ratings(series_id):
@@ -487,66 +1014,196 @@ class Rating(Neo4jBaseModel):
                r.timestamp as timestamp
         ORDER BY r.timestamp DESC
         """
-        return neo4j_db.query(query, {'series_id': series_id})
+        return neo4j_db.read(query, {'series_id': series_id})
     
     @staticmethod
     def get_average_rating(series_id):
         """Récupérer la note moyenne d'une série"""
-        query = """
-        MATCH (u:User)-[r:RATED]->(s:Series {series_id: $series_id})
-        RETURN s.series_id as series_id,
-               s.title as series_title,
-               AVG(r.rating) as average_rating,
-               COUNT(r) as total_ratings
-        """
-        result = neo4j_db.query(query, {'series_id': series_id})
+        result = neo4j_db.read(Rating.AVERAGE_RATING_QUERY, {'series_id': series_id})
+        return result[0] if result else None
+    
+    @staticmethod
+    async def aget_average_rating(series_id):
+        """Version async de get_average_rating"""
+        result = await async_neo4j_db.read(Rating.AVERAGE_RATING_QUERY, {'series_id': series_id})
         return result[0] if result else None
     
     @staticmethod
     def delete(user_id, series_id):
-        """Supprimer une notation"""
-        query = """
-        MATCH (u:User {user_id: $user_id})-[r:RATED]->(s:Series {series_id: $series_id})
-        DELETE r
-        RETURN COUNT(r) as deleted
-        """
-        result = neo4j_db.query(query, {
+        """Supprimer une notation (et la retirer des agrégats de u et s)"""
+        result = neo4j_db.write(Rating.DELETE_QUERY, {
             'user_id': user_id,
             'series_id': series_id
         })
-        return result[0]['deleted'] > 0 if result else False
+        recommendation_cache.invalidate_user(user_id)
+        seen_sets.unrated(user_id, series_id)
+        deleted = result[0]['deleted'] > 0 if result else False
+        if deleted:
+            autocomplete.rating_changed(series_id, -1)
+            genre_index.mark_stale()
+        return deleted
+    
+    @staticmethod
+    def repair_aggregates(batch_size=1000, series=True, users=True):
+        """Recalculer tous les agrégats depuis les relations RATED (auto-commit, par lots)"""
+        params = {'batch_size': batch_size}
+        if series:
+            neo4j_db.query(Rating.REPAIR_SERIES_QUERY, params)
+        if users:
+            neo4j_db.query(Rating.REPAIR_USERS_QUERY, params)
     
     @staticmethod
     def get_user_statistics(user_id):
         """Statistiques de visionnage d'un utilisateur"""
+        # Moyenne sur les notes (et non sur les couples note × genre);
+        # genres distincts dans un sous-requête séparée
         query = """
-        MATCH (u:User {user_id: $user_id})-[r:RATED]->(s:Series)-[:HAS_GENRE]->(g:Genre)
-        WITH u, COUNT(DISTINCT s) as series_count, 
-             AVG(r.rating) as avg_rating,
-             COLLECT(DISTINCT g.name) as all_genres
+        MATCH (u:User {user_id: $user_id})-[r:RATED]->(s:Series)
+        WITH u, COUNT(s) as series_count, AVG(r.rating) as avg_rating
         RETURN u.user_id as user_id,
                u.name as username,
                series_count,
                ROUND(avg_rating * 10) / 10.0 as avg_rating,
-               all_genres as genres
+               COLLECT {
+                   MATCH (u)-[:RATED]->(:Series)-[:HAS_GENRE]->(g:Genre)
+                   RETURN DISTINCT g.name
+               } as genres
         """
-        result = neo4j_db.query(query, {'user_id': user_id})
+        result = neo4j_db.read(query, {'user_id': user_id})
         return result[0] if result else None
 
 
-class Recommendation(Neo4jBaseModel):
-    """Model pour générer des recommandations"""
-    
+class Similarity(Neo4jBaseModel):
+    """
+    Graphe pré-calculé (:Series)-[:SIMILAR_TO {score}]->(:Series), top-K par série
+    Score = genres communs * GENRE_WEIGHT + acteurs communs * ACTOR_WEIGHT
+          + utilisateurs ayant aimé les deux séries * RATING_WEIGHT
+    Une série est à recalculer quand s.similarity_updated_at (nouvelle note,
+    édition admin) est plus récent que s.similarity_computed_at.
+    """
+
+    DEFAULTS = {
+        'TOP_K': 20,
+        'GENRE_WEIGHT': 1.0,
+        'ACTOR_WEIGHT': 2.0,
+        'RATING_WEIGHT': 0.5,
+    }
+
+    REFRESH_QUERY = """
+        UNWIND $series_ids AS series_id
+        MATCH (s:Series {series_id: series_id})
+        OPTIONAL MATCH (s)-[old:SIMILAR_TO]->()
+        DELETE old
+        WITH DISTINCT s
+        SET s.similarity_computed_at = $computed_at
+        WITH s
+        CALL {
+            WITH s
+            MATCH (s)-[:HAS_GENRE]->(:Genre)<-[:HAS_GENRE]-(other:Series)
+            WHERE other <> s
+            RETURN other, COUNT(*) * $genre_weight as score
+            UNION ALL
+            WITH s
+            MATCH (s)-[:HAS_ACTOR]->(:Actor)<-[:HAS_ACTOR]-(other:Series)
+            WHERE other <> s
+            RETURN other, COUNT(*) * $actor_weight as score
+            UNION ALL
+            WITH s
+            MATCH (s)<-[r1:RATED]-(:User)-[r2:RATED]->(other:Series)
+            WHERE r1.rating >= 4 AND r2.rating >= 4 AND other <> s
+            RETURN other, COUNT(*) * $rating_weight as score
+        }
+        WITH s, other, SUM(score) as score
+        ORDER BY score DESC
+        WITH s, COLLECT({other: other, score: score})[0..$top_k] as neighbours
+        UNWIND neighbours as neighbour
+        WITH s, neighbour.other as other, neighbour.score as score
+        CREATE (s)-[:SIMILAR_TO {score: score}]->(other)
+        RETURN COUNT(*) as created
+        """
+
     @staticmethod
-    def by_genre(user_id, limit=10):
-        """Recommandations basées sur les genres préférés"""
+    def config():
+        """Poids et taille du voisinage (settings.SIMILARITY)"""
+        return dict(Similarity.DEFAULTS, **getattr(settings, 'SIMILARITY', {}))
+
+    @staticmethod
+    def mark_stale(series_ids, batch_size=None):
+        """Marquer des séries comme à recalculer (édition de genres/acteurs, import de notes)"""
+        query = """
+        UNWIND $series_ids AS series_id
+        MATCH (s:Series {series_id: series_id})
+        SET s.similarity_updated_at = timestamp()
+        """
+        series_ids = list(series_ids)
+        batch_size = batch_size or len(series_ids) or 1
+        for start in range(0, len(series_ids), batch_size):
+            neo4j_db.write(query, {'series_ids': series_ids[start:start + batch_size]})
+
+    @staticmethod
+    def series_to_refresh(incremental=True):
+        """series_id des séries à recalculer (modifiées depuis le dernier calcul si incremental)"""
         query = """
+        MATCH (s:Series)
+        WHERE NOT $incremental
+           OR s.similarity_computed_at IS NULL
+           OR s.similarity_updated_at > s.similarity_computed_at
+        RETURN s.series_id as series_id
+        ORDER BY s.series_id
+        """
+        return [row['series_id'] for row in neo4j_db.read(query, {'incremental': incremental})]
+
+    @staticmethod
+    def refresh(series_ids, computed_at, top_k=None):
+        """Remplacer les relations SIMILAR_TO sortantes d'un lot de séries"""
+        config = Similarity.config()
+        result = neo4j_db.write(Similarity.REFRESH_QUERY, {
+            'series_ids': list(series_ids),
+            'computed_at': computed_at,
+            'top_k': top_k or config['TOP_K'],
+            'genre_weight': config['GENRE_WEIGHT'],
+            'actor_weight': config['ACTOR_WEIGHT'],
+            'rating_weight': config['RATING_WEIGHT'],
+        })
+        return result[0]['created'] if result else 0
+
+    SIMILAR_SERIES_QUERY = """
+        MATCH (s:Series {series_id: $series_id})-[sim:SIMILAR_TO]->(other:Series)
+        WHERE other.is_adult = false
+        RETURN other.series_id as series_id,
+               other.title as title,
+               other.year as year,
+               [(other)-[:HAS_GENRE]->(g:Genre) | g.name] as genres,
+               sim.score as score
+        ORDER BY sim.score DESC
+        LIMIT $limit
+        """
+
+    @staticmethod
+    def similar_series(series_id, limit=10):
+        """Séries les plus proches d'une série (lecture directe de SIMILAR_TO)"""
+        return neo4j_db.read(Similarity.SIMILAR_SERIES_QUERY, {'series_id': series_id, 'limit': limit})
+
+    @staticmethod
+    async def asimilar_series(series_id, limit=10):
+        """Version async de similar_series"""
+        return await async_neo4j_db.read(Similarity.SIMILAR_SERIES_QUERY, {'series_id': series_id, 'limit': limit})
+
+
+class Recommendation(Neo4jBaseModel):
+    """
+    Model pour générer des recommandations
+    $seen: series_id déjà notés par l'utilisateur (recommendations/seen.py), exclus
+    par `NOT rec.series_id IN $seen` plutôt que par un test (u)-[:RATED]->(rec) par ligne
+    """
+
+    BY_GENRE_QUERY = """
         MATCH (u:User {user_id: $user_id})-[r:RATED]->(s:Series)-[:HAS_GENRE]->(g:Genre)
         WHERE r.rating >= 4
-        WITH u, g, COUNT(*) as genre_weight
+        WITH g, COUNT(*) as genre_weight
         ORDER BY genre_weight DESC
         MATCH (rec:Series)-[:HAS_GENRE]->(g)
-        WHERE NOT (u)-[:RATED]->(rec) AND rec.is_adult = false
+        WHERE NOT rec.series_id IN $seen AND rec.is_adult = false
         WITH rec, COLLECT(DISTINCT g.name) as genres, SUM(genre_weight) as relevance
         RETURN rec.series_id as series_id,
                rec.title as title,
@@ -557,86 +1214,359 @@ class Recommendation(Neo4jBaseModel):
         ORDER BY relevance DESC
         LIMIT $limit
         """
-        return neo4j_db.query(query, {'user_id': user_id, 'limit': limit})
-    
-    @staticmethod
-    def collaborative(user_id, limit=10):
-        """Recommandations par filtrage collaboratif"""
-        query = """
+
+    COLLABORATIVE_QUERY = """
         MATCH (u:User {user_id: $user_id})-[r1:RATED]->(s:Series)<-[r2:RATED]-(other:User)
         WHERE r1.rating >= 4 AND r2.rating >= 4 AND u <> other
-        WITH u, other, COUNT(s) as common_series
+        WITH other, COUNT(s) as common_series
         ORDER BY common_series DESC
         LIMIT 5
         MATCH (other)-[r:RATED]->(rec:Series)
-        WHERE NOT (u)-[:RATED]->(rec) AND r.rating >= 4 AND rec.is_adult = false
+        WHERE NOT rec.series_id IN $seen AND r.rating >= 4 AND rec.is_adult = false
         WITH rec, COUNT(DISTINCT other) as recommended_by, AVG(r.rating) as avg_rating
-        OPTIONAL MATCH (rec)-[:HAS_GENRE]->(g:Genre)
+        ORDER BY recommended_by DESC, avg_rating DESC
+        LIMIT $limit
         RETURN rec.series_id as series_id,
                rec.title as title,
                rec.year as year,
-               COLLECT(DISTINCT g.name) as genres,
+               [(rec)-[:HAS_GENRE]->(g:Genre) | g.name] as genres,
                recommended_by,
                ROUND(avg_rating * 10) / 10.0 as avg_rating
         ORDER BY recommended_by DESC, avg_rating DESC
-        LIMIT $limit
         """
-        return neo4j_db.query(query, {'user_id': user_id, 'limit': limit})
-    
-    @staticmethod
-    def by_actors(user_id, limit=10):
-        """Recommandations basées sur les acteurs préférés"""
-        query = """
+
+    BY_ACTORS_QUERY = """
         MATCH (u:User {user_id: $user_id})-[r:RATED]->(s:Series)-[:HAS_ACTOR]->(a:Actor)
         WHERE r.rating >= 4
-        WITH u, COLLECT(DISTINCT a) as favorite_actors
+        WITH COLLECT(DISTINCT a) as favorite_actors
         UNWIND favorite_actors as actor
         MATCH (actor)<-[:HAS_ACTOR]-(rec:Series)
-        WHERE NOT (u)-[:RATED]->(rec) AND rec.is_adult = false
+        WHERE NOT rec.series_id IN $seen AND rec.is_adult = false
         WITH rec, COLLECT(DISTINCT actor.name) as shared_actors, COUNT(actor) as actor_matches
-        OPTIONAL MATCH (rec)-[:HAS_GENRE]->(g:Genre)
+        ORDER BY actor_matches DESC
+        LIMIT $limit
         RETURN rec.series_id as series_id,
                rec.title as title,
                rec.year as year,
-               shared_actors,
-               COLLECT(DISTINCT g.name) as genres,
+               shared_actors[..5] as shared_actors,
+               [(rec)-[:HAS_GENRE]->(g:Genre) | g.name] as genres,
                actor_matches as score
         ORDER BY actor_matches DESC
+        """
+
+    # Filtrage et métadonnées des candidats fusionnés par recommendations/pipeline.py
+    FUSED_QUERY = """
+        UNWIND $candidates AS candidate
+        MATCH (rec:Series {series_id: candidate.series_id})
+        WHERE rec.is_adult = false AND NOT rec.series_id IN $seen
+        RETURN rec.series_id as series_id,
+               rec.title as title,
+               rec.year as year,
+               [(rec)-[:HAS_GENRE]->(g:Genre) | g.name] as genres,
+               COLLECT { MATCH (rec)-[:HAS_ACTOR]->(a:Actor) RETURN a.name LIMIT 5 } as actors,
+               ROUND(candidate.score * 1000) / 1000.0 as total_score,
+               candidate.sources as sources
+        ORDER BY candidate.score DESC
+        """
+
+    # Parcours borné en 2 sauts: séries aimées -> voisins SIMILAR_TO (top-K chacune)
+    BY_SIMILAR_QUERY = """
+        MATCH (u:User {user_id: $user_id})-[r:RATED]->(s:Series)-[sim:SIMILAR_TO]->(rec:Series)
+        WHERE r.rating >= 4 AND rec.is_adult = false AND NOT rec.series_id IN $seen
+        WITH rec, SUM(sim.score * (r.rating - 3)) as score, COLLECT(DISTINCT s.title)[0..3] as because
+        RETURN rec.series_id as series_id,
+               rec.title as title,
+               rec.year as year,
+               [(rec)-[:HAS_GENRE]->(g:Genre) | g.name] as genres,
+               because,
+               score
+        ORDER BY score DESC
         LIMIT $limit
         """
-        return neo4j_db.query(query, {'user_id': user_id, 'limit': limit})
-    
-    @staticmethod
-    def hybrid(user_id, limit=10):
-        """Recommandations hybrides"""
-        query = """
-        // Score basé sur les genres
-        MATCH (u:User {user_id: $user_id})-[r:RATED]->(s:Series)-[:HAS_GENRE]->(g:Genre)
-        WHERE r.rating >= 4
-        WITH u, g, COUNT(*) as genre_weight
-        MATCH (rec:Series)-[:HAS_GENRE]->(g)
-        WHERE NOT (u)-[:RATED]->(rec) AND rec.is_adult = false
-        WITH u, rec, SUM(genre_weight) as genre_score
-        
-        // Score collaboratif
-        OPTIONAL MATCH (u)-[r1:RATED]->(s:Series)<-[r2:RATED]-(other:User)
-        WHERE r1.rating >= 4 AND r2.rating >= 4
-        WITH u, rec, genre_score, other
-        OPTIONAL MATCH (other)-[r:RATED]->(rec)
-        WHERE r.rating >= 4
-        WITH rec, genre_score, COUNT(DISTINCT other) as collab_score
-        
-        // Informations complémentaires
-        OPTIONAL MATCH (rec)-[:HAS_GENRE]->(g:Genre)
-        OPTIONAL MATCH (rec)-[:HAS_ACTOR]->(a:Actor)
-        
+
+    MATERIALIZED_QUERY = """
+        MATCH (u:User {user_id: $user_id})-[r:RECOMMENDED {strategy: $strategy}]->(rec:Series)
+        WHERE NOT rec.series_id IN $seen
         RETURN rec.series_id as series_id,
                rec.title as title,
                rec.year as year,
-               COLLECT(DISTINCT g.name) as genres,
-               COLLECT(DISTINCT a.name)[0..5] as actors,
-               (genre_score * 2 + collab_score * 3) as total_score
-        ORDER BY total_score DESC
+               [(rec)-[:HAS_GENRE]->(g:Genre) | g.name] as genres,
+               COLLECT { MATCH (rec)-[:HAS_ACTOR]->(a:Actor) RETURN a.name LIMIT 5 } as actors,
+               r.score as total_score
+        ORDER BY r.rank
         LIMIT $limit
         """
-        return neo4j_db.query(query, {'user_id': user_id, 'limit': limit})
\ No newline at end of file
+
+    # Stratégie -> (requête, champ utilisé comme score)
+    STRATEGIES = {
+        'genre': ('BY_GENRE_QUERY', 'score'),
+        'collaborative': ('COLLABORATIVE_QUERY', 'recommended_by'),
+        'actors': ('BY_ACTORS_QUERY', 'score'),
+        'hybrid': (None, 'total_score'),
+        'similar': ('BY_SIMILAR_QUERY', 'score'),
+        # Stratégies calculées en Python: méthode Recommendation._<stratégie>
+        'embedding': (None, 'score'),
+        'als': (None, 'score'),
+    }
+    
+    @staticmethod
+    def _params(user_id, limit=10):
+        return {'user_id': user_id, 'limit': limit, 'seen': seen_sets.get(user_id).rated.ids()}
+    
+    @staticmethod
+    async def _aread(query, user_id, limit=10):
+        seen = await seen_sets.aget(user_id)
+        return await async_neo4j_db.read(query, {'user_id': user_id, 'limit': limit, 'seen': seen.rated.ids()})
+    
+    @staticmethod
+    def compute(strategy, user_id, limit=10):
+        """Calculer une stratégie en direct, sans passer par le cache"""
+        if strategy == 'collaborative':
+            return Recommendation._collaborative(user_id, limit)
+        if strategy == 'genre':
+            return Recommendation._genre(user_id, limit)
+        query_name, _ = Recommendation.STRATEGIES[strategy]
+        if query_name is None:
+            return getattr(Recommendation, f'_{strategy}')(user_id, limit)
+        return neo4j_db.read(getattr(Recommendation, query_name), Recommendation._params(user_id, limit))
+    
+    @staticmethod
+    def database_time():
+        """Horloge de la base en ms (timestamp()), comparable à u.ratings_updated_at"""
+        return neo4j_db.read("RETURN timestamp() as now")[0]['now']
+    
+    @staticmethod
+    def users_to_materialize(incremental=True):
+        """user_id des utilisateurs à recalculer (notes modifiées depuis le dernier calcul si incremental)"""
+        query = """
+        MATCH (u:User)
+        WHERE NOT $incremental
+           OR u.recommendations_computed_at IS NULL
+           OR u.ratings_updated_at > u.recommendations_computed_at
+        RETURN u.user_id as user_id
+        ORDER BY u.user_id
+        """
+        return [row['user_id'] for row in neo4j_db.read(query, {'incremental': incremental})]
+    
+    @staticmethod
+    def materialize(rows):
+        """
+        Remplacer les relations RECOMMENDED d'un lot d'utilisateurs
+        rows: [{user_id, strategy, computed_at, recs: [{series_id, score, rank}]}]
+        """
+        query = """
+        UNWIND $rows AS row
+        MATCH (u:User {user_id: row.user_id})
+        OPTIONAL MATCH (u)-[old:RECOMMENDED {strategy: row.strategy}]->()
+        DELETE old
+        WITH DISTINCT u, row
+        SET u.recommendations_computed_at = row.computed_at
+        WITH u, row
+        UNWIND row.recs AS rec
+        MATCH (s:Series {series_id: rec.series_id})
+        CREATE (u)-[:RECOMMENDED {
+            strategy: row.strategy,
+            score: rec.score,
+            rank: rec.rank,
+            computed_at: row.computed_at
+        }]->(s)
+        """
+        return neo4j_db.write_batch(query, rows)
+    
+    @staticmethod
+    def materialized(user_id, strategy='hybrid', limit=10):
+        """Recommandations pré-calculées (relations RECOMMENDED), même format que hybrid"""
+        return neo4j_db.read(Recommendation.MATERIALIZED_QUERY, {
+            'user_id': user_id,
+            'strategy': strategy,
+            'limit': limit,
+            'seen': seen_sets.get(user_id).rated.ids()
+        })
+    
+    @staticmethod
+    async def amaterialized(user_id, strategy='hybrid', limit=10):
+        """Version async de materialized"""
+        seen = await seen_sets.aget(user_id)
+        return await async_neo4j_db.read(Recommendation.MATERIALIZED_QUERY, {
+            'user_id': user_id,
+            'strategy': strategy,
+            'limit': limit,
+            'seen': seen.rated.ids()
+        })
+    
+    @staticmethod
+    def by_genre(user_id, limit=10):
+        """Recommandations basées sur les genres préférés"""
+        return recommendation_cache.get_or_compute(
+            user_id, 'genre', limit,
+            lambda: Recommendation._genre(user_id, limit)
+        )
+    
+    @staticmethod
+    def _genre(user_id, limit=10):
+        """
+        Requête Cypher, ou fusion à seuil des listes de popularité par genre
+        (recommendations/genre_index.py) si RECOMMENDATION_GENRE_BACKEND = 'index'
+        """
+        if getattr(settings, 'RECOMMENDATION_GENRE_BACKEND', 'cypher') == 'index':
+            return genre_index.recommend_for_user(user_id, limit)
+        return neo4j_db.read(Recommendation.BY_GENRE_QUERY, Recommendation._params(user_id, limit))
+    
+    @staticmethod
+    async def aby_genre(user_id, limit=10):
+        """Version async de by_genre"""
+        if getattr(settings, 'RECOMMENDATION_GENRE_BACKEND', 'cypher') == 'index':
+            return await recommendation_cache.aget_or_compute(
+                user_id, 'genre', limit,
+                lambda: asyncio.to_thread(detached(Recommendation._genre), user_id, limit)
+            )
+        return await recommendation_cache.aget_or_compute(
+            user_id, 'genre', limit,
+            lambda: Recommendation._aread(Recommendation.BY_GENRE_QUERY, user_id, limit)
+        )
+    
+    @staticmethod
+    def collaborative(user_id, limit=10):
+        """Recommandations par filtrage collaboratif"""
+        return recommendation_cache.get_or_compute(
+            user_id, 'collaborative', limit,
+            lambda: Recommendation._collaborative(user_id, limit)
+        )
+    
+    @staticmethod
+    def _collaborative(user_id, limit=10):
+        """
+        Filtrage collaboratif en Cypher, ou en mémoire sur la matrice creuse
+        des notes si RECOMMENDATION_COLLABORATIVE_BACKEND = 'sparse'
+        """
+        if getattr(settings, 'RECOMMENDATION_COLLABORATIVE_BACKEND', 'cypher') == 'sparse':
+            from recommendations.sparse_cf import get_engine
+            config = getattr(settings, 'SPARSE_CF', {})
+            engine = get_engine(
+                max_age=config.get('MAX_AGE'),
+                mode=config.get('MODE', 'user'),
+                similarity=config.get('SIMILARITY', 'overlap'),
+                neighbours=config.get('NEIGHBOURS', 5),
+            )
+            # Notes à jour (seen-set) plutôt que celles de l'instantané de la matrice
+            seen = seen_sets.get(user_id)
+            return engine.recommend(user_id, limit, rated=seen.rated, liked=seen.liked)
+        return neo4j_db.read(Recommendation.COLLABORATIVE_QUERY, Recommendation._params(user_id, limit))
+    
+    @staticmethod
+    async def acollaborative(user_id, limit=10):
+        """Version async de collaborative"""
+        if getattr(settings, 'RECOMMENDATION_COLLABORATIVE_BACKEND', 'cypher') == 'sparse':
+            return await recommendation_cache.aget_or_compute(
+                user_id, 'collaborative', limit,
+                lambda: asyncio.to_thread(detached(Recommendation._collaborative), user_id, limit)
+            )
+        return await recommendation_cache.aget_or_compute(
+            user_id, 'collaborative', limit,
+            lambda: Recommendation._aread(Recommendation.COLLABORATIVE_QUERY, user_id, limit)
+        )
+    
+    @staticmethod
+    def by_actors(user_id, limit=10):
+        """Recommandations basées sur les acteurs préférés"""
+        return recommendation_cache.get_or_compute(
+            user_id, 'actors', limit,
+            lambda: neo4j_db.read(Recommendation.BY_ACTORS_QUERY, Recommendation._params(user_id, limit))
+        )
+    
+    @staticmethod
+    async def aby_actors(user_id, limit=10):
+        """Version async de by_actors"""
+        return await recommendation_cache.aget_or_compute(
+            user_id, 'actors', limit,
+            lambda: Recommendation._aread(Recommendation.BY_ACTORS_QUERY, user_id, limit)
+        )
+    
+    @staticmethod
+    def by_similar(user_id, limit=10):
+        """Recommandations à partir du graphe SIMILAR_TO pré-calculé"""
+        return recommendation_cache.get_or_compute(
+            user_id, 'similar', limit,
+            lambda: neo4j_db.read(Recommendation.BY_SIMILAR_QUERY, Recommendation._params(user_id, limit))
+        )
+    
+    @staticmethod
+    async def aby_similar(user_id, limit=10):
+        """Version async de by_similar"""
+        return await recommendation_cache.aget_or_compute(
+            user_id, 'similar', limit,
+            lambda: Recommendation._aread(Recommendation.BY_SIMILAR_QUERY, user_id, limit)
+        )
+    
+    @staticmethod
+    def embedding(user_id, limit=10):
+        """Recommandations par plus proches voisins approchés (index ANN des embeddings)"""
+        return recommendation_cache.get_or_compute(
+            user_id, 'embedding', limit,
+            lambda: Recommendation._embedding(user_id, limit)
+        )
+    
+    @staticmethod
+    def _embedding(user_id, limit=10):
+        from recommendations import ann
+        return ann.recommend_for_user(user_id, limit)
+    
+    @staticmethod
+    async def aembedding(user_id, limit=10):
+        """Version async de embedding"""
+        return await recommendation_cache.aget_or_compute(
+            user_id, 'embedding', limit,
+            lambda: asyncio.to_thread(detached(Recommendation._embedding), user_id, limit)
+        )
+    
+    @staticmethod
+    def als(user_id, limit=10):
+        """Recommandations par factorisation matricielle (facteurs ALS entraînés par train_als)"""
+        return recommendation_cache.get_or_compute(
+            user_id, 'als', limit,
+            lambda: Recommendation._als(user_id, limit)
+        )
+    
+    @staticmethod
+    def _als(user_id, limit=10):
+        from recommendations import als
+        return als.recommend_for_user(user_id, limit)
+    
+    @staticmethod
+    async def aals(user_id, limit=10):
+        """Version async de als"""
+        return await recommendation_cache.aget_or_compute(
+            user_id, 'als', limit,
+            lambda: asyncio.to_thread(detached(Recommendation._als), user_id, limit)
+        )
+    
+    @staticmethod
+    def describe_fused(user_id, candidates):
+        """Candidats fusionnés [{series_id, score, sources}] -> lignes au format hybrid"""
+        if not candidates:
+            return []
+        return neo4j_db.read(Recommendation.FUSED_QUERY, {
+            'candidates': candidates,
+            'seen': seen_sets.get(user_id).rated.ids()
+        })
+    
+    @staticmethod
+    def hybrid(user_id, limit=10):
+        """Recommandations hybrides (fusion pondérée des sources, settings.HYBRID_PIPELINE)"""
+        return recommendation_cache.get_or_compute(
+            user_id, 'hybrid', limit,
+            lambda: Recommendation._hybrid(user_id, limit)
+        )
+    
+    @staticmethod
+    def _hybrid(user_id, limit=10):
+        from recommendations import pipeline
+        return pipeline.recommend(user_id, limit)
+    
+    @staticmethod
+    async def ahybrid(user_id, limit=10):
+        """Version async de hybrid"""
+        return await recommendation_cache.aget_or_compute(
+            user_id, 'hybrid', limit,
+            lambda: asyncio.to_thread(detached(Recommendation._hybrid), user_id, limit)
+        )
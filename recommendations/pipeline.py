@@ -0,0 +1,174 @@
+# recommendations/pipeline.py
+"""
+Recommandation hybride en pipeline: génération de candidats -> normalisation
+-> fusion pondérée -> filtrage/dédoublonnage -> re-classement
+Chaque source (stratégie de Recommendation ou fonction importée par chemin)
+renvoie au plus CANDIDATES_PER_SOURCE candidats; les sources tournent en
+parallèle (un thread par source, démarrées ensemble) et une source trop lente
+(TIMEOUT) est ignorée. La latence est donc bornée par la source la plus lente
+et non par un produit croisé en Cypher.
+
+Configuration: settings.HYBRID_PIPELINE
+"""
+
+from concurrent.futures import ThreadPoolExecutor, wait
+import logging
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from recommendations.seen import seen_sets
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    # source -> poids; une source est une stratégie de Recommendation.STRATEGIES
+    # ou le chemin d'une fonction (user_id, limit) -> [{series_id, score}]
+    'SOURCES': {
+        'genre': 2.0,
+        'collaborative': 3.0,
+        'actors': 1.0,
+        'similar': 1.0,
+    },
+    'CANDIDATES_PER_SOURCE': 50,
+    'NORMALIZE': 'max',      # 'max' (score / meilleur score) ou 'rank' (1 / (60 + rang))
+    'TIMEOUT': 2.0,          # secondes par source
+    'MAX_PER_GENRE': None,   # re-classement: au plus N séries par genre principal
+}
+
+RRF_K = 60
+
+
+def get_config():
+    return dict(DEFAULTS, **getattr(settings, 'HYBRID_PIPELINE', {}))
+
+
+def _source_function(name):
+    """Fonction (user_id, limit) -> [{series_id, score}] pour une source (ImportError si introuvable)"""
+    from recommendations.models import Recommendation
+
+    if name in Recommendation.STRATEGIES:
+        if name == 'hybrid':
+            raise ValueError("La source 'hybrid' ne peut pas alimenter le pipeline hybride")
+        _, score_field = Recommendation.STRATEGIES[name]
+
+        def run(user_id, limit):
+            return [
+                {'series_id': row['series_id'], 'score': row.get(score_field) or 0}
+                for row in Recommendation.compute(name, user_id, limit)
+            ]
+        return run
+    return import_string(name)
+
+
+def generate_candidates(user_id, sources, limit, timeout):
+    """
+    {source: [{series_id, score}]}, sources exécutées en parallèle.
+    Un exécuteur par appel, avec un thread par source: toutes démarrent tout de
+    suite, le TIMEOUT compte donc depuis le début de chaque source et non depuis
+    sa mise en file derrière les sources d'autres requêtes.
+    """
+    functions = {}
+    for name in sources:
+        try:
+            functions[name] = _source_function(name)
+        except ImportError as e:
+            # Chemin de source invalide: seule cette source est écartée
+            logger.error(f"Source hybride '{name}' ignorée: {e}")
+    if not functions:
+        return {}
+
+    executor = ThreadPoolExecutor(max_workers=len(functions), thread_name_prefix='hybrid-source')
+    try:
+        futures = {
+            executor.submit(function, user_id, limit): name
+            for name, function in functions.items()
+        }
+        done, not_done = wait(futures, timeout=timeout)
+    finally:
+        # Sans attendre les sources trop lentes; celles encore en file sont annulées
+        executor.shutdown(wait=False, cancel_futures=True)
+    for future in not_done:
+        logger.warning(f"Source hybride '{futures[future]}' ignorée: plus de {timeout}s")
+
+    candidates = {}
+    for future in done:
+        try:
+            candidates[futures[future]] = future.result()[:limit]
+        except Exception:
+            # Une source en erreur (index absent, modèle non entraîné...) n'invalide pas les autres
+            logger.exception(f"Source hybride '{futures[future]}' en erreur")
+            continue
+    return candidates
+
+
+def normalize(rows, method='max'):
+    """{series_id: score normalisé dans [0, 1]} pour une source"""
+    if method == 'rank':
+        ranked = sorted(rows, key=lambda row: row['score'], reverse=True)
+        return {
+            row['series_id']: (RRF_K + 1) / (RRF_K + rank)
+            for rank, row in enumerate(ranked, 1)
+        }
+    best = max((row['score'] for row in rows), default=0)
+    if best <= 0:
+        return {}
+    return {row['series_id']: row['score'] / best for row in rows if row['score'] > 0}
+
+
+def fuse(candidates, weights, method='max'):
+    """[{series_id, score, sources}] triés par score fusionné (somme pondérée)"""
+    fused = {}
+    for name, rows in candidates.items():
+        for series_id, score in normalize(rows, method).items():
+            entry = fused.setdefault(series_id, {'series_id': series_id, 'score': 0.0, 'sources': []})
+            entry['score'] += weights[name] * score
+            entry['sources'].append(name)
+    return sorted(fused.values(), key=lambda entry: (-entry['score'], -len(entry['sources'])))
+
+
+def rerank(rows, limit, max_per_genre=None):
+    """Top `limit`, avec au plus `max_per_genre` séries par genre principal"""
+    if not max_per_genre:
+        return rows[:limit]
+    per_genre = {}
+    selected, overflow = [], []
+    for row in rows:
+        genre = row['genres'][0] if row.get('genres') else None
+        if genre is not None and per_genre.get(genre, 0) >= max_per_genre:
+            overflow.append(row)
+            continue
+        per_genre[genre] = per_genre.get(genre, 0) + 1
+        selected.append(row)
+        if len(selected) == limit:
+            return selected
+    # Pas assez de diversité: compléter avec les meilleurs écartés
+    return selected + overflow[:limit - len(selected)]
+
+
+def recommend(user_id, limit=10, config=None):
+    """Recommandations hybrides au format de Recommendation.hybrid"""
+    from recommendations.models import Recommendation
+
+    config = config or get_config()
+    weights = {name: weight for name, weight in config['SOURCES'].items() if weight}
+    if not weights:
+        return []
+
+    candidates = generate_candidates(
+        user_id, weights, config['CANDIDATES_PER_SOURCE'], config['TIMEOUT']
+    )
+    # Séries déjà notées écartées en mémoire, avant de réserver la marge
+    rated = seen_sets.get(user_id).rated
+    fused = [
+        row for row in fuse(candidates, weights, config['NORMALIZE'])
+        if row['series_id'] not in rated
+    ]
+
+    # Filtrage (contenu adulte) et métadonnées en une seule requête,
+    # sur une marge de candidats pour laisser de la place au re-classement
+    margin = limit * 3 if config['MAX_PER_GENRE'] else limit * 2
+    rows = Recommendation.describe_fused(user_id, fused[:margin])
+    return rerank(rows, limit, config['MAX_PER_GENRE'])
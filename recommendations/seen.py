@@ -0,0 +1,274 @@
+# recommendations/seen.py
+"""
+Séries déjà notées par utilisateur (« seen-sets »), gardées en mémoire pour
+exclure les candidats sans sonder (u)-[:RATED]->(rec) ligne par ligne:
+- en Python: `series_id in seen_sets.get(user_id).rated`;
+- en Cypher: `WHERE NOT rec.series_id IN $seen`, avec
+  seen = seen_sets.get(user_id).rated.ids().
+
+Chaque series_id reçoit une position entière (table d'internement partagée
+par le processus). Un SeenSet est, à la manière d'un conteneur roaring, un
+tableau trié de positions (4 octets par note) tant que l'utilisateur a peu
+de notes, puis un bitset (un bit par série du catalogue) au-delà.
+
+Les ensembles sont chargés depuis Neo4j au premier appel puis tenus à jour
+par Rating.create / Rating.delete. Comme le cache 'memory', ils sont propres
+à chaque processus: le TTL borne la durée pendant laquelle un autre worker
+peut ignorer une notation.
+
+Configuration: settings.SEEN_SETS
+"""
+
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+
+
+DEFAULTS = {
+    'TTL': 600,             # secondes avant rechargement depuis Neo4j
+    'MAX_USERS': 10000,     # utilisateurs gardés en mémoire (LRU)
+}
+
+LIKE_THRESHOLD = 4
+
+
+def get_config():
+    return dict(DEFAULTS, **getattr(settings, 'SEEN_SETS', {}))
+
+
+class SeriesPositions:
+    """Table d'internement series_id <-> position entière"""
+
+    def __init__(self):
+        self.ids = []
+        self.positions = {}
+        self.lock = threading.Lock()
+
+    def intern(self, series_id):
+        position = self.positions.get(series_id)
+        if position is None:
+            with self.lock:
+                position = self.positions.get(series_id)
+                if position is None:
+                    position = self.positions[series_id] = len(self.ids)
+                    self.ids.append(series_id)
+        return position
+
+    def get(self, series_id):
+        return self.positions.get(series_id)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+series_positions = SeriesPositions()
+
+
+class SeenSet:
+    """
+    Ensemble de series_id stocké comme positions: tableau trié (array 'I')
+    tant qu'il coûte moins qu'un bitset, bitset (bytearray) ensuite
+    """
+
+    __slots__ = ('sorted', 'bits', 'count', 'positions')
+
+    def __init__(self, series_ids=(), positions=None):
+        self.positions = positions or series_positions
+        self.sorted = array('I')
+        self.bits = None
+        self.count = 0
+        for series_id in series_ids:
+            self.add(series_id)
+
+    def _dense_enough(self):
+        # Tableau: 4 octets par élément; bitset: 1 bit par série connue
+        return self.count * 32 > len(self.positions)
+
+    def _to_bits(self):
+        bits = bytearray((len(self.positions) + 7) // 8)
+        for position in self.sorted:
+            bits[position >> 3] |= 1 << (position & 7)
+        self.bits = bits
+        self.sorted = None
+
+    def add(self, series_id):
+        position = self.positions.intern(series_id)
+        if self.bits is None:
+            index = bisect_left(self.sorted, position)
+            if index < len(self.sorted) and self.sorted[index] == position:
+                return
+            self.sorted.insert(index, position)
+            self.count += 1
+            if self._dense_enough():
+                self._to_bits()
+            return
+        byte, mask = position >> 3, 1 << (position & 7)
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(byte + 1 - len(self.bits)))
+        if not self.bits[byte] & mask:
+            self.bits[byte] |= mask
+            self.count += 1
+
+    def _has(self, position):
+        # sorted lu avant bits: _to_bits remplit bits avant de vider sorted
+        positions = self.sorted
+        if positions is not None:
+            index = bisect_left(positions, position)
+            return index < len(positions) and positions[index] == position
+        byte = position >> 3
+        return byte < len(self.bits) and bool(self.bits[byte] & (1 << (position & 7)))
+
+    def discard(self, series_id):
+        position = self.positions.get(series_id)
+        if position is None or not self._has(position):
+            return
+        if self.bits is None:
+            del self.sorted[bisect_left(self.sorted, position)]
+        else:
+            self.bits[position >> 3] &= ~(1 << (position & 7)) & 0xFF
+        self.count -= 1
+
+    def __contains__(self, series_id):
+        position = self.positions.get(series_id)
+        return position is not None and self._has(position)
+
+    def __iter__(self):
+        ids = self.positions.ids
+        positions = self.sorted
+        if positions is not None:
+            for position in positions:
+                yield ids[position]
+            return
+        for byte_index, byte in enumerate(self.bits):
+            while byte:
+                low = byte & -byte
+                yield ids[(byte_index << 3) + low.bit_length() - 1]
+                byte ^= low
+
+    def __len__(self):
+        return self.count
+
+    def ids(self):
+        """Liste des series_id (paramètre $seen des requêtes Cypher)"""
+        return list(self)
+
+
+# rated: toutes les séries notées; liked: notées >= LIKE_THRESHOLD
+Seen = namedtuple('Seen', ['rated', 'liked'])
+
+
+RATINGS_QUERY = """
+    MATCH (:User {user_id: $user_id})-[r:RATED]->(s:Series)
+    RETURN s.series_id as series_id, r.rating as rating
+    """
+
+
+def _build(rows):
+    rated, liked = SeenSet(), SeenSet()
+    for row in rows:
+        rated.add(row['series_id'])
+        if row['rating'] is not None and row['rating'] >= LIKE_THRESHOLD:
+            liked.add(row['series_id'])
+    return Seen(rated, liked)
+
+
+class SeenSets:
+    """LRU user_id -> Seen, avec expiration et mise à jour incrémentale"""
+
+    def __init__(self):
+        self.entries = OrderedDict()   # user_id -> (expiration, Seen)
+        self.version = 0               # incrémentée à chaque écriture
+        self.lock = threading.Lock()
+        self.config = None
+
+    def _config(self):
+        if self.config is None:
+            self.config = get_config()
+        return self.config
+
+    def _cached(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None, self.version
+            expires, seen = entry
+            if expires < time.monotonic():
+                del self.entries[user_id]
+                return None, self.version
+            self.entries.move_to_end(user_id)
+            return seen, self.version
+
+    def _store(self, user_id, seen, version):
+        config = self._config()
+        with self.lock:
+            # Une notation arrivée pendant la lecture: ne pas garder un état périmé
+            if version != self.version:
+                return
+            self.entries[user_id] = (time.monotonic() + config['TTL'], seen)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > config['MAX_USERS']:
+                self.entries.popitem(last=False)
+
+    def get(self, user_id):
+        """Seen(rated, liked) de l'utilisateur, chargé depuis Neo4j si absent"""
+        seen, version = self._cached(user_id)
+        if seen is None:
+            from tv_recommender.neo4j_db import neo4j_db
+            seen = _build(neo4j_db.read(RATINGS_QUERY, {'user_id': user_id}))
+            self._store(user_id, seen, version)
+        return seen
+
+    async def aget(self, user_id):
+        """Version async de get"""
+        seen, version = self._cached(user_id)
+        if seen is None:
+            from tv_recommender.neo4j_async import async_neo4j_db
+            seen = _build(await async_neo4j_db.read(RATINGS_QUERY, {'user_id': user_id}))
+            self._store(user_id, seen, version)
+        return seen
+
+    def rated(self, user_id, series_id, rating):
+        """Répercuter une notation (création ou modification)"""
+        with self.lock:
+            self.version += 1
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return
+            seen = entry[1]
+            seen.rated.add(series_id)
+            if rating is not None and rating >= LIKE_THRESHOLD:
+                seen.liked.add(series_id)
+            else:
+                seen.liked.discard(series_id)
+
+    def unrated(self, user_id, series_id):
+        """Répercuter la suppression d'une notation"""
+        with self.lock:
+            self.version += 1
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return
+            entry[1].rated.discard(series_id)
+            entry[1].liked.discard(series_id)
+
+    def forget(self, user_id):
+        with self.lock:
+            self.version += 1
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        """Tout oublier (après un import en masse des notes)"""
+        with self.lock:
+            self.version += 1
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# Instance globale
+seen_sets = SeenSets()
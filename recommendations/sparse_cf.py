@@ -0,0 +1,326 @@
+# recommendations/sparse_cf.py
+"""
+Filtrage collaboratif en mémoire sur une matrice creuse utilisateurs × séries
+Les relations RATED (ou ratings.csv) sont chargées dans une matrice CSR avec
+des tables d'index entières ; similarités et recommandations sont calculées
+par produits creux vectorisés au lieu de parcourir le graphe à chaque requête.
+
+Dépendances: numpy, scipy (pip install numpy scipy)
+"""
+
+import threading
+import time
+from array import array
+
+import numpy as np
+from scipy import sparse
+
+from recommendations import csv_import
+
+
+LIKE_THRESHOLD = 4.0
+
+
+class RatingMatrix:
+    """Matrice CSR des notes (float32) et correspondances id <-> index"""
+
+    def __init__(self, matrix, user_ids, series_ids):
+        self.matrix = matrix
+        self.user_ids = user_ids
+        self.series_ids = series_ids
+        self.user_index = {user_id: i for i, user_id in enumerate(user_ids)}
+        self.series_index = {series_id: j for j, series_id in enumerate(series_ids)}
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Construire la matrice depuis un itérable de (user_id, series_id, rating)"""
+        user_index, series_index = {}, {}
+        users, series, values = array('i'), array('i'), array('f')
+
+        for user_id, series_id, rating in rows:
+            users.append(user_index.setdefault(user_id, len(user_index)))
+            series.append(series_index.setdefault(series_id, len(series_index)))
+            values.append(rating)
+
+        coo = sparse.coo_matrix(
+            (np.frombuffer(values, dtype=np.float32),
+             (np.frombuffer(users, dtype=np.int32), np.frombuffer(series, dtype=np.int32))),
+            shape=(len(user_index), len(series_index)),
+        )
+        # Une note en double (même utilisateur, même série) garde la dernière valeur
+        matrix = coo.tocsr()
+        if coo.nnz != matrix.nnz:
+            matrix = cls._keep_last(coo)
+
+        return cls(matrix, list(user_index), list(series_index))
+
+    @staticmethod
+    def _keep_last(coo):
+        keys = coo.row.astype(np.int64) * coo.shape[1] + coo.col
+        # Dernière occurrence de chaque couple (utilisateur, série)
+        _, last = np.unique(keys[::-1], return_index=True)
+        last = len(keys) - 1 - last
+        return sparse.csr_matrix(
+            (coo.data[last], (coo.row[last], coo.col[last])), shape=coo.shape
+        )
+
+    @classmethod
+    def from_csv(cls, ratings_path):
+        """Construire la matrice depuis ratings.csv (aucune base nécessaire)"""
+        rows = csv_import.iter_rows(ratings_path, csv_import.parse_rating)
+        return cls.from_rows((row['user_id'], row['series_id'], row['rating']) for row in rows)
+
+    @classmethod
+    def from_neo4j(cls):
+        """Exporter toutes les relations RATED de Neo4j"""
+        from tv_recommender.neo4j_db import neo4j_db
+        query = """
+        MATCH (u:User)-[r:RATED]->(s:Series)
+        RETURN u.user_id as user_id, s.series_id as series_id, r.rating as rating
+        """
+        rows = neo4j_db.read(query)
+        return cls.from_rows((row['user_id'], row['series_id'], row['rating']) for row in rows)
+
+
+def load_series_info(series_path=None, series_genres_path=None):
+    """
+    Métadonnées des séries (titre, année, genres, is_adult) par series_id,
+    depuis les CSV si fournis, sinon depuis Neo4j
+    """
+    info = {}
+    if series_path:
+        for row in csv_import.iter_rows(series_path, csv_import.parse_series):
+            info[row['series_id']] = {
+                'title': row['title'], 'year': row['year'],
+                'is_adult': row['is_adult'], 'genres': [],
+            }
+        if series_genres_path:
+            for row in csv_import.iter_rows(series_genres_path, csv_import.parse_series_genre):
+                if row['series_id'] in info:
+                    info[row['series_id']]['genres'].append(row['genre_name'])
+        return info
+
+    from tv_recommender.neo4j_db import neo4j_db
+    query = """
+    MATCH (s:Series)
+    RETURN s.series_id as series_id, s.title as title, s.year as year,
+           s.is_adult as is_adult, [(s)-[:HAS_GENRE]->(g:Genre) | g.name] as genres
+    """
+    for row in neo4j_db.read(query):
+        info[row.pop('series_id')] = row
+    return info
+
+
+def adult_mask(series_ids, series_info):
+    """Masque booléen des séries adultes, dans l'ordre de `series_ids`"""
+    return np.array(
+        [bool(series_info.get(series_id, {}).get('is_adult')) for series_id in series_ids], dtype=bool
+    )
+
+
+class SparseCollaborativeEngine:
+    """
+    Recommandations collaboratives servies depuis la mémoire.
+    mode 'user': voisins les plus proches (séries aimées en commun), comme
+    Recommendation.collaborative ; mode 'item': séries co-aimées avec celles
+    de l'utilisateur. similarity: 'overlap' (nombre commun), 'cosine', 'jaccard'.
+    """
+
+    def __init__(self, ratings, series_info=None, mode='user', similarity='overlap',
+                 neighbours=5, like_threshold=LIKE_THRESHOLD):
+        self.ratings = ratings
+        self.series_info = series_info or {}
+        self.mode = mode
+        self.similarity = similarity
+        self.neighbours = neighbours
+
+        matrix = ratings.matrix
+        # Matrice binaire des séries aimées (note >= seuil)
+        liked = matrix.copy()
+        liked.data = (liked.data >= like_threshold).astype(np.float32)
+        liked.eliminate_zeros()
+        self.liked = liked
+        self.liked_t = liked.T.tocsr()
+        self.user_counts = np.asarray(liked.sum(axis=1)).ravel()
+        self.series_counts = np.asarray(liked.sum(axis=0)).ravel()
+
+        # Note moyenne des "j'aime" par série (pour avg_rating en mode item)
+        liked_ratings = matrix.multiply(liked).tocsc()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.series_like_avg = np.asarray(liked_ratings.sum(axis=0)).ravel() / self.series_counts
+
+        # Séries exclues (contenu adulte)
+        self.excluded = np.zeros(len(ratings.series_ids), dtype=bool)
+        for series_id, meta in self.series_info.items():
+            j = ratings.series_index.get(series_id)
+            if j is not None and meta.get('is_adult'):
+                self.excluded[j] = True
+
+    @classmethod
+    def from_csv(cls, ratings_path, series_path=None, series_genres_path=None, **kwargs):
+        series_info = load_series_info(series_path, series_genres_path) if series_path else {}
+        return cls(RatingMatrix.from_csv(ratings_path), series_info, **kwargs)
+
+    @classmethod
+    def from_neo4j(cls, **kwargs):
+        return cls(RatingMatrix.from_neo4j(), load_series_info(), **kwargs)
+
+    def _normalize(self, overlap, own_count, other_counts):
+        if self.similarity == 'cosine':
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scores = overlap / np.sqrt(own_count * other_counts)
+        elif self.similarity == 'jaccard':
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scores = overlap / (own_count + other_counts - overlap)
+        else:
+            scores = overlap
+        return np.nan_to_num(scores)
+
+    @staticmethod
+    def _top(scores, k):
+        """Indices des k meilleurs scores strictement positifs, triés"""
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+    def _series_positions(self, series_ids):
+        index = self.ratings.series_index
+        return np.array(sorted({index[s] for s in series_ids if s in index}), dtype=np.int64)
+
+    def _own_items(self, u, liked=None):
+        """Index des séries aimées: `liked` (à jour) si fourni, sinon celles de l'instantané"""
+        if liked is not None:
+            return self._series_positions(liked)
+        if u is None:
+            return np.zeros(0, dtype=np.int64)
+        return self.liked[u].indices.astype(np.int64)
+
+    def _neighbours(self, u, own, k):
+        # Séries aimées en commun avec chaque utilisateur
+        overlap = np.asarray(self.liked_t[own].sum(axis=0)).ravel()
+        if u is not None:
+            overlap[u] = 0
+        scores = self._normalize(overlap, len(own), self.user_counts)
+        return self._top(scores, k), scores
+
+    def similar_users(self, user_id, k=None, liked=None):
+        """[(user_id, similarité)] des k voisins les plus proches"""
+        u = self.ratings.user_index.get(user_id)
+        own = self._own_items(u, liked)
+        if not len(own):
+            return []
+        top, scores = self._neighbours(u, own, k or self.neighbours)
+        return [(self.ratings.user_ids[v], float(scores[v])) for v in top]
+
+    def recommend(self, user_id, limit=10, rated=None, liked=None):
+        """
+        Recommandations au format de Recommendation.collaborative.
+        rated / liked: séries notées / aimées à jour (seen-set), pour ne pas
+        dépendre de l'instantané (notes récentes, utilisateur apparu depuis)
+        """
+        u = self.ratings.user_index.get(user_id)
+        own = self._own_items(u, liked)
+        if not len(own):
+            return []
+
+        if self.mode == 'item':
+            recommended_by, avg_rating = self._item_scores(own)
+        else:
+            recommended_by, avg_rating = self._user_scores(u, own)
+
+        # Exclure les séries déjà notées et le contenu adulte
+        if rated is not None:
+            recommended_by[self._series_positions(rated)] = 0
+        elif u is not None:
+            recommended_by[self.ratings.matrix[u].indices] = 0
+        recommended_by[self.excluded] = 0
+
+        # Tri: recommended_by décroissant puis avg_rating décroissant
+        candidates = np.flatnonzero(recommended_by > 0)
+        order = np.lexsort((-avg_rating[candidates], -recommended_by[candidates]))
+        return [self._describe(j, recommended_by[j], avg_rating[j]) for j in candidates[order][:limit]]
+
+    def _user_scores(self, u, own):
+        neighbours, _ = self._neighbours(u, own, self.neighbours)
+        if not len(neighbours):
+            empty = np.zeros(len(self.ratings.series_ids), dtype=np.float32)
+            return empty, empty.copy()
+
+        liked = self.liked[neighbours]
+        recommended_by = np.asarray(liked.sum(axis=0)).ravel()
+        rating_sums = np.asarray(self.ratings.matrix[neighbours].multiply(liked).sum(axis=0)).ravel()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_rating = np.nan_to_num(rating_sums / recommended_by)
+        return recommended_by, avg_rating
+
+    def _item_scores(self, own):
+        """
+        Somme, sur les séries aimées i, de la similarité item-item sim(j, i):
+        co(j, i) = utilisateurs ayant aimé j et i, normalisé par les popularités
+        |j| et |i| (cosine: co / sqrt(|j| |i|), jaccard: co / (|j| + |i| - co))
+        """
+        co_liked = (self.liked_t @ self.liked_t[own].T).tocoo()
+        pairs = self._normalize(
+            co_liked.data, self.series_counts[co_liked.row], self.series_counts[own[co_liked.col]]
+        )
+        scores = np.bincount(co_liked.row, weights=pairs, minlength=len(self.ratings.series_ids))
+        return scores, np.nan_to_num(self.series_like_avg)
+
+    def _describe(self, j, recommended_by, avg_rating):
+        series_id = self.ratings.series_ids[j]
+        meta = self.series_info.get(series_id, {})
+        # Compte entier, sauf similarité normalisée en mode item
+        if self.mode == 'item' and self.similarity != 'overlap':
+            recommended_by = round(float(recommended_by), 3)
+        else:
+            recommended_by = int(recommended_by)
+        return {
+            'series_id': series_id,
+            'title': meta.get('title'),
+            'year': meta.get('year'),
+            'genres': meta.get('genres', []),
+            'recommended_by': recommended_by,
+            'avg_rating': round(float(avg_rating) * 10) / 10.0,
+        }
+
+
+_engine = None
+_engine_built_at = 0.0
+_engine_lock = threading.Lock()
+_rebuilding = False
+
+
+def _rebuild(kwargs):
+    global _engine, _engine_built_at, _rebuilding
+    try:
+        engine = SparseCollaborativeEngine.from_neo4j(**kwargs)
+        with _engine_lock:
+            _engine, _engine_built_at = engine, time.monotonic()
+    except Exception:
+        # Neo4j indisponible: l'ancien moteur reste servi, nouvel essai au prochain appel
+        pass
+    finally:
+        with _engine_lock:
+            _rebuilding = False
+
+
+def get_engine(max_age=None, **kwargs):
+    """
+    Moteur partagé par le processus. Construit depuis Neo4j au premier appel;
+    après `max_age` secondes, reconstruit en tâche de fond pendant que
+    l'ancien moteur reste servi
+    """
+    global _engine, _engine_built_at, _rebuilding
+    with _engine_lock:
+        if _engine is None:
+            _engine = SparseCollaborativeEngine.from_neo4j(**kwargs)
+            _engine_built_at = time.monotonic()
+            return _engine
+        expired = max_age is not None and time.monotonic() - _engine_built_at > max_age
+        if expired and not _rebuilding:
+            _rebuilding = True
+            threading.Thread(
+                target=_rebuild, args=(kwargs,), name='sparse-cf-rebuild', daemon=True
+            ).start()
+        return _engine
@@ -0,0 +1,319 @@
+# recommendations/synthetic.py
+"""
+Générateur déterministe de graphes synthétiques (séries, acteurs, genres,
+utilisateurs, notations) avec des popularités en loi de Zipf
+Les lignes ont le format des parseurs de csv_import (prêtes pour bulk_create).
+Chaque entité est générée à partir de (seed, type, index): n'importe quelle
+plage d'index peut être produite indépendamment, en parallèle, sans mémoire
+proportionnelle à la taille du graphe.
+"""
+
+import bisect
+import csv
+import math
+import random
+import zlib
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+
+GENRES = [
+    'Drama', 'Comedy', 'Crime', 'Action', 'Adventure', 'Animation', 'Documentary',
+    'Thriller', 'Mystery', 'Romance', 'Sci-Fi', 'Fantasy', 'Family', 'Horror',
+    'Reality-TV', 'Talk-Show', 'History', 'Biography', 'War', 'Music', 'Sport',
+    'Western', 'News', 'Game-Show',
+]
+
+WORDS = [
+    'Dark', 'Lost', 'Blue', 'City', 'Night', 'House', 'Empire', 'Secret', 'Wild',
+    'Golden', 'Silent', 'Broken', 'River', 'Storm', 'Crown', 'Shadow', 'Island',
+    'Winter', 'Fire', 'Station', 'Legacy', 'Frontier', 'Signal', 'Harbor',
+]
+
+FIRST_NAMES = ['Alex', 'Camille', 'Sam', 'Jordan', 'Lou', 'Charlie', 'Noa', 'Eden', 'Robin', 'Sasha']
+LAST_NAMES = ['Martin', 'Bernard', 'Dubois', 'Moreau', 'Laurent', 'Garcia', 'Roux', 'Fontaine', 'Chevalier', 'Blanc']
+OCCUPATIONS = ['student', 'engineer', 'artist', 'teacher', 'doctor', 'writer', 'retired', 'other']
+
+SCALES = {
+    'tiny': {'users': 200, 'series': 500, 'actors': 1000, 'ratings_per_user': 10},
+    'small': {'users': 2000, 'series': 5000, 'actors': 10000, 'ratings_per_user': 20},
+    'medium': {'users': 20000, 'series': 50000, 'actors': 100000, 'ratings_per_user': 30},
+    'large': {'users': 200000, 'series': 200000, 'actors': 500000, 'ratings_per_user': 40},
+    'xlarge': {'users': 2500000, 'series': 500000, 'actors': 2000000, 'ratings_per_user': 40},
+}
+
+# Part des notes tirées dans les genres préférés de l'utilisateur, et bonus de note associé
+GENRE_AFFINITY = 0.6
+FAVOURITE_BONUS = 0.5
+RATING_COUNT_SIGMA = 1.0
+
+EPOCH = datetime(2020, 1, 1)
+UNIX_EPOCH = datetime(1970, 1, 1)
+
+
+class ZipfSampler:
+    """Tirage d'index 0..n-1 avec P(i) proportionnelle à 1 / (i + 1)^exponent"""
+
+    def __init__(self, n, exponent):
+        self.cumulative = list(accumulate(1.0 / (i + 1) ** exponent for i in range(n)))
+        self.total = self.cumulative[-1] if self.cumulative else 0.0
+
+    def sample(self, rng):
+        return bisect.bisect_left(self.cumulative, rng.random() * self.total)
+
+    def sample_distinct(self, rng, count, max_tries=None):
+        """`count` index distincts (moins si la distribution est trop concentrée)"""
+        chosen = {}
+        tries = max_tries or count * 20
+        while len(chosen) < count and tries:
+            chosen.setdefault(self.sample(rng), None)
+            tries -= 1
+        return list(chosen)
+
+
+class SyntheticGraph:
+    """
+    Paramètres d'un graphe synthétique et génération de ses lignes par plage d'index
+    L'index 0 est le plus populaire (séries, acteurs, genres).
+    """
+
+    def __init__(self, users, series, actors, ratings_per_user, genres_per_series=3,
+                 actors_per_series=6, zipf=1.1, adult_ratio=0.02, seed=0):
+        self.users = users
+        self.series = series
+        self.actors = actors
+        self.ratings_per_user = ratings_per_user
+        self.genres_per_series = genres_per_series
+        self.actors_per_series = actors_per_series
+        self.zipf = zipf
+        self.adult_ratio = adult_ratio
+        self.seed = seed
+        self._samplers = {}
+        self._by_genre = None
+
+    @classmethod
+    def from_scale(cls, scale='small', seed=0, **overrides):
+        params = dict(SCALES[scale])
+        params.update({key: value for key, value in overrides.items() if value is not None})
+        return cls(seed=seed, **params)
+
+    def params(self):
+        return {
+            'users': self.users,
+            'series': self.series,
+            'actors': self.actors,
+            'ratings_per_user': self.ratings_per_user,
+            'genres_per_series': self.genres_per_series,
+            'actors_per_series': self.actors_per_series,
+            'zipf': self.zipf,
+            'adult_ratio': self.adult_ratio,
+            'seed': self.seed,
+        }
+
+    # ===== IDENTIFIANTS =====
+
+    @staticmethod
+    def series_id(index):
+        return f'tt{index + 1:07d}'
+
+    @staticmethod
+    def actor_id(index):
+        return f'nm{index + 1:07d}'
+
+    @staticmethod
+    def user_id(index):
+        return f'u{index + 1}'
+
+    # ===== OUTILS =====
+
+    def _rng(self, kind, index):
+        return random.Random(f'{self.seed}:{kind}:{index}')
+
+    def _sampler(self, kind, n):
+        sampler = self._samplers.get(kind)
+        if sampler is None:
+            sampler = self._samplers[kind] = ZipfSampler(n, self.zipf)
+        return sampler
+
+    def quality(self, series_index):
+        """Note moyenne « réelle » d'une série, dans [1.5, 4.5]"""
+        return 1.5 + 3.0 * (zlib.crc32(f'{self.seed}:quality:{series_index}'.encode('utf-8')) / 0xFFFFFFFF)
+
+    @staticmethod
+    def _range(start, stop, total):
+        return range(start, total if stop is None else min(stop, total))
+
+    # ===== LIGNES =====
+
+    def iter_genres(self):
+        for index in range(len(GENRES)):
+            yield {'genre_id': f'g{index + 1:02d}', 'name': GENRES[index]}
+
+    def iter_series(self, start=0, stop=None):
+        for index in self._range(start, stop, self.series):
+            rng = self._rng('series', index)
+            title = f'{rng.choice(WORDS)} {rng.choice(WORDS)} {index + 1}'
+            yield {
+                'series_id': self.series_id(index),
+                'title': title,
+                'original_title': title if rng.random() < 0.8 else f'{rng.choice(WORDS)} {index + 1}',
+                'year': rng.randint(1960, 2024),
+                'is_adult': rng.random() < self.adult_ratio,
+            }
+
+    def iter_actors(self, start=0, stop=None):
+        for index in self._range(start, stop, self.actors):
+            rng = self._rng('actor', index)
+            birth_year = rng.randint(1920, 2005)
+            yield {
+                'actor_id': self.actor_id(index),
+                'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {index + 1}',
+                'birth_year': birth_year,
+                'death_year': birth_year + rng.randint(50, 95) if rng.random() < 0.1 else None,
+                'professions': 'actor' if rng.random() < 0.5 else 'actress',
+                'known_for_titles': None,
+            }
+
+    def series_genres(self, index):
+        """Index des genres d'une série (genres populaires plus fréquents)"""
+        rng = self._rng('series-genres', index)
+        count = rng.randint(1, self.genres_per_series)
+        return self._sampler('genres', len(GENRES)).sample_distinct(rng, count)
+
+    def iter_series_genres(self, start=0, stop=None):
+        for index in self._range(start, stop, self.series):
+            for genre_index in self.series_genres(index):
+                yield {'series_id': self.series_id(index), 'genre_name': GENRES[genre_index]}
+
+    def iter_series_actors(self, start=0, stop=None):
+        sampler = self._sampler('actors', self.actors)
+        for index in self._range(start, stop, self.series):
+            rng = self._rng('series-actors', index)
+            count = rng.randint(1, self.actors_per_series)
+            for actor_index in sampler.sample_distinct(rng, count):
+                yield {'series_id': self.series_id(index), 'actor_id': self.actor_id(actor_index)}
+
+    def iter_users(self, start=0, stop=None):
+        for index in self._range(start, stop, self.users):
+            rng = self._rng('user', index)
+            user_id = self.user_id(index)
+            yield {
+                'user_id': user_id,
+                'name': f'user{index + 1}',
+                'email': f'user{index + 1}@example.com',
+                'age': rng.randint(16, 80),
+                'gender': rng.choice(['M', 'F']),
+                'occupation': rng.choice(OCCUPATIONS),
+                'join_date': (EPOCH + timedelta(days=rng.randint(0, 1500))).date().isoformat(),
+            }
+
+    def rating_count(self, rng):
+        """
+        Nombre de notes d'un utilisateur: log-normale de moyenne ratings_per_user
+        (beaucoup d'utilisateurs occasionnels, quelques gros noteurs)
+        """
+        mu = math.log(self.ratings_per_user) - RATING_COUNT_SIGMA ** 2 / 2
+        return max(1, min(self.series, int(rng.lognormvariate(mu, RATING_COUNT_SIGMA))))
+
+    def _genre_series(self):
+        """
+        Séries de chaque genre par popularité décroissante, avec leur sampler de Zipf
+        (mémoire proportionnelle au catalogue, pas au nombre de notes)
+        """
+        if self._by_genre is None:
+            by_genre = {}
+            for index in range(self.series):
+                for genre_index in self.series_genres(index):
+                    by_genre.setdefault(genre_index, []).append(index)
+            self._by_genre = {
+                genre_index: (indexes, ZipfSampler(len(indexes), self.zipf))
+                for genre_index, indexes in by_genre.items()
+            }
+        return self._by_genre
+
+    def user_genres(self, index):
+        """Genres préférés d'un utilisateur (1 à 3)"""
+        rng = self._rng('user-genres', index)
+        return self._sampler('genres', len(GENRES)).sample_distinct(rng, rng.randint(1, 3))
+
+    def iter_ratings(self, start=0, stop=None):
+        """
+        Notes des utilisateurs d'index [start, stop): une part GENRE_AFFINITY des séries
+        est tirée parmi les genres préférés de l'utilisateur (et mieux notée), le reste
+        selon la popularité globale
+        """
+        sampler = self._sampler('series', self.series)
+        by_genre = self._genre_series()
+        for index in self._range(start, stop, self.users):
+            rng = self._rng('ratings', index)
+            user_id = self.user_id(index)
+            favourites = [by_genre[g] for g in self.user_genres(index) if g in by_genre]
+            count = self.rating_count(rng)
+
+            seen = set()
+            tries = count * 20
+            while len(seen) < count and tries:
+                tries -= 1
+                if favourites and rng.random() < GENRE_AFFINITY:
+                    indexes, genre_sampler = rng.choice(favourites)
+                    series_index = indexes[genre_sampler.sample(rng)]
+                    bonus = FAVOURITE_BONUS
+                else:
+                    series_index = sampler.sample(rng)
+                    bonus = 0.0
+                if series_index in seen:
+                    continue
+                seen.add(series_index)
+
+                rating = round(self.quality(series_index) + bonus + rng.gauss(0, 1))
+                moment = EPOCH + timedelta(seconds=rng.randint(0, 4 * 365 * 86400))
+                yield {
+                    'user_id': user_id,
+                    'series_id': self.series_id(series_index),
+                    'rating': float(min(5, max(1, rating))),
+                    'date': moment.isoformat(),
+                    'timestamp': int((moment - UNIX_EPOCH).total_seconds()),
+                }
+
+    def __getstate__(self):
+        # Les samplers sont reconstruits dans chaque processus worker
+        state = dict(self.__dict__)
+        state['_samplers'] = {}
+        state['_by_genre'] = None
+        return state
+
+
+# ===== FICHIERS CSV (format lu par import_csv_data) =====
+
+# fichier -> (nom du fichier, colonnes, générateur, attribut donnant le nombre d'entités)
+CSV_FILES = {
+    'genres': ('genres.csv', ['genre_id', 'name'], 'iter_genres', None),
+    'series': ('series.csv', ['series_id', 'title', 'original_title', 'year', 'is_adult'], 'iter_series', 'series'),
+    'actors': ('actors.csv', ['actor_id', 'name', 'birth_year', 'death_year', 'professions', 'known_for_titles'], 'iter_actors', 'actors'),
+    'series_genres': ('series_genres.csv', ['series_id', 'genre_name'], 'iter_series_genres', 'series'),
+    'series_actors': ('series_actors.csv', ['series_id', 'actor_id'], 'iter_series_actors', 'series'),
+    'users': ('users.csv', ['user_id', 'name', 'email', 'age', 'gender', 'occupation', 'join_date'], 'iter_users', 'users'),
+    'ratings': ('ratings.csv', ['user_id', 'series_id', 'rating', 'date', 'timestamp'], 'iter_ratings', 'users'),
+}
+
+
+def csv_value(value):
+    """Valeur telle qu'attendue par csv_import (booléens en 0/1, None en vide)"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return value
+
+
+def write_part(graph, kind, start, stop, path):
+    """Écrire (sans en-tête) les lignes d'une plage d'index; renvoie le nombre de lignes"""
+    _, columns, method, _ = CSV_FILES[kind]
+    rows = getattr(graph, method)() if kind == 'genres' else getattr(graph, method)(start, stop)
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        for row in rows:
+            writer.writerow([csv_value(row[column]) for column in columns])
+            count += 1
+    return count
@@ -1,3 +1,1267 @@
-from django.test import TestCase
+import csv
+import functools
+import io
+import os
+import random
+import tempfile
+import time
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from recommendations import bulk_export, cache, csv_import
+from tv_recommender.neo4j_db import detached, neo4j_db
+
+
+def write_csv(directory, name, header, rows):
+    path = os.path.join(directory, name)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return path
+
+
+def read_csv(path):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        rows = list(csv.reader(f))
+    return rows[0], rows[1:]
+
+
+def property_names(header):
+    """Colonnes d'un en-tête neo4j-admin sans annotations (:ID, :int...) ni colonnes techniques"""
+    names = []
+    for column in header:
+        name = column.split(':', 1)[0]
+        if name:
+            names.append(name)
+    return names
+
+
+class BulkExportTests(SimpleTestCase):
+    """Fichiers neo4j-admin comparés aux lignes envoyées par import_csv_data"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        source = os.path.join(self.tmp.name, 'source')
+        os.makedirs(source)
+        self.output = os.path.join(self.tmp.name, 'output')
+        self.sources = {
+            'genres': write_csv(source, 'genres.csv', ['genre_id', 'name'], [
+                ['g1', 'Drama'], ['g2', 'Comedy'],
+            ]),
+            'actors': write_csv(source, 'actors.csv',
+                                ['actor_id', 'name', 'birth_year', 'death_year', 'professions', 'known_for_titles'], [
+                ['a1', 'Ann', '1970', '\\N', 'actress', ''],
+                ['a2', 'Bob', '', '', 'actor', 's1'],
+                ['', 'Sans identifiant', '', '', '', ''],
+            ]),
+            'series': write_csv(source, 'series.csv', ['series_id', 'title', 'original_title', 'year', 'is_adult'], [
+                ['s1', 'Un', 'One', '2001', '0'],
+                ['s2', 'Deux', '', '\\N', '1'],
+                ['s3', '', '', '', '0'],
+            ]),
+            'series_genres': write_csv(source, 'series_genres.csv', ['series_id', 'genre_name'], [
+                ['s1', 'Drama'], ['s2', 'Drama'], ['s2', 'Thriller'], ['s2', ''],
+            ]),
+            'series_actors': write_csv(source, 'series_actors.csv', ['series_id', 'actor_id'], [
+                ['s1', 'a1'], ['s2', 'a2'],
+            ]),
+            'users': write_csv(source, 'users.csv',
+                               ['user_id', 'name', 'email', 'age', 'gender', 'occupation', 'join_date'], [
+                ['u1', 'user1', 'u1@example.com', '30', 'F', 'artist', '2020-01-01'],
+                ['u2', 'user2', '', '', '', '', ''],
+            ]),
+            'ratings': write_csv(source, 'ratings.csv', ['user_id', 'series_id', 'rating', 'date', 'timestamp'], [
+                ['u1', 's1', '4.5', '2020-01-02T00:00:00', '1577923200'],
+                ['u1', 's2', 'abc', '', ''],
+                ['u1', 's2', '2', '', ''],
+            ]),
+        }
+
+    def test_row_counts_match_csv_import(self):
+        counts = bulk_export.export_all(self.sources, self.output)
+        for key, (target, parser) in bulk_export.SOURCES.items():
+            filename = (bulk_export.NODE_FILES.get(target) or bulk_export.RELATIONSHIP_FILES[target])[0]
+            imported = sum(1 for _ in csv_import.iter_rows(self.sources[key], parser))
+            _, rows = read_csv(os.path.join(self.output, filename))
+            self.assertEqual(len(rows), imported, filename)
+            self.assertEqual(counts[filename], imported, filename)
+
+        # Genres: genres.csv plus les noms vus seulement dans series_genres.csv
+        _, rows = read_csv(os.path.join(self.output, bulk_export.GENRE_FILE[0]))
+        self.assertEqual(sorted(row[0] for row in rows), ['Comedy', 'Drama', 'Thriller'])
+
+    def test_node_headers_match_imported_properties(self):
+        bulk_export.export_all(self.sources, self.output)
+        for key, (target, parser) in bulk_export.SOURCES.items():
+            if target not in bulk_export.NODE_FILES:
+                continue
+            filename, _, _ = bulk_export.NODE_FILES[target]
+            header, _ = read_csv(os.path.join(self.output, filename))
+            self.assertIn(f'ID({target})', header[0])
+            imported = next(csv_import.iter_rows(self.sources[key], parser))
+            self.assertEqual(property_names(header), list(imported), filename)
+
+    def test_relationship_headers_match_imported_rows(self):
+        bulk_export.export_all(self.sources, self.output)
+        ends = {'HAS_GENRE': ('Series', 'Genre'), 'HAS_ACTOR': ('Series', 'Actor'), 'RATED': ('User', 'Series')}
+        for key, (target, parser) in bulk_export.SOURCES.items():
+            if target not in bulk_export.RELATIONSHIP_FILES:
+                continue
+            filename, _, columns = bulk_export.RELATIONSHIP_FILES[target]
+            header, rows = read_csv(os.path.join(self.output, filename))
+            start, end = ends[target]
+            self.assertEqual(header[:2], [f':START_ID({start})', f':END_ID({end})'])
+            imported = list(csv_import.iter_rows(self.sources[key], parser))
+            self.assertEqual(columns, list(imported[0]), filename)
+            self.assertEqual(
+                [row[:2] for row in rows],
+                [[str(row[columns[0]]), str(row[columns[1]])] for row in imported],
+            )
+
+
+class FakeRecord:
+    def __init__(self, data):
+        self._data = data
+
+    def data(self):
+        return dict(self._data)
+
+
+class FakeTransaction:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def run(self, query, parameters=None):
+        self.calls.append(('run', id(self), query))
+        return [FakeRecord({'query': query})]
+
+    def close(self):
+        self.calls.append(('tx.close', id(self)))
+
+
+class FakeSession:
+    def __init__(self, calls, config):
+        self.calls = calls
+        self.config = config
+
+    def execute_read(self, work):
+        self.calls.append(('execute_read', id(self)))
+        return work(FakeTransaction(self.calls))
+
+    def execute_write(self, work):
+        self.calls.append(('execute_write', id(self)))
+        return work(FakeTransaction(self.calls))
+
+    def begin_transaction(self):
+        self.calls.append(('begin_transaction', id(self)))
+        return FakeTransaction(self.calls)
+
+    def run(self, query, parameters=None):
+        return FakeTransaction(self.calls).run(query, parameters)
+
+    def close(self):
+        self.calls.append(('session.close', id(self)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FakeDriver:
+    def __init__(self):
+        self.calls = []
+        self.sessions = []
+
+    def session(self, **config):
+        session = FakeSession(self.calls, config)
+        self.sessions.append(session)
+        return session
+
+
+class Neo4jConnectionTests(SimpleTestCase):
+    """Routage read/write vers execute_read/execute_write, sur un driver factice"""
+
+    def setUp(self):
+        self.driver = FakeDriver()
+        patcher = mock.patch.object(neo4j_db, '_driver', self.driver)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def kinds(self):
+        return [call[0] for call in self.driver.calls]
+
+    def test_read_uses_execute_read(self):
+        self.assertEqual(neo4j_db.read('RETURN 1'), [{'query': 'RETURN 1'}])
+        self.assertIn('execute_read', self.kinds())
+        self.assertNotIn('execute_write', self.kinds())
+
+    def test_write_uses_execute_write(self):
+        neo4j_db.write('CREATE (n)')
+        self.assertIn('execute_write', self.kinds())
+        self.assertNotIn('execute_read', self.kinds())
+
+    def test_reads_in_request_scope_reuse_transaction(self):
+        with neo4j_db.request_scope(read_transaction=True):
+            neo4j_db.read('RETURN 1')
+            neo4j_db.read('RETURN 2')
+            self.assertEqual(len(self.driver.sessions), 1)
+
+        self.assertEqual(self.kinds().count('begin_transaction'), 1)
+        self.assertNotIn('execute_read', self.kinds())
+        runs = [call for call in self.driver.calls if call[0] == 'run']
+        self.assertEqual(len(runs), 2)
+        self.assertEqual(runs[0][1], runs[1][1])
+        self.assertEqual(self.kinds()[-2:], ['tx.close', 'session.close'])
+
+    def test_write_in_read_scope_uses_dedicated_session(self):
+        with neo4j_db.request_scope(read_transaction=True):
+            neo4j_db.write('CREATE (n)')
+        self.assertEqual(len(self.driver.sessions), 2)
+        self.assertIn(('execute_write', id(self.driver.sessions[1])), self.driver.calls)
+
+    def test_reads_in_session_scope_share_session(self):
+        with neo4j_db.request_scope():
+            neo4j_db.read('RETURN 1')
+            neo4j_db.read('RETURN 2')
+        self.assertEqual(len(self.driver.sessions), 1)
+        self.assertEqual(self.kinds().count('execute_read'), 2)
+
+    def test_detached_ignores_request_scope(self):
+        with neo4j_db.request_scope():
+            detached(neo4j_db.read)('RETURN 1')
+        # Session de la requête + session propre à l'appel détaché
+        self.assertEqual(len(self.driver.sessions), 2)
+        self.assertIn(('execute_read', id(self.driver.sessions[1])), self.driver.calls)
+
+
+class RecommendationCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = cache.RecommendationCache()
+        self.cache._backend = cache.MemoryBackend(ttl=600, max_entries=100)
+
+    def test_stores_computed_value(self):
+        self.cache.get_or_compute('u1', 'genre', 10, lambda: [1, 2])
+        self.assertEqual(self.cache.get('u1', 'genre', 10), [1, 2])
+
+    def test_invalidation_during_compute_is_not_overwritten(self):
+        def compute():
+            # Notation pendant le calcul: la liste calculée est déjà périmée
+            self.cache.invalidate_user('u1')
+            return [1, 2]
+
+        self.assertEqual(self.cache.get_or_compute('u1', 'genre', 10, compute), [1, 2])
+        self.assertIsNone(self.cache.get('u1', 'genre', 10))
+        self.cache.get_or_compute('u1', 'genre', 10, lambda: [3])
+        self.assertEqual(self.cache.get('u1', 'genre', 10), [3])
+
+    def test_versions_are_bounded(self):
+        self.cache.config = dict(cache.DEFAULTS, MAX_ENTRIES=2)
+        for user_id in ('u1', 'u2', 'u3', 'u4'):
+            self.cache.invalidate_user(user_id)
+        self.assertEqual(list(self.cache.versions), ['u3', 'u4'])
+
+        self.cache.get_or_compute('u1', 'genre', 10, lambda: [1])
+        self.assertEqual(self.cache.get('u1', 'genre', 10), [1])
+
+    def test_pruned_invalidation_during_compute_is_not_overwritten(self):
+        self.cache.config = dict(cache.DEFAULTS, MAX_ENTRIES=2)
+
+        def compute():
+            # Invalidation de u1 aussitôt sortie de `versions` par u2 et u3
+            for user_id in ('u1', 'u2', 'u3'):
+                self.cache.invalidate_user(user_id)
+            return [1, 2]
+
+        self.cache.get_or_compute('u1', 'genre', 10, compute)
+        self.assertNotIn('u1', self.cache.versions)
+        self.assertIsNone(self.cache.get('u1', 'genre', 10))
+
+    def test_hit_and_miss_counters(self):
+        self.cache.get_or_compute('u1', 'genre', 10, lambda: [1])
+        self.cache.get_or_compute('u1', 'genre', 10, lambda: [1])
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+
+class FileBackendTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = directory.name
+        self.backend = cache.FileBackend(ttl=600, max_entries=3, location=self.location)
+
+    def keys_files(self):
+        return sorted(name for name in os.listdir(self.location) if name.endswith('.keys'))
+
+    def test_keys_are_listed_once(self):
+        for _ in range(5):
+            self.backend.set('u1', 'genre:10', [1])
+            self.backend.set('u1', 'collaborative:10', [2])
+        with open(self.backend._user_path('u1'), 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read().split(), ['genre:10', 'collaborative:10'])
+
+        self.backend.invalidate_user('u1')
+        self.assertIsNone(self.backend.get('u1', 'genre:10'))
+        self.assertEqual(self.keys_files(), [])
+
+    def test_keys_file_culled_with_last_entry(self):
+        now = time.time()
+        for age, user_id in enumerate(('u1', 'u2', 'u3')):
+            self.backend.set(user_id, 'genre:10', [1])
+            # Dates distinctes: u1 le plus ancien
+            for path in (self.backend._path(user_id, 'genre:10'), self.backend._user_path(user_id)):
+                os.utime(path, (now - 100 + age, now - 100 + age))
+        self.backend.set('u4', 'genre:10', [1])
+
+        self.assertEqual(len(self.backend), 3)
+        self.assertIsNone(self.backend.get('u1', 'genre:10'))
+        self.assertEqual(
+            self.keys_files(),
+            sorted(os.path.basename(self.backend._user_path(user_id)) for user_id in ('u2', 'u3', 'u4')),
+        )
+
+
+try:
+    from recommendations import sparse_cf
+except ImportError:  # numpy / scipy absents
+    sparse_cf = None
+
+
+@functools.lru_cache(maxsize=None)
+def neo4j_available():
+    """Neo4j joignable? Vérifié une seule fois, avec des délais courts (sans les reprises du driver)"""
+    from django.conf import settings
+    from neo4j import GraphDatabase
+    try:
+        with GraphDatabase.driver(
+            settings.NEO4J_BOLT_URL,
+            auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD),
+            connection_timeout=2.0,
+            connection_acquisition_timeout=2.0,
+        ) as driver:
+            driver.verify_connectivity()
+    except Exception:
+        return False
+    return True
+
+
+# (user_id, series_id, note): u1 aime s1 et s2, ses voisins u2..u4 aiment aussi s9, s8, s7
+CF_RATINGS = [
+    ('u1', 's1', 5), ('u1', 's2', 4),
+    ('u2', 's1', 5), ('u2', 's2', 5), ('u2', 's9', 5), ('u2', 's8', 4),
+    ('u3', 's1', 4), ('u3', 's9', 4), ('u3', 's7', 5),
+    ('u4', 's2', 5), ('u4', 's9', 5), ('u4', 's3', 2),
+    ('u5', 's3', 5), ('u5', 's7', 5),
+]
+
+
+@unittest.skipIf(sparse_cf is None, 'numpy/scipy non installés')
+class SparseCollaborativeTests(SimpleTestCase):
+
+    def engine(self, **kwargs):
+        matrix = sparse_cf.RatingMatrix.from_rows(CF_RATINGS)
+        return sparse_cf.SparseCollaborativeEngine(matrix, **kwargs)
+
+    def brute_force_item_scores(self, user_id, similarity):
+        likers = {}
+        for u, s, rating in CF_RATINGS:
+            if rating >= sparse_cf.LIKE_THRESHOLD:
+                likers.setdefault(s, set()).add(u)
+        own = [s for s, users in likers.items() if user_id in users]
+        rated = {s for u, s, _ in CF_RATINGS if u == user_id}
+        scores = {}
+        for j, users_j in likers.items():
+            if j in rated:
+                continue
+            total = 0.0
+            for i in own:
+                co = len(users_j & likers[i])
+                if similarity == 'cosine':
+                    total += co / (len(users_j) * len(likers[i])) ** 0.5
+                elif similarity == 'jaccard':
+                    total += co / (len(users_j) + len(likers[i]) - co)
+                else:
+                    total += co
+            if total > 0:
+                scores[j] = round(total, 3)
+        return scores
+
+    def test_item_mode_matches_pairwise_similarity(self):
+        for similarity in ('overlap', 'cosine', 'jaccard'):
+            recs = self.engine(mode='item', similarity=similarity).recommend('u1')
+            self.assertEqual(
+                {rec['series_id']: round(rec['recommended_by'], 3) for rec in recs},
+                self.brute_force_item_scores('u1', similarity),
+                similarity,
+            )
+
+    def test_item_similarity_is_bounded(self):
+        engine = self.engine(mode='item', similarity='cosine')
+        own = engine._own_items(engine.ratings.user_index['u1'])
+        scores, _ = engine._item_scores(own)
+        self.assertLessEqual(scores.max(), len(own))
+        self.assertGreaterEqual(scores.min(), 0)
+
+    def test_rated_and_liked_override_snapshot(self):
+        engine = self.engine()
+        # Série notée depuis l'instantané: exclue
+        recs = engine.recommend('u1', rated={'s1', 's2', 's9'}, liked={'s1', 's2'})
+        self.assertNotIn('s9', [rec['series_id'] for rec in recs])
+        # Utilisateur absent de l'instantané: voisins calculés depuis ses séries aimées
+        recs = engine.recommend('new-user', rated={'s1'}, liked={'s1'})
+        self.assertIn('s9', [rec['series_id'] for rec in recs])
+
+
+@unittest.skipIf(sparse_cf is None, 'numpy/scipy non installés')
+class SparseEngineRefreshTests(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch.multiple(sparse_cf, _engine=None, _engine_built_at=0.0, _rebuilding=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_expired_engine_is_rebuilt_in_background(self):
+        old, new = object(), object()
+        started = []
+
+        class Thread:
+            def __init__(self, target, args, **kwargs):
+                started.append((target, args))
+
+            def start(self):
+                pass
+
+        with mock.patch.object(sparse_cf.SparseCollaborativeEngine, 'from_neo4j', side_effect=[old, new]), \
+                mock.patch.object(sparse_cf.threading, 'Thread', Thread):
+            self.assertIs(sparse_cf.get_engine(max_age=3600), old)
+            # Expiré: ancien moteur servi, une seule reconstruction lancée
+            self.assertIs(sparse_cf.get_engine(max_age=-1), old)
+            self.assertIs(sparse_cf.get_engine(max_age=-1), old)
+            self.assertEqual(len(started), 1)
+
+            target, args = started[0]
+            target(*args)
+        self.assertIs(sparse_cf.get_engine(max_age=3600), new)
+
+
+@unittest.skipIf(sparse_cf is None, 'numpy/scipy non installés')
+class SparseCollaborativeCypherTests(SimpleTestCase):
+    """Backend 'sparse' (mode user, overlap) comparé à COLLABORATIVE_QUERY"""
+
+    PREFIX = 'test-cf-'
+
+    def setUp(self):
+        if not neo4j_available():
+            self.skipTest('Neo4j indisponible')
+        from recommendations.models import Rating, Series, User
+        from recommendations.seen import seen_sets
+
+        self.addCleanup(self.cleanup)
+        self.cleanup()
+        for user_id in sorted({u for u, _, _ in CF_RATINGS}):
+            User.bulk_create([{'user_id': self.PREFIX + user_id, 'name': user_id,
+                               'email': f'{user_id}@example.com'}])
+        Series.bulk_create([
+            {'series_id': self.PREFIX + s, 'title': self.PREFIX + s, 'original_title': self.PREFIX + s,
+             'year': 2000, 'is_adult': False}
+            for s in sorted({s for _, s, _ in CF_RATINGS})
+        ])
+        Rating.bulk_create([
+            {'user_id': self.PREFIX + u, 'series_id': self.PREFIX + s, 'rating': float(rating)}
+            for u, s, rating in CF_RATINGS
+        ])
+        seen_sets.clear()
+
+    def cleanup(self):
+        neo4j_db.write("""
+        MATCH (n)
+        WHERE (n:User AND n.user_id STARTS WITH $prefix) OR (n:Series AND n.series_id STARTS WITH $prefix)
+        DETACH DELETE n
+        """, {'prefix': self.PREFIX})
+
+    def test_user_mode_matches_cypher(self):
+        from recommendations.models import Recommendation
+
+        matrix = sparse_cf.RatingMatrix.from_rows(
+            (self.PREFIX + u, self.PREFIX + s, float(rating)) for u, s, rating in CF_RATINGS
+        )
+        engine = sparse_cf.SparseCollaborativeEngine(matrix, mode='user', similarity='overlap')
+        user_id = self.PREFIX + 'u1'
+
+        def rows(recs):
+            return sorted((rec['series_id'], rec['recommended_by'], rec['avg_rating']) for rec in recs)
+
+        expected = neo4j_db.read(Recommendation.COLLABORATIVE_QUERY, Recommendation._params(user_id, 10))
+        self.assertTrue(expected)
+        self.assertEqual(rows(engine.recommend(user_id, 10)), rows(expected))
+
+
+try:
+    from recommendations import ann
+except ImportError:  # numpy / scipy absents
+    ann = None
+
+
+@unittest.skipIf(ann is None, 'numpy/scipy non installés')
+class AnnIndexTests(SimpleTestCase):
+
+    def build_index(self, adult):
+        import numpy as np
+        ids = [f's{i}' for i in range(6)]
+        # s0 est le plus proche de la requête, puis s1, s2...
+        vectors = np.array([[1.0, 0.1 * i] for i in range(6)], dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return ann.IVFIndex.build(ids, vectors, nlist=1, adult=adult), vectors[0]
+
+    def test_adult_series_are_skipped_before_top_k(self):
+        index, query = self.build_index([True, True, False, False, False, False])
+        self.assertEqual([series_id for series_id, _ in index.search(query, 2)], ['s2', 's3'])
+
+    def test_adult_mask_survives_save_and_load(self):
+        index, query = self.build_index([False, True, False, False, False, False])
+        with tempfile.TemporaryDirectory() as path:
+            index.save(path)
+            loaded = ann.IVFIndex.load(path, mmap=False)
+            self.assertEqual([series_id for series_id, _ in loaded.search(query, 2)], ['s0', 's2'])
+
+    def test_describe_top_widens_search_for_unmasked_adult_series(self):
+        index, query = self.build_index(None)
+
+        def describe_scored(hits):
+            return [{'series_id': series_id} for series_id, _ in hits if series_id not in {'s0', 's1'}]
+
+        with mock.patch('recommendations.models.Series.describe_scored', side_effect=describe_scored):
+            recs = ann._describe_top(index, query, 2, set())
+        self.assertEqual([rec['series_id'] for rec in recs], ['s2', 's3'])
+
+
+try:
+    from recommendations import als
+except ImportError:  # numpy / scipy absents
+    als = None
+
+
+@unittest.skipIf(als is None, 'numpy/scipy non installés')
+class ALSModelTests(SimpleTestCase):
+
+    def build_model(self, adult):
+        import numpy as np
+        # Score prédit de s{i} = 5 - i pour l'utilisateur u1
+        items = np.array([[5.0 - i] for i in range(6)], dtype=np.float32)
+        users = np.array([[1.0]], dtype=np.float32)
+        return als.ALSModel(users, items, ['u1'], [f's{i}' for i in range(6)], {}, adult=adult)
+
+    def test_adult_series_are_skipped_before_top_k(self):
+        model = self.build_model([True, False, True, False, False, False])
+        hits = model.recommend('u1', {'s1': 5.0}, k=2)
+        self.assertEqual([series_id for series_id, _ in hits], ['s3', 's4'])
+
+    def test_adult_mask_survives_save_and_load(self):
+        model = self.build_model([True, False, False, False, False, False])
+        with tempfile.TemporaryDirectory() as path:
+            model.save(path)
+            loaded = als.ALSModel.load(path, mmap=False)
+            self.assertEqual([series_id for series_id, _ in loaded.recommend('u1', {}, k=2)], ['s1', 's2'])
+
+    def test_recommend_for_user_widens_top_for_unmasked_adult_series(self):
+        model = self.build_model(None)
+
+        def describe_scored(hits):
+            return [{'series_id': series_id} for series_id, _ in hits if series_id not in {'s0', 's1'}]
+
+        with mock.patch.object(als, 'get_model', return_value=model), \
+                mock.patch('recommendations.models.Rating.get_user_rating_values', return_value={}), \
+                mock.patch('recommendations.models.Series.describe_scored', side_effect=describe_scored):
+            recs = als.recommend_for_user('u1', 2)
+        self.assertEqual([rec['series_id'] for rec in recs], ['s2', 's3'])
+
+
+def slow_source(user_id, limit):
+    time.sleep(0.3)
+    return [{'series_id': f'{user_id}-slow', 'score': 1.0}]
+
+
+class HybridPipelineTests(SimpleTestCase):
+
+    def test_sources_all_start_immediately(self):
+        from recommendations import pipeline
+        # Plus de sources que l'ancien pool global (8): aucune n'attend en file
+        sources = {f'{__name__}.slow_source': 1.0}
+        sources.update({f'{__name__}.slow_source#{i}': 1.0 for i in range(9)})
+        with mock.patch.object(pipeline, '_source_function', return_value=slow_source):
+            candidates = pipeline.generate_candidates('u1', sources, 10, timeout=0.5)
+        self.assertEqual(set(candidates), set(sources))
+
+    def test_failing_source_is_logged_and_dropped(self):
+        from recommendations import pipeline
+
+        def working(user_id, limit):
+            return [{'series_id': 's1', 'score': 1.0}]
+
+        def broken(user_id, limit):
+            raise RuntimeError('modèle absent')
+
+        with mock.patch.object(pipeline, '_source_function', side_effect=[working, broken]), \
+                self.assertLogs('recommendations.pipeline', 'ERROR') as logs:
+            candidates = pipeline.generate_candidates('u1', {'ok': 1.0, 'broken': 1.0}, 10, timeout=1.0)
+        self.assertEqual(list(candidates), ['ok'])
+        self.assertIn('modèle absent', '\n'.join(logs.output))
+
+    def test_invalid_source_path_drops_only_that_source(self):
+        from recommendations import pipeline
+        sources = {f'{__name__}.slow_source': 1.0, f'{__name__}.missing_source': 1.0}
+        with self.assertLogs('recommendations.pipeline', 'ERROR'):
+            candidates = pipeline.generate_candidates('u1', sources, 10, timeout=1.0)
+        self.assertEqual(list(candidates), [f'{__name__}.slow_source'])
+
+
+class AutocompleteTests(SimpleTestCase):
+
+    def entries(self):
+        from recommendations import autocomplete
+        return [
+            {'type': 'series', 'id': 's1', 'label': 'The Office', 'year': 2005, 'popularity': 10,
+             'keys': autocomplete.prefix_keys('The Office'), 'actors': ['a1']},
+            {'type': 'series', 'id': 's2', 'label': 'The Wire', 'year': 2002, 'popularity': 9,
+             'keys': autocomplete.prefix_keys('The Wire'), 'actors': []},
+            {'type': 'actor', 'id': 'a1', 'label': 'Steve Carell', 'year': None, 'popularity': 10,
+             'keys': autocomplete.prefix_keys('Steve Carell')},
+        ]
+
+    def setUp(self):
+        from recommendations import autocomplete
+        self.autocomplete = autocomplete
+        patcher = mock.patch.multiple(autocomplete, _index=None, _pending=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rating_changes_update_popularity_and_hot_prefixes(self):
+        index = self.autocomplete.PrefixIndex.build(self.entries(), hot_prefix_size=0)
+        self.autocomplete._index = index
+        self.assertEqual([e['id'] for e in index.search('the')], ['s1', 's2'])
+
+        for _ in range(2):
+            self.autocomplete.rating_changed('s1', -1)
+        self.assertEqual([e['id'] for e in index.search('the')], ['s2', 's1'])
+        self.assertEqual(index.search('steve')[0]['popularity'], 8)
+        self.assertNotIn('actors', index.search('the')[0])
+
+    def test_changes_during_rebuild_are_replayed(self):
+        old = self.autocomplete.PrefixIndex.build(self.entries())
+        self.autocomplete._index = old
+        build_index = self.autocomplete.build_index
+
+        def after_read(entries):
+            # Note et nouvelle série reçues après la lecture depuis Neo4j
+            self.autocomplete.rating_changed('s2', 5)
+            self.autocomplete.series_saved({'series_id': 's3', 'title': 'The Crown', 'year': 2016})
+            return build_index(entries)
+
+        with mock.patch.object(self.autocomplete, 'load_entries', side_effect=self.entries), \
+                mock.patch.object(self.autocomplete, 'build_index', side_effect=after_read):
+            self.assertTrue(self.autocomplete.rebuild())
+        self.assertIsNot(self.autocomplete._index, old)
+        results = self.autocomplete.complete('the')
+        self.assertEqual(results[0]['id'], 's2')
+        self.assertEqual(results[0]['popularity'], 14)
+        self.assertIn('s3', [e['id'] for e in results])
+
+    def test_ratings_read_during_rebuild_are_not_counted_twice(self):
+        self.autocomplete._index = self.autocomplete.PrefixIndex.build(self.entries())
+
+        def load_entries():
+            # Note reçue pendant la lecture, déjà comptée dans la popularité lue
+            self.autocomplete.rating_changed('s2', 5)
+            self.autocomplete.series_saved({'series_id': 's3', 'title': 'The Crown', 'year': 2016})
+            entries = self.entries()
+            entries[1]['popularity'] += 5
+            return entries
+
+        with mock.patch.object(self.autocomplete, 'load_entries', side_effect=load_entries):
+            self.assertTrue(self.autocomplete.rebuild())
+        results = self.autocomplete.complete('the')
+        self.assertEqual([(e['id'], e['popularity']) for e in results[:2]], [('s2', 14), ('s1', 10)])
+        self.assertIn('s3', [e['id'] for e in results])
+
+    def test_complete_does_not_build_in_the_request(self):
+        with mock.patch.object(self.autocomplete, 'preload') as preload, \
+                mock.patch.object(self.autocomplete, 'build_index') as build_index:
+            self.assertEqual(self.autocomplete.complete('the'), [])
+        preload.assert_called_once_with()
+        build_index.assert_not_called()
+
+
+class DeleteAggregatesTests(SimpleTestCase):
+    """User.delete / Series.delete retirent les notes des agrégats (comme Rating.delete)"""
+
+    PREFIX = 'test-agg-'
+
+    def setUp(self):
+        if not neo4j_available():
+            self.skipTest('Neo4j indisponible')
+        from recommendations.models import Rating, Series, User
+
+        self.addCleanup(self.cleanup)
+        self.cleanup()
+        for user_id in ('a', 'b'):
+            User.create(self.PREFIX + user_id, user_id, f'{user_id}@example.com')
+        for series_id in ('x', 'y'):
+            Series.create(self.PREFIX + series_id, series_id, series_id, 2000)
+        for user_id, series_id, rating in (('a', 'x', 5), ('b', 'x', 3), ('a', 'y', 4), ('b', 'y', 4)):
+            Rating.create(self.PREFIX + user_id, self.PREFIX + series_id, rating)
+
+    def cleanup(self):
+        neo4j_db.write("""
+        MATCH (n)
+        WHERE (n:User AND n.user_id STARTS WITH $prefix) OR (n:Series AND n.series_id STARTS WITH $prefix)
+        DETACH DELETE n
+        """, {'prefix': self.PREFIX})
+
+    def test_user_delete_updates_series_aggregates(self):
+        from recommendations.models import Rating, User
+
+        self.assertTrue(User.delete(self.PREFIX + 'a'))
+        average = Rating.get_average_rating(self.PREFIX + 'x')
+        self.assertEqual(average['total_ratings'], 1)
+        self.assertEqual(average['average_rating'], 3.0)
+        self.assertEqual(average['histogram'], [0, 0, 1, 0, 0])
+
+    def test_series_delete_updates_user_aggregates(self):
+        from recommendations.models import Series
+
+        self.assertTrue(Series.delete(self.PREFIX + 'x'))
+        rows = neo4j_db.read(
+            'MATCH (u:User) WHERE u.user_id STARTS WITH $prefix RETURN u.user_id as user_id, u.rating_count as count',
+            {'prefix': self.PREFIX},
+        )
+        self.assertEqual({row['user_id']: row['count'] for row in rows},
+                         {self.PREFIX + 'a': 1, self.PREFIX + 'b': 1})
+
+
+# Requêtes d'avant la réécriture en compréhensions de motifs / COLLECT { } (OPTIONAL
+# MATCH enchaînés puis COLLECT DISTINCT); `$seen` remplace `NOT (u)-[:RATED]->(rec)`
+OLD_GET_QUERY = """
+    MATCH (s:Series {series_id: $series_id})
+    OPTIONAL MATCH (s)-[:HAS_GENRE]->(g:Genre)
+    OPTIONAL MATCH (s)-[:HAS_ACTOR]->(a:Actor)
+    RETURN s.series_id as series_id, s.title as title, s.original_title as original_title,
+           s.year as year, s.is_adult as is_adult,
+           COLLECT(DISTINCT g.name) as genres,
+           COLLECT(DISTINCT {actor_id: a.actor_id, name: a.name}) as actors
+    """
+
+OLD_GET_BY_TITLE_QUERY = """
+    MATCH (s:Series)
+    WHERE s.title = $title OR s.original_title = $title
+    OPTIONAL MATCH (s)-[:HAS_GENRE]->(g:Genre)
+    OPTIONAL MATCH (s)-[:HAS_ACTOR]->(a:Actor)
+    RETURN s.series_id as series_id, s.title as title, s.original_title as original_title,
+           s.year as year,
+           COLLECT(DISTINCT g.name) as genres,
+           COLLECT(DISTINCT {actor_id: a.actor_id, name: a.name}) as actors
+    """
+
+OLD_USER_RATINGS_QUERY = """
+    MATCH (u:User {user_id: $user_id})-[r:RATED]->(s:Series)
+    OPTIONAL MATCH (s)-[:HAS_GENRE]->(g:Genre)
+    RETURN s.series_id as series_id, s.title as series_title, s.year as year,
+           r.rating as rating, r.date as date, r.timestamp as timestamp,
+           COLLECT(DISTINCT g.name) as genres
+    ORDER BY r.timestamp DESC
+    """
+
+OLD_USER_STATISTICS_QUERY = """
+    MATCH (u:User {user_id: $user_id})-[r:RATED]->(s:Series)-[:HAS_GENRE]->(g:Genre)
+    WITH u, COUNT(DISTINCT s) as series_count, AVG(r.rating) as avg_rating,
+         COLLECT(DISTINCT g.name) as all_genres
+    RETURN u.user_id as user_id, u.name as username, series_count,
+           ROUND(avg_rating * 10) / 10.0 as avg_rating, all_genres as genres
+    """
+
+OLD_COLLABORATIVE_QUERY = """
+    MATCH (u:User {user_id: $user_id})-[r1:RATED]->(s:Series)<-[r2:RATED]-(other:User)
+    WHERE r1.rating >= 4 AND r2.rating >= 4 AND u <> other
+    WITH other, COUNT(s) as common_series
+    ORDER BY common_series DESC
+    LIMIT 5
+    MATCH (other)-[r:RATED]->(rec:Series)
+    WHERE NOT rec.series_id IN $seen AND r.rating >= 4 AND rec.is_adult = false
+    WITH rec, COUNT(DISTINCT other) as recommended_by, AVG(r.rating) as avg_rating
+    OPTIONAL MATCH (rec)-[:HAS_GENRE]->(g:Genre)
+    RETURN rec.series_id as series_id, rec.title as title, rec.year as year,
+           COLLECT(DISTINCT g.name) as genres,
+           recommended_by, ROUND(avg_rating * 10) / 10.0 as avg_rating
+    ORDER BY recommended_by DESC, avg_rating DESC
+    LIMIT $limit
+    """
+
+OLD_BY_ACTORS_QUERY = """
+    MATCH (u:User {user_id: $user_id})-[r:RATED]->(s:Series)-[:HAS_ACTOR]->(a:Actor)
+    WHERE r.rating >= 4
+    WITH COLLECT(DISTINCT a) as favorite_actors
+    UNWIND favorite_actors as actor
+    MATCH (actor)<-[:HAS_ACTOR]-(rec:Series)
+    WHERE NOT rec.series_id IN $seen AND rec.is_adult = false
+    WITH rec, COLLECT(DISTINCT actor.name) as shared_actors, COUNT(actor) as actor_matches
+    OPTIONAL MATCH (rec)-[:HAS_GENRE]->(g:Genre)
+    RETURN rec.series_id as series_id, rec.title as title, rec.year as year,
+           shared_actors, COLLECT(DISTINCT g.name) as genres, actor_matches as score
+    ORDER BY actor_matches DESC
+    LIMIT $limit
+    """
+
+
+def canonical(rows):
+    """Lignes comparables: listes triées (l'ordre des COLLECT n'est pas garanti), lignes triées"""
+    def value(v):
+        if isinstance(v, list):
+            return sorted((value(item) for item in v), key=repr)
+        if isinstance(v, dict):
+            return {k: value(item) for k, item in v.items()}
+        return v
+    return sorted((value(row) for row in rows), key=lambda row: repr(sorted(row.items())))
+
+
+class QueryRewriteTests(SimpleTestCase):
+    """Les requêtes réécrites renvoient les mêmes lignes que les OPTIONAL MATCH d'avant"""
+
+    PREFIX = 'test-qr-'
+    SERIES = {
+        # series_id: (genres, acteurs)
+        's1': (['Drama', 'Comedy'], ['a1', 'a2', 'a3']),
+        's2': (['Drama'], ['a1']),
+        's3': (['Comedy', 'Crime'], ['a2', 'a3']),
+        's4': (['Drama', 'Crime', 'Comedy'], ['a3']),
+        's5': ([], ['a1', 'a2']),
+    }
+    RATINGS = [
+        ('u1', 's1', 5), ('u1', 's2', 4),
+        ('u2', 's1', 5), ('u2', 's3', 5), ('u2', 's4', 4), ('u2', 's5', 4),
+        ('u3', 's2', 4), ('u3', 's4', 5), ('u3', 's3', 2),
+    ]
+
+    def setUp(self):
+        if not neo4j_available():
+            self.skipTest('Neo4j indisponible')
+        from recommendations.models import Actor, Genre, Rating, Series, User
+
+        self.addCleanup(self.cleanup)
+        self.cleanup()
+        for user_id in ('u1', 'u2', 'u3'):
+            User.create(self.id_(user_id), user_id, f'{user_id}@example.com')
+        for actor_id in ('a1', 'a2', 'a3'):
+            Actor.create(self.id_(actor_id), self.id_(actor_id))
+        for series_id, (genres, actors) in self.SERIES.items():
+            Series.create(self.id_(series_id), self.id_(series_id), self.id_(series_id) + '-vo', 2000)
+            for genre in genres:
+                Genre.link_to_series(self.id_(series_id), self.id_(genre))
+            for actor_id in actors:
+                Actor.link_to_series(self.id_(series_id), self.id_(actor_id))
+        for user_id, series_id, rating in self.RATINGS:
+            Rating.create(self.id_(user_id), self.id_(series_id), rating)
+
+    def id_(self, name):
+        return self.PREFIX + name
+
+    def cleanup(self):
+        neo4j_db.write("""
+        MATCH (n)
+        WHERE (n:User AND n.user_id STARTS WITH $prefix) OR (n:Series AND n.series_id STARTS WITH $prefix)
+           OR (n:Actor AND n.actor_id STARTS WITH $prefix) OR (n:Genre AND n.name STARTS WITH $prefix)
+        DETACH DELETE n
+        """, {'prefix': self.PREFIX})
+
+    def assertSameRows(self, new, old):
+        self.assertTrue(old)
+        self.assertEqual(canonical(new), canonical(old))
+
+    def test_series_lookups(self):
+        from recommendations.models import Series
+        for series_id in self.SERIES:
+            self.assertSameRows(
+                [Series.get(self.id_(series_id))],
+                neo4j_db.read(OLD_GET_QUERY, {'series_id': self.id_(series_id)}),
+            )
+            for title in (self.id_(series_id), self.id_(series_id) + '-vo'):
+                self.assertSameRows(
+                    [Series.get_by_title(title)],
+                    neo4j_db.read(OLD_GET_BY_TITLE_QUERY, {'title': title}),
+                )
+
+    def test_user_ratings(self):
+        from recommendations.models import Rating
+        for user_id in ('u1', 'u2', 'u3'):
+            self.assertSameRows(
+                Rating.get_user_ratings(self.id_(user_id)),
+                neo4j_db.read(OLD_USER_RATINGS_QUERY, {'user_id': self.id_(user_id)}),
+            )
+
+    def test_user_statistics(self):
+        from recommendations.models import Rating
+        for user_id in ('u1', 'u2', 'u3'):
+            new = Rating.get_user_statistics(self.id_(user_id))
+            old = neo4j_db.read(OLD_USER_STATISTICS_QUERY, {'user_id': self.id_(user_id)})[0]
+            self.assertEqual(sorted(new['genres']), sorted(old['genres']))
+            # Différence voulue: moyenne sur les notes (et non sur les couples note × genre),
+            # séries sans genre comprises
+            ratings = [rating for u, _, rating in self.RATINGS if u == user_id]
+            self.assertEqual(new['series_count'], len(ratings))
+            self.assertEqual(new['avg_rating'], round(sum(ratings) / len(ratings), 1))
+
+    def test_strategies(self):
+        from recommendations.models import Recommendation
+        for user_id in ('u1', 'u2', 'u3'):
+            params = Recommendation._params(self.id_(user_id), 10)
+            self.assertEqual(
+                canonical(neo4j_db.read(Recommendation.COLLABORATIVE_QUERY, params)),
+                canonical(neo4j_db.read(OLD_COLLABORATIVE_QUERY, params)),
+            )
+            new = neo4j_db.read(Recommendation.BY_ACTORS_QUERY, params)
+            old = neo4j_db.read(OLD_BY_ACTORS_QUERY, params)
+            # Au plus trois acteurs partagés dans la fixture: shared_actors[..5] = liste complète
+            self.assertEqual(canonical(new), canonical(old))
+
+
+class QueryScalingTests(SimpleTestCase):
+    """db hits (PROFILE) linéaires en genres + acteurs, et non en genres × acteurs"""
+
+    def setUp(self):
+        if not neo4j_available():
+            self.skipTest('Neo4j indisponible')
+
+    def test_db_hits_grow_linearly(self):
+        from recommendations import benchmark
+
+        results = benchmark.scaling_check(neo4j_db)
+        self.assertTrue(results)
+        for name, stats in results.items():
+            with self.subTest(name):
+                self.assertTrue(stats['linear'], f"{name}: croissance {stats['growth']}x, {stats['db_hits']}")
+
+
+class GenreIndexTopTests(SimpleTestCase):
+    """Algorithme à seuil comparé à la somme pondérée calculée sur toutes les séries"""
+
+    GENRES = ['Drama', 'Comedy', 'Crime', 'Documentary', 'Animation', 'Horror']
+
+    def setUp(self):
+        from recommendations.genre_index import GenreIndex
+        rng = random.Random(7)
+        rows = [
+            {
+                'series_id': f's{i}',
+                'title': f's{i}',
+                'genres': rng.sample(self.GENRES, rng.randint(1, 3)),
+                # Popularité très inégale: le parcours doit s'arrêter tôt
+                'rating_count': int(rng.paretovariate(1.2) * 10),
+            }
+            for i in range(300)
+        ]
+        # Ex aequo: mêmes genres, même nombre de notes
+        for i in range(5):
+            rows.append({'series_id': f'tie{i}', 'title': f'tie{i}',
+                         'genres': ['Drama', 'Crime'], 'rating_count': 5000})
+        self.index = GenreIndex(rows)
+        self.weights = {'Drama': 3, 'Crime': 2, 'Horror': 1, 'Western': 4, 'Comedy': 0}
+
+    def brute_force(self, weights, limit, exclude=()):
+        scored = []
+        for i, row in enumerate(self.index.rows):
+            total = sum(weights.get(genre, 0) for genre in row['genres'])
+            if total > 0 and row['series_id'] not in exclude:
+                scored.append((-self.index.popularity[i] * total, i))
+        return [(i, -negative) for negative, i in sorted(scored)[:limit]]
+
+    def assertSameTop(self, weights, limit, exclude=()):
+        hits, reads = self.index.top(weights, limit, exclude=exclude)
+        expected = self.brute_force(weights, limit, exclude)
+        self.assertEqual([i for i, _ in hits], [i for i, _ in expected])
+        for (_, score), (_, expected_score) in zip(hits, expected):
+            self.assertAlmostEqual(score, expected_score)
+        return hits, reads
+
+    def test_matches_brute_force(self):
+        for limit in (1, 3, 10, 50):
+            with self.subTest(limit=limit):
+                hits, _ = self.assertSameTop(self.weights, limit)
+                self.assertEqual(len(hits), limit)
+
+    def test_stops_before_reading_whole_lists(self):
+        _, reads = self.assertSameTop(self.weights, 10)
+        total = sum(len(self.index.by_genre[genre]) for genre, weight in self.weights.items()
+                    if weight > 0 and genre in self.index.by_genre)
+        self.assertLess(reads, total // 2)
+
+    def test_ties_keep_index_order(self):
+        hits, _ = self.assertSameTop({'Drama': 1, 'Crime': 1}, 3)
+        self.assertEqual([self.index.series_ids[i] for i, _ in hits], ['tie0', 'tie1', 'tie2'])
+
+    def test_exclude(self):
+        exclude = {'tie0', 'tie2'} | {f's{i}' for i in range(0, 300, 2)}
+        hits, _ = self.assertSameTop(self.weights, 10, exclude=exclude)
+        self.assertFalse({self.index.series_ids[i] for i, _ in hits} & exclude)
+
+    def test_limit_beyond_candidates(self):
+        weights = {'Horror': 1}
+        hits, reads = self.assertSameTop(weights, 1000)
+        self.assertEqual(len(hits), len(self.index.by_genre['Horror']))
+        self.assertEqual(reads, len(self.index.by_genre['Horror']))
+
+    def test_no_weight_or_limit(self):
+        self.assertEqual(self.index.top({}, 10), ([], 0))
+        self.assertEqual(self.index.top({'Western': 2, 'Comedy': 0}, 10), ([], 0))
+        self.assertEqual(self.index.top(self.weights, 0), ([], 0))
+
+
+class GenreIndexRefreshTests(SimpleTestCase):
+
+    def setUp(self):
+        from recommendations import genre_index
+        self.genre_index = genre_index
+        patcher = mock.patch.multiple(
+            genre_index, _index=None, _index_built_at=0.0, _stale=False, _rebuilding=False
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def snapshot(self, rating_count):
+        return self.genre_index.GenreIndex([
+            {'series_id': 's1', 'title': 's1', 'genres': ['Drama'], 'rating_count': rating_count},
+        ])
+
+    def test_write_triggers_background_rebuild_serving_old_snapshot(self):
+        old, new = self.snapshot(1), self.snapshot(100)
+        started = []
+
+        class Thread:
+            def __init__(self, target, **kwargs):
+                started.append(target)
+
+            def start(self):
+                pass
+
+        with mock.patch.object(self.genre_index.GenreIndex, 'from_neo4j', side_effect=[old, new]), \
+                mock.patch.object(self.genre_index.threading, 'Thread', Thread):
+            self.assertIs(self.genre_index.get_index(), old)
+            self.assertIs(self.genre_index.get_index(), old)
+            self.assertEqual(started, [])
+
+            self.genre_index.mark_stale()
+            # Reconstruction lancée en tâche de fond, ancien instantané servi
+            self.assertIs(self.genre_index.get_index(), old)
+            self.assertIs(self.genre_index.get_index(), old)
+            self.assertEqual(len(started), 1)
+
+            started[0]()
+        self.assertIs(self.genre_index.get_index(), new)
+
+    def test_refresh_interval_limits_rebuilds(self):
+        with mock.patch.object(self.genre_index.GenreIndex, 'from_neo4j', return_value=self.snapshot(1)), \
+                mock.patch.object(self.genre_index.threading, 'Thread') as thread:
+            self.genre_index.get_index(refresh_interval=60)
+            self.genre_index.mark_stale()
+            self.genre_index.get_index(refresh_interval=60)
+        thread.assert_not_called()
+
+
+class ImportRatingsResumeTests(SimpleTestCase):
+    """Recalcul des agrégats et séries à recalculer après une reprise (--resume)"""
+
+    RATINGS = [('u1', 's1', 5), ('u2', 's2', 4), ('u3', 's3', 3), ('u4', 's4', 2)]
+
+    def setUp(self):
+        from recommendations.management.commands import import_csv_data
+        self.module = import_csv_data
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = write_csv(directory.name, 'ratings.csv', ['user_id', 'series_id', 'rating'], self.RATINGS)
+        self.checkpoint_path = os.path.join(directory.name, 'checkpoint.json')
+
+    def command(self, resume):
+        command = self.module.Command(stdout=io.StringIO())
+        command.batch_size = 2
+        command.workers = 1
+        command.resume = resume
+        command.checkpoint = csv_import.Checkpoint(self.checkpoint_path)
+        return command
+
+    def import_ratings(self, resume, bulk_create=None, repair=None):
+        with mock.patch.object(self.module.Rating, 'bulk_create', side_effect=bulk_create), \
+                mock.patch.object(self.module.Rating, 'repair_aggregates', side_effect=repair) as repaired, \
+                mock.patch.object(self.module.Similarity, 'mark_stale') as mark_stale:
+            try:
+                self.command(resume).import_ratings(self.path)
+            except self.module.CommandError:
+                pass
+        return repaired, mark_stale
+
+    def stage_done(self):
+        key = csv_import.Checkpoint.key('ratings', self.path)
+        return csv_import.Checkpoint(self.checkpoint_path).get(key)['done']
+
+    def test_failed_repair_is_rerun_on_resume(self):
+        repaired, _ = self.import_ratings(False, repair=RuntimeError('coupure'))
+        repaired.assert_called_once()
+        self.assertFalse(self.stage_done())
+
+        repaired, mark_stale = self.import_ratings(True)
+        repaired.assert_called_once()
+        self.assertEqual(mark_stale.call_args[0][0], ['s1', 's2', 's3', 's4'])
+        self.assertTrue(self.stage_done())
+
+    def test_series_before_interruption_are_marked_stale(self):
+        # Deuxième lot en échec: seules s1 et s2 sont écrites
+        _, mark_stale = self.import_ratings(False, bulk_create=[None, RuntimeError('coupure')])
+        mark_stale.assert_not_called()
+
+        repaired, mark_stale = self.import_ratings(True)
+        repaired.assert_called_once()
+        self.assertEqual(mark_stale.call_args[0][0], ['s1', 's2', 's3', 's4'])
+
+
+class SeenSetTests(SimpleTestCase):
+    """Tableau trié puis bitset, sur une table d'internement propre au test"""
+
+    def setUp(self):
+        from recommendations import seen
+        self.positions = seen.SeriesPositions()
+        for i in range(100):
+            self.positions.intern(f's{i}')
+        self.SeenSet = seen.SeenSet
+
+    def test_switches_to_bitset_when_dense(self):
+        seen_set = self.SeenSet(['s10', 's3', 's42'], positions=self.positions)
+        self.assertIsNotNone(seen_set.sorted)
+        self.assertIsNone(seen_set.bits)
+        self.assertEqual(list(seen_set.sorted), [3, 10, 42])
+
+        # 4 * 32 octets > 100 séries connues: le bitset devient moins coûteux
+        seen_set.add('s7')
+        self.assertIsNone(seen_set.sorted)
+        self.assertIsNotNone(seen_set.bits)
+        self.assertEqual(seen_set.ids(), ['s3', 's7', 's10', 's42'])
+        self.assertEqual(len(seen_set), 4)
+
+    def test_add_discard_and_membership(self):
+        for series_ids in (['s1', 's2'], ['s1', 's2', 's3', 's4', 's5']):
+            seen_set = self.SeenSet(series_ids, positions=self.positions)
+            with self.subTest(bitset=seen_set.bits is not None):
+                seen_set.add('s1')
+                self.assertEqual(len(seen_set), len(series_ids))
+                self.assertIn('s1', seen_set)
+                self.assertNotIn('s50', seen_set)
+                self.assertNotIn('inconnue', seen_set)
+
+                seen_set.discard('s1')
+                seen_set.discard('s1')
+                seen_set.discard('inconnue')
+                self.assertNotIn('s1', seen_set)
+                self.assertEqual(len(seen_set), len(series_ids) - 1)
+                self.assertEqual(seen_set.ids(), series_ids[1:])
+
+    def test_bitset_grows_with_catalogue(self):
+        seen_set = self.SeenSet([f's{i}' for i in range(10)], positions=self.positions)
+        self.assertIsNotNone(seen_set.bits)
+        for i in range(100, 110):
+            self.positions.intern(f's{i}')
+        seen_set.add('nouvelle')
+        self.assertIn('nouvelle', seen_set)
+        self.assertEqual(seen_set.ids()[-1], 'nouvelle')
+        self.assertEqual(len(seen_set), 11)
+
+
+class SeenSetsTests(SimpleTestCase):
+    """LRU, mises à jour incrémentales et rechargements (Neo4j simulé)"""
+
+    def setUp(self):
+        from recommendations import models, seen
+        self.models = models
+        self.seen_sets = seen.SeenSets()
+        self.seen_sets.config = dict(seen.DEFAULTS, MAX_USERS=2)
+        patcher = mock.patch.object(models, 'seen_sets', self.seen_sets)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.ratings = {
+            'u1': [{'series_id': 's1', 'rating': 5}, {'series_id': 's2', 'rating': 2}],
+            'u2': [{'series_id': 's3', 'rating': 4}],
+            'u3': [],
+        }
+
+    def read(self, query, params):
+        return self.ratings[params['user_id']]
+
+    def test_loads_once_then_serves_from_memory(self):
+        with mock.patch.object(neo4j_db, 'read', side_effect=self.read) as read:
+            seen = self.seen_sets.get('u1')
+            self.assertIs(self.seen_sets.get('u1'), seen)
+        read.assert_called_once()
+        self.assertEqual(seen.rated.ids(), ['s1', 's2'])
+        self.assertEqual(seen.liked.ids(), ['s1'])
+
+    def test_least_recently_used_user_is_evicted(self):
+        with mock.patch.object(neo4j_db, 'read', side_effect=self.read) as read:
+            self.seen_sets.get('u1')
+            self.seen_sets.get('u2')
+            self.seen_sets.get('u1')
+            self.seen_sets.get('u3')
+            self.assertEqual(list(self.seen_sets.entries), ['u1', 'u3'])
+            self.seen_sets.get('u2')
+        self.assertEqual(read.call_count, 4)
+
+    def test_expired_entry_is_reloaded(self):
+        self.seen_sets.config['TTL'] = 0
+        with mock.patch.object(neo4j_db, 'read', side_effect=self.read) as read:
+            self.seen_sets.get('u1')
+            self.seen_sets.get('u1')
+        self.assertEqual(read.call_count, 2)
+
+    def test_rating_writes_update_cached_entry(self):
+        with mock.patch.object(neo4j_db, 'read', side_effect=self.read):
+            seen = self.seen_sets.get('u1')
+        version = self.seen_sets.version
+
+        with mock.patch.object(self.models.neo4j_db, 'write', side_effect=lambda *args: [{'created': True}]), \
+                mock.patch.object(self.models.recommendation_cache, 'invalidate_user'), \
+                mock.patch.object(self.models.autocomplete, 'rating_changed'), \
+                mock.patch.object(self.models.genre_index, 'mark_stale'):
+            self.models.Rating.create('u1', 's3', 4)
+            self.assertEqual(seen.rated.ids(), ['s1', 's2', 's3'])
+            self.assertEqual(seen.liked.ids(), ['s1', 's3'])
+
+            self.models.Rating.create('u1', 's1', 1)
+            self.assertEqual(seen.liked.ids(), ['s3'])
+
+        with mock.patch.object(self.models.neo4j_db, 'write', return_value=[{'deleted': 1}]), \
+                mock.patch.object(self.models.recommendation_cache, 'invalidate_user'), \
+                mock.patch.object(self.models.autocomplete, 'rating_changed'), \
+                mock.patch.object(self.models.genre_index, 'mark_stale'):
+            self.models.Rating.delete('u1', 's3')
+        self.assertEqual(seen.rated.ids(), ['s1', 's2'])
+        self.assertEqual(seen.liked.ids(), [])
+        self.assertEqual(self.seen_sets.version, version + 3)
+
+    def test_rating_during_load_is_not_cached_stale(self):
+        def read_during_rating(query, params):
+            rows = list(self.read(query, params))
+            # Notation écrite pendant la lecture: les lignes lues sont périmées
+            self.seen_sets.rated('u1', 's3', 5)
+            return rows
+
+        with mock.patch.object(neo4j_db, 'read', side_effect=read_during_rating):
+            stale = self.seen_sets.get('u1')
+        self.assertNotIn('s3', stale.rated)
+        self.assertEqual(len(self.seen_sets), 0)
+
+        self.ratings['u1'].append({'series_id': 's3', 'rating': 5})
+        with mock.patch.object(neo4j_db, 'read', side_effect=self.read) as read:
+            fresh = self.seen_sets.get('u1')
+            self.assertIs(self.seen_sets.get('u1'), fresh)
+        read.assert_called_once()
+        self.assertIn('s3', fresh.rated)
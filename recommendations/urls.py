@@ -28,6 +28,7 @@ urlpatterns = [
     path('ajax/rate/', views.rate_series_ajax, name='rate_series_ajax'),
     path('ajax/delete-rating/', views.delete_rating_ajax, name='delete_rating_ajax'),
     path('ajax/series-stats/<str:series_id>/', views.series_stats_ajax, name='series_stats_ajax'),
+    path('ajax/autocomplete/', views.autocomplete_ajax, name='autocomplete'),
     
     # Pages admin
     path('backoffice/dashboard/', views.admin_dashboard_view, name='admin_dashboard'),
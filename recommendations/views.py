@@ -8,12 +8,19 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, logout, authenticate
 from django.contrib import messages
 from django.contrib.auth.models import User as DjangoUser
+from django.core.paginator import Paginator
 from django.http import JsonResponse
+from django.urls import reverse
 from django.views.decorators.http import require_http_methods
+from asgiref.sync import sync_to_async
+import asyncio
 import json
+from urllib.parse import urlencode
 
-from .models import Series, Genre, Actor, Rating, Recommendation
-from .decorators import admin_required, get_user_neo4j_id
+from .models import Series, Genre, Actor, Rating, Recommendation, Similarity
+from .cache import recommendation_cache
+from . import autocomplete
+from .decorators import admin_required, async_neo4j_view, get_user_neo4j_id, aget_user_neo4j_id
 
 
 # ===== PAGES PUBLIQUES =====
@@ -21,7 +28,7 @@ from .decorators import admin_required, get_user_neo4j_id
 def home(request):
     """Page d'accueil"""
     # Récupérer quelques séries populaires
-    all_series = Series.get_all()[:8]  # Limiter à 8 séries
+    all_series = Series.get_all(limit=8)
     
     context = {
         'series': all_series,
@@ -40,82 +47,108 @@ def _resolve_series(identifier):
     return Series.get_by_title(identifier)
 
 
+# Le rendu des templates lit request.user et la session (accès base bloquants)
+arender = sync_to_async(render)
+
+
 def series_list_view(request):
-    """Liste de toutes les séries"""
-    series = Series.get_all()
+    """Liste des séries, par pages (curseur `after`), filtrable par genre"""
     genres = Genre.get_all()
-    
-    # Filtrage par genre si demandé
     genre_filter = request.GET.get('genre')
-    if genre_filter:
-        from tv_recommender.neo4j_db import neo4j_db
-        query = """
-        MATCH (s:Series)-[:HAS_GENRE]->(g:Genre {name: $genre})
-        WHERE s.is_adult = false
-        OPTIONAL MATCH (s)-[:HAS_GENRE]->(g2:Genre)
-        RETURN s.series_id as series_id,
-               s.title as title,
-               s.original_title as original_title,
-               s.year as year,
-               COLLECT(DISTINCT g2.name) as genres
-        ORDER BY s.title
-        """
-        series = neo4j_db.query(query, {'genre': genre_filter})
+    after = Series.decode_cursor(request.GET.get('after'))
+    series, next_cursor = Series.get_page(after=after, genre=genre_filter)
     
     context = {
         'series': series,
         'genres': genres,
         'selected_genre': genre_filter,
+        'next_cursor': next_cursor,
+        'is_first_page': after is None,
         'page_title': 'Catalogue de séries'
     }
     return render(request, 'recommendations/series_list.html', context)
 
 
-def series_detail_view(request, title):
-    """Détails d'une série"""
-    serie = _resolve_series(title)
+@async_neo4j_view
+async def series_detail_view(request, title):
+    """Détails d'une série (une seule requête Neo4j, voir Series.get_detail)"""
+    if not title:
+        messages.error(request, "Série non trouvée")
+        return redirect('recommendations:series_list')
+    user_id = await aget_user_neo4j_id(request)
+    serie = await Series.aget_detail(title, user_id, similar_limit=6)
     
     if not serie:
         messages.error(request, "Série non trouvée")
         return redirect('recommendations:series_list')
     
-    # Note moyenne et nombre de notations
-    series_id = serie.get('series_id') if serie else None
-    rating_info = Rating.get_average_rating(series_id) if series_id else None
-    
-    # Note de l'utilisateur si connecté
-    user_rating = None
-    if request.user.is_authenticated:
-        user_id = get_user_neo4j_id(request)
-        user_rating_data = Rating.get(user_id, series_id) if (user_id and series_id) else None
-        if user_rating_data:
-            user_rating = user_rating_data.get('rating')
-    
+    rating_info = serie['rating_info']
     context = {
         'serie': serie,
-        'rating_info': rating_info,
-        'user_rating': user_rating,
+        'rating_info': rating_info if rating_info['total_ratings'] else None,
+        'user_rating': serie['user_rating'],
+        'similar_series': serie['similar_series'],
+        'more_actors': serie['actor_count'] - len(serie['actors']),
         'page_title': serie['title']
     }
-    return render(request, 'recommendations/series_detail.html', context)
+    return await arender(request, 'recommendations/series_detail.html', context)
+
+
+SEARCH_PAGE_SIZE = 20
 
 
 def search_view(request):
-    """Recherche de séries"""
-    query = request.GET.get('q', '')
+    """Recherche de séries (index full-text, par pertinence, paginée)"""
+    query = request.GET.get('q', '').strip()
+    include_actors = request.GET.get('actors') == '1'
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page = 1
     results = []
     
     if query:
-        results = Series.search(query)
+        # Une ligne de plus que la page pour savoir s'il existe une page suivante
+        results = Series.search(
+            query,
+            limit=SEARCH_PAGE_SIZE + 1,
+            skip=(page - 1) * SEARCH_PAGE_SIZE,
+            include_actors=include_actors,
+        )
+    has_next = len(results) > SEARCH_PAGE_SIZE
     
     context = {
         'query': query,
-        'results': results,
+        'results': results[:SEARCH_PAGE_SIZE],
+        'include_actors': include_actors,
+        'page': page,
+        'previous_page': page - 1 if page > 1 else None,
+        'next_page': page + 1 if has_next else None,
         'page_title': f'Recherche: {query}' if query else 'Recherche'
     }
     return render(request, 'recommendations/search.html', context)
 
 
+@require_http_methods(["GET"])
+def autocomplete_ajax(request):
+    """Suggestions de titres et d'acteurs pendant la frappe (index en mémoire)"""
+    query = request.GET.get('q', '')
+    try:
+        limit = int(request.GET.get('limit', 0)) or None
+    except ValueError:
+        limit = None
+    types = [t for t in request.GET.get('types', '').split(',') if t in ('series', 'actor')]
+
+    results = []
+    for entry in autocomplete.complete(query, limit, types):
+        if entry['type'] == 'series':
+            url = reverse('recommendations:series_detail', args=[entry['id']])
+        else:
+            url = f"{reverse('recommendations:search')}?{urlencode({'q': entry['label'], 'actors': 1})}"
+        results.append(dict(entry, url=url))
+    return JsonResponse({'query': query, 'results': results})
+
+
 # ===== AUTHENTIFICATION =====
 
 def register_view(request):
@@ -215,14 +248,20 @@ def my_ratings_view(request):
 
 
 @login_required
-def recommendations_view(request):
+@async_neo4j_view
+async def recommendations_view(request):
     """Recommandations personnalisées"""
-    user_id = get_user_neo4j_id(request)
-    # Différents types de recommandations
-    genre_recs = Recommendation.by_genre(user_id, limit=6) if user_id else []
-    collab_recs = Recommendation.collaborative(user_id, limit=6) if user_id else []
-    actor_recs = Recommendation.by_actors(user_id, limit=6) if user_id else []
-    hybrid_recs = Recommendation.hybrid(user_id, limit=10) if user_id else []
+    user_id = await aget_user_neo4j_id(request)
+    # Différents types de recommandations, calculés en parallèle
+    # (hybride: liste pré-calculée par materialize_recommendations si disponible)
+    genre_recs, collab_recs, actor_recs, hybrid_recs = await asyncio.gather(
+        Recommendation.aby_genre(user_id, limit=6),
+        Recommendation.acollaborative(user_id, limit=6),
+        Recommendation.aby_actors(user_id, limit=6),
+        Recommendation.amaterialized(user_id, 'hybrid', limit=10),
+    ) if user_id else ([], [], [], [])
+    if user_id and not hybrid_recs:
+        hybrid_recs = await Recommendation.ahybrid(user_id, limit=10)
     
     context = {
         'genre_recs': genre_recs,
@@ -231,7 +270,7 @@ def recommendations_view(request):
         'hybrid_recs': hybrid_recs,
         'page_title': 'Recommandations'
     }
-    return render(request, 'recommendations/recommendations.html', context)
+    return await arender(request, 'recommendations/recommendations.html', context)
 
 
 # ===== AJAX ENDPOINTS POUR LES NOTATIONS =====
@@ -284,7 +323,8 @@ def series_stats_ajax(request, series_id):
             return JsonResponse({
                 'success': True,
                 'total_ratings': rating_info.get('total_ratings', 0),
-                'average_rating': float(rating_info.get('average_rating', 0)).round(1) if rating_info.get('average_rating') else None
+                'average_rating': rating_info.get('average_score'),
+                'histogram': rating_info.get('histogram'),
             })
         else:
             return JsonResponse({
@@ -332,39 +372,22 @@ def delete_rating_ajax(request):
 @admin_required
 def admin_dashboard_view(request):
     """Dashboard admin"""
-    from tv_recommender.neo4j_db import neo4j_db
+    from .models import User as Neo4jUser
     
     # Statistiques
     total_users = DjangoUser.objects.count()
-    total_series_query = "MATCH (s:Series) RETURN COUNT(s) as count"
-    total_series = neo4j_db.query(total_series_query)[0]['count']
-    
-    # Séries populaires
-    popular_query = """
-    MATCH (u:User)-[r:RATED]->(s:Series)
-    RETURN s.title as title,
-           COUNT(r) as ratings_count,
-           ROUND(AVG(r.rating) * 10) / 10.0 as avg_rating
-    ORDER BY ratings_count DESC
-    LIMIT 10
-    """
-    popular_series = neo4j_db.query(popular_query)
+    total_series = Series.count()
     
-    # Utilisateurs actifs
-    active_query = """
-    MATCH (u:User)-[r:RATED]->(:Series)
-    RETURN u.name as username,
-           COUNT(r) as ratings_count
-    ORDER BY ratings_count DESC
-    LIMIT 10
-    """
-    active_users = neo4j_db.query(active_query)
+    # Séries populaires et utilisateurs actifs: lecture des compteurs dénormalisés
+    popular_series = Series.most_rated(10)
+    active_users = Neo4jUser.most_active(10)
     
     context = {
         'total_users': total_users,
         'total_series': total_series,
         'popular_series': popular_series,
         'active_users': active_users,
+        'cache_stats': recommendation_cache.stats(),
         'page_title': 'Dashboard Admin'
     }
     return render(request, 'recommendations/admin/dashboard.html', context)
@@ -372,11 +395,15 @@ def admin_dashboard_view(request):
 
 @admin_required
 def admin_series_list_view(request):
-    """Gestion des séries (admin)"""
-    series = Series.get_all()
+    """Gestion des séries (admin), par pages de MAX_PAGE_SIZE"""
+    after = Series.decode_cursor(request.GET.get('after'))
+    series, next_cursor = Series.get_page(limit=Series.MAX_PAGE_SIZE, after=after)
     
     context = {
         'series': series,
+        'total_series': Series.count(),
+        'next_cursor': next_cursor,
+        'is_first_page': after is None,
         'page_title': 'Gestion des Séries'
     }
     return render(request, 'recommendations/admin/series_list.html', context)
@@ -469,7 +496,7 @@ def admin_series_edit_view(request, title):
             from tv_recommender.neo4j_db import neo4j_db
             
             # Supprimer les anciennes relations de genres
-            neo4j_db.query("""
+            neo4j_db.write("""
                 MATCH (s:Series {series_id: $series_id})-[r:HAS_GENRE]->()
                 DELETE r
             """, {'series_id': series_id})
@@ -480,7 +507,7 @@ def admin_series_edit_view(request, title):
                     Genre.link_to_series(series_id, genre_name.strip())
             
             # Supprimer les anciennes relations d'acteurs
-            neo4j_db.query("""
+            neo4j_db.write("""
                 MATCH (s:Series {series_id: $series_id})-[r:HAS_ACTOR]->()
                 DELETE r
             """, {'series_id': series_id})
@@ -490,6 +517,9 @@ def admin_series_edit_view(request, title):
                 if actor_id:
                     Actor.link_to_series(series_id, actor_id.strip())
             
+            # Genres/acteurs modifiés: voisinage SIMILAR_TO à recalculer
+            Similarity.mark_stale([series_id])
+            
             messages.success(request, f"Série '{new_title}' modifiée avec succès")
             return redirect('recommendations:admin_series_list')
         except Exception as e:
@@ -524,25 +554,33 @@ def admin_series_delete_view(request, title):
     return redirect('recommendations:admin_series_list')
 
 
+ADMIN_USERS_PAGE_SIZE = 50
+
+
 @admin_required
 def admin_users_view(request):
-    """Gestion des utilisateurs (admin)"""
-    users = DjangoUser.objects.all().order_by('-date_joined')
+    """Gestion des utilisateurs (admin), par pages"""
+    from .models import User as Neo4jUser
+    users = DjangoUser.objects.all().order_by('-date_joined', '-id')
+    page = Paginator(users, ADMIN_USERS_PAGE_SIZE).get_page(request.GET.get('page'))
     
-    # Ajouter info Neo4j pour chaque user
+    # Existence et nombre de notes de toute la page en une seule requête Neo4j
+    status = Neo4jUser.bulk_status([str(user.id) for user in page])
     users_data = []
-    for user in users:
-        from .models import User as Neo4jUser
-        user_id = str(user.id)
-        ratings = Rating.get_user_ratings(user_id)
+    for user in page:
+        user_status = status.get(str(user.id), {})
         users_data.append({
             'user': user,
-            'neo4j_exists': Neo4jUser.exists(user_id),
-            'ratings_count': len(ratings) if ratings else 0
+            'neo4j_exists': user_status.get('exists', False),
+            'ratings_count': user_status.get('ratings_count', 0)
         })
     
     context = {
         'users_data': users_data,
+        'page_obj': page,
+        'total_users': page.paginator.count,
+        'active_users': users.filter(is_active=True).count(),
+        'admin_users': users.filter(is_superuser=True).count(),
         'page_title': 'Gestion des Utilisateurs'
     }
     return render(request, 'recommendations/admin/users_list.html', context)
@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Les vues async (recommandations, détail d'une série) lancent leurs requêtes
+Neo4j en parallèle sur une seule boucle d'événements: servir l'application via
+ce module, ex. `uvicorn tv_recommender.asgi:application --workers 4`.
 """
 
 import os
@@ -14,3 +18,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tv_recommender.settings')
 
 application = get_asgi_application()
+
+# Index d'autocomplétion construit au démarrage du serveur (et non des commandes manage.py)
+from recommendations import autocomplete  # noqa: E402
+
+autocomplete.start()
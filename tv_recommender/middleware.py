@@ -0,0 +1,29 @@
+# tv_recommender/middleware.py
+"""
+Middleware Neo4j: une session partagée par requête HTTP
+"""
+
+from django.conf import settings
+
+from tv_recommender.neo4j_db import neo4j_db
+
+
+class Neo4jSessionMiddleware:
+    """
+    Ouvre une session Neo4j pour toute la durée de la requête: les appels
+    à neo4j_db.query() de la vue, des templates et des context processors
+    la réutilisent au lieu d'ouvrir chacun leur propre session.
+    """
+
+    SAFE_METHODS = ('GET', 'HEAD')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        read_transaction = (
+            getattr(settings, 'NEO4J_REQUEST_READ_TRANSACTION', False)
+            and request.method in self.SAFE_METHODS
+        )
+        with neo4j_db.request_scope(read_transaction=read_transaction):
+            return self.get_response(request)
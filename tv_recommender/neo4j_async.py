@@ -0,0 +1,79 @@
+# tv_recommender/neo4j_async.py
+"""
+Pendant asyncio de Neo4jConnection, basé sur l'AsyncDriver de neo4j
+Utilisé par les vues async servies via tv_recommender/asgi.py
+
+Sous WSGI (runserver, WSGI_APPLICATION), chaque requête d'une vue async tourne
+dans sa propre boucle: son driver est fermé en fin de vue (async_neo4j_view),
+sans pool partagé entre requêtes. Le pool n'est réutilisé que sous ASGI.
+"""
+
+import weakref
+import asyncio
+
+from neo4j import AsyncGraphDatabase
+from django.conf import settings
+
+
+class AsyncNeo4jConnection:
+    """
+    Classe pour gérer la connexion asynchrone à Neo4j
+    Un AsyncDriver est lié à la boucle d'événements qui l'a créé: on en garde
+    un par boucle (une seule sous ASGI).
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(AsyncNeo4jConnection, cls).__new__(cls)
+            cls._instance._drivers = weakref.WeakKeyDictionary()
+        return cls._instance
+
+    def _driver(self):
+        loop = asyncio.get_running_loop()
+        driver = self._drivers.get(loop)
+        if driver is None:
+            driver = AsyncGraphDatabase.driver(
+                settings.NEO4J_BOLT_URL,
+                auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD),
+                max_connection_pool_size=getattr(settings, 'NEO4J_MAX_CONNECTION_POOL_SIZE', 100),
+                connection_acquisition_timeout=getattr(settings, 'NEO4J_CONNECTION_ACQUISITION_TIMEOUT', 60.0),
+                max_connection_lifetime=getattr(settings, 'NEO4J_MAX_CONNECTION_LIFETIME', 3600.0),
+                keep_alive=getattr(settings, 'NEO4J_KEEP_ALIVE', True),
+            )
+            self._drivers[loop] = driver
+        return driver
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        driver = self._drivers.pop(loop, None)
+        if driver is not None:
+            await driver.close()
+
+    async def read(self, query, parameters=None, db=None):
+        """
+        Exécute une requête de lecture dans une transaction gérée (execute_read)
+        """
+        async with self._session(db) as session:
+            return await session.execute_read(self._work, query, parameters)
+
+    async def write(self, query, parameters=None, db=None):
+        """
+        Exécute une requête d'écriture dans une transaction gérée (execute_write)
+        """
+        async with self._session(db) as session:
+            return await session.execute_write(self._work, query, parameters)
+
+    def _session(self, db):
+        return self._driver().session(
+            database=db,
+            fetch_size=getattr(settings, 'NEO4J_FETCH_SIZE', 1000),
+        )
+
+    @staticmethod
+    async def _work(tx, query, parameters):
+        result = await tx.run(query, parameters)
+        return [record.data() async for record in result]
+
+# Instance globale
+async_neo4j_db = AsyncNeo4jConnection()
@@ -1,51 +1,167 @@
 # tv_recommender/neo4j_db.py
 
-from neo4j import GraphDatabase
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from neo4j import GraphDatabase, READ_ACCESS, WRITE_ACCESS
 from django.conf import settings
 
+
+# Session (et transaction de lecture éventuelle) partagée par la requête HTTP en cours
+_request_scope = ContextVar('neo4j_request_scope', default=None)
+
+
+def detached(func):
+    """
+    Exécuter `func` hors de la session de la requête en cours. asyncio.to_thread
+    copie le contexte, donc _request_scope: sans cela, plusieurs threads
+    partageraient la même neo4j.Session, qui n'est pas thread-safe.
+    """
+    @wraps(func)
+    def run(*args, **kwargs):
+        token = _request_scope.set(None)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _request_scope.reset(token)
+    return run
+
+
 class Neo4jConnection:
     """
     Classe pour gérer la connexion à Neo4j
     """
     _instance = None
     _driver = None
-    
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(Neo4jConnection, cls).__new__(cls)
         return cls._instance
-    
+
     def __init__(self):
         if self._driver is None:
             self._driver = GraphDatabase.driver(
                 settings.NEO4J_BOLT_URL,
-                auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
+                auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD),
+                max_connection_pool_size=getattr(settings, 'NEO4J_MAX_CONNECTION_POOL_SIZE', 100),
+                connection_acquisition_timeout=getattr(settings, 'NEO4J_CONNECTION_ACQUISITION_TIMEOUT', 60.0),
+                max_connection_lifetime=getattr(settings, 'NEO4J_MAX_CONNECTION_LIFETIME', 3600.0),
+                keep_alive=getattr(settings, 'NEO4J_KEEP_ALIVE', True),
             )
-    
+
     def close(self):
         if self._driver:
             self._driver.close()
             self._driver = None
-    
+
+    def session(self, **config):
+        """Ouvrir une session avec la configuration du projet (fetch_size)"""
+        config.setdefault('fetch_size', getattr(settings, 'NEO4J_FETCH_SIZE', 1000))
+        return self._driver.session(**config)
+
+    @contextmanager
+    def request_scope(self, read_transaction=False):
+        """
+        Partager une seule session entre toutes les requêtes du bloc
+        (et, si `read_transaction`, une seule transaction de lecture).
+        Un bloc imbriqué réutilise la session du bloc englobant.
+        """
+        if _request_scope.get() is not None:
+            yield
+            return
+
+        assert self._driver is not None, "Driver non initialisé"
+
+        if read_transaction:
+            session = self.session(default_access_mode=READ_ACCESS)
+        else:
+            session = self.session()
+        scope = {'session': session, 'tx': None}
+        token = _request_scope.set(scope)
+        try:
+            if read_transaction:
+                scope['tx'] = session.begin_transaction()
+            yield
+        finally:
+            _request_scope.reset(token)
+            if scope['tx'] is not None:
+                scope['tx'].close()
+            session.close()
+
     def query(self, query, parameters=None, db=None):
         """
         Exécute une requête Cypher
         """
         assert self._driver is not None, "Driver non initialisé"
-        
-        with self._driver.session(database=db) as session:
+
+        scope = _request_scope.get()
+        if scope is not None and db is None:
+            runner = scope['tx'] or scope['session']
+            result = runner.run(query, parameters)
+            return [record.data() for record in result]
+
+        with self.session(database=db) as session:
             result = session.run(query, parameters)
             return [record.data() for record in result]
-    
+
+    def read(self, query, parameters=None, db=None):
+        """
+        Exécute une requête de lecture dans une transaction gérée (execute_read):
+        routée vers un follower / réplica en cluster, rejouée sur erreur transitoire
+        """
+        return self._run_managed(READ_ACCESS, query, parameters, db)
+
+    def write(self, query, parameters=None, db=None):
+        """
+        Exécute une requête d'écriture dans une transaction gérée (execute_write):
+        routée vers le leader en cluster, rejouée sur erreur transitoire
+        """
+        return self._run_managed(WRITE_ACCESS, query, parameters, db)
+
+    def _run_managed(self, access_mode, query, parameters=None, db=None):
+        """Exécuter une requête dans une transaction gérée du mode d'accès demandé"""
+        assert self._driver is not None, "Driver non initialisé"
+
+        def work(tx):
+            return [record.data() for record in tx.run(query, parameters)]
+
+        scope = _request_scope.get()
+        if scope is not None and db is None:
+            if scope['tx'] is not None and access_mode == READ_ACCESS:
+                return work(scope['tx'])
+            if scope['tx'] is None:
+                return self._execute(scope['session'], access_mode, work)
+            # Transaction de lecture ouverte sur la session partagée:
+            # l'écriture passe par une session dédiée
+
+        with self.session(database=db) as session:
+            return self._execute(session, access_mode, work)
+
+    @staticmethod
+    def _execute(session, access_mode, work):
+        if access_mode == READ_ACCESS:
+            return session.execute_read(work)
+        return session.execute_write(work)
+
     def execute_write(self, query, parameters=None):
         """
         Exécute une requête d'écriture
         """
+        return self.write(query, parameters)
+
+    def write_batch(self, query, rows):
+        """
+        Exécute une requête `UNWIND $rows AS row ...` pour tout un lot
+        dans une seule transaction d'écriture
+        """
+        assert self._driver is not None, "Driver non initialisé"
+
         with self._driver.session() as session:
-            result = session.write_transaction(
-                lambda tx: tx.run(query, parameters)
+            return session.execute_write(
+                lambda tx: tx.run(query, {'rows': rows}).consume().counters
             )
-            return result
 
 # Instance globale
 neo4j_db = Neo4jConnection()
\ No newline at end of file
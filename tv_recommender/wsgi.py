@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tv_recommender.settings')
 
 application = get_wsgi_application()
+
+# Index d'autocomplétion construit au démarrage du serveur (et non des commandes manage.py)
+from recommendations import autocomplete  # noqa: E402
+
+autocomplete.start()